@@ -0,0 +1,46 @@
+"""
+Run the offline benchmark suite and print the results as JSON.  Nothing in the suite requires network access.
+
+Usage: python -m benchmarks [--only fanout aggregation ...] [--output results.json]
+"""
+import argparse
+import importlib
+import json
+import platform
+import subprocess
+import time
+
+suite = ['fanout', 'aggregation', 'query_validation', 'item_load', 'batch_filter', 'tiling', 'rate_limit', 'cold_start', 'warm_start',
+         'fetch', 'exact_filter']
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None):
+    results = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'timestamp': time.time(),
+        'benchmarks': {},
+    }
+    for name in names or suite:
+        module = importlib.import_module('benchmarks.{}'.format(name))
+        results['benchmarks'].update({name: module.run()})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', nargs='+', choices=suite)
+    parser.add_argument('--output', help="Also write the results to this file")
+    args = parser.parse_args()
+    results = run(args.only)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
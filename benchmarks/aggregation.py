@@ -0,0 +1,77 @@
+"""
+`handler.worker` aggregation of stub datasources, with Lambda invocations replaced by `benchmarks.stubs.LocalLambda`.
+
+Failed invocations are dropped from the response by the worker, like failing drivers in production.  With `--raw`,
+the stub datasources are STAC compliant and return their responses as bytes, which are spliced into the response.
+
+Usage: python -m benchmarks.aggregation [--sources 8] [--latency 0.05] [--items 500] [--payload-bytes 1024]
+       [--failure-rate 0.1] [--repeat 3] [--raw]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from benchmarks.stubs import LocalLambda, spatial, temporal
+
+# handler.py reads its deployment settings and creates a boto3 client at import time
+os.environ.setdefault('SERVICE_NAME', 'cognition-datasources')
+os.environ.setdefault('SERVICE_STAGE', 'benchmark')
+os.environ.setdefault('SERVICE_REGION', 'us-east-1')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+# The EMF metrics hook would write to stdout for every later benchmark of the suite
+os.environ.setdefault('SERVICE_METRICS', '0')
+
+import handler
+
+
+def run(sources=8, latency=0.05, items=500, payload_bytes=1024, failure_rate=0.1, repeat=3, raw=False):
+    body = json.dumps({
+        'intersects': spatial,
+        'time': '/'.join(temporal),
+        'limit': items,
+        'datasources': ['Stub{}'.format(x) for x in range(sources)],
+    })
+
+    original = handler.lambda_invoke
+    timings = []
+    try:
+        for _ in range(repeat):
+            handler.lambda_invoke = LocalLambda(latency=latency, items=items, payload_bytes=payload_bytes,
+                                                failure_rate=failure_rate, stac_compliant=raw, raw=raw)
+            start = time.perf_counter()
+            # Keep the worker's warnings about dropped datasources out of the JSON output
+            with contextlib.redirect_stdout(sys.stderr):
+                response = handler.worker({'body': body}, None)
+            timings.append(time.perf_counter() - start)
+    finally:
+        handler.lambda_invoke = original
+
+    collections = json.loads(response['body'])
+    errors = collections.pop('errors', {})
+    return {
+        'sources': sources,
+        'latency': latency,
+        'failure_rate': failure_rate,
+        'raw': raw,
+        'dropped_sources': len(errors),
+        'items': sum(len(x['features']) for x in collections.values()),
+        'response_bytes': len(response['body']),
+        'seconds': {'min': min(timings), 'mean': sum(timings) / len(timings)},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sources', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--payload-bytes', type=int, default=1024)
+    parser.add_argument('--failure-rate', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--raw', action='store_true')
+    args = parser.parse_args()
+    print(json.dumps(run(args.sources, args.latency, args.items, args.payload_bytes, args.failure_rate,
+                         args.repeat, args.raw), indent=2))
@@ -0,0 +1,62 @@
+"""
+Scalar vs. vectorized post-filtering with `STACQuery` on synthetic items.
+
+Usage: python -m benchmarks.batch_filter [--items 100000]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from datasources.stac.query import STACQuery
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[-118.96, 34.96], [-111.71, 34.96], [-111.71, 40.75], [-118.96, 40.75], [-118.96, 34.96]]]
+}
+
+
+def synthetic_items(count, seed=0):
+    random.seed(seed)
+    start = datetime(2018, 1, 1)
+    items = []
+    for _ in range(count):
+        items.append({
+            'datetime': (start + timedelta(seconds=random.randint(0, 365 * 86400))).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'eo:cloud_cover': round(random.uniform(0, 100), 2),
+            'eo:gsd': random.choice([10.0, 20.0, 60.0]),
+            'eo:platform': random.choice(['sentinel-2a', 'sentinel-2b']),
+        })
+    return items
+
+
+def run(count=100000):
+    items = synthetic_items(count)
+    query = STACQuery(spatial, ("2018-03-01", "2018-09-30"))
+    query.properties = {'eo:cloud_cover': {'lt': 25}, 'eo:gsd': {'eq': 10.0}, 'eo:platform': {'ne': 'sentinel-2b'}}
+
+    start = time.perf_counter()
+    scalar = [query.check_temporal(datetime.strptime(x['datetime'], '%Y-%m-%dT%H:%M:%S.%fZ')) and
+              query.check_properties(x) for x in items]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = query.check_temporal_batch([x['datetime'] for x in items]) & query.check_properties_batch(items)
+    batch_time = time.perf_counter() - start
+
+    return {
+        'items': count,
+        'matched': int(batch.sum()),
+        'identical': scalar == batch.tolist(),
+        'scalar_seconds': scalar_time,
+        'batch_seconds': batch_time,
+        'speedup': scalar_time / batch_time,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.items), indent=2))
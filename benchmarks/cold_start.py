@@ -0,0 +1,93 @@
+"""
+Import time and Lambda cold-start benchmark with 11 drivers installed.
+
+Copies the library into a temporary directory, installs a stub driver for each datasource in `sources.remote` (each
+stub simulates the cost of importing its dependencies) and times fresh interpreters:
+
+- eager: import the library and every driver, as `collections.load_sources()` does.
+- lazy: import the library and build a `Manifest` without touching any driver.
+- cold_start: run a driver handler (`Manifest()`, search and execute a single datasource) in a fresh interpreter.
+
+Usage: python -m benchmarks.cold_start [--import-cost 0.05] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from datasources.sources import remote
+
+root = os.path.join(os.path.dirname(__file__), '..')
+
+driver_template = '''import time
+
+# Simulate importing the driver's third party dependencies
+time.sleep({import_cost})
+
+from datasources.sources.base import Datasource
+
+
+class {name}(Datasource):
+
+    stac_compliant = False
+    tags = ['EO', 'Raster']
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+        self.manifest.searches.append([self, {{'spatial': spatial, 'limit': limit}}])
+
+    def execute(self, api_request):
+        return []
+'''
+
+scenarios = {
+    'eager': "import datasources; from datasources.sources import collections; collections.load_sources()",
+    'lazy': "import datasources; datasources.Manifest()",
+    'cold_start': "from datasources import Manifest; m = Manifest(); "
+                  "m['{name}'].search({{'type': 'Polygon', 'coordinates': []}}); m.execute()",
+}
+
+timer = '''import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+'''
+
+
+def install(directory, import_cost):
+    shutil.copytree(os.path.join(root, 'datasources'), os.path.join(directory, 'datasources'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    names = [k for (k, v) in remote.__dict__.items() if type(v) == str and 'https' in v]
+    for name in names:
+        with open(os.path.join(directory, 'datasources', 'sources', '{}.py'.format(name)), 'w') as f:
+            f.write(driver_template.format(name=name, import_cost=import_cost))
+    return names
+
+
+def run(import_cost=0.05, repeat=5):
+    directory = tempfile.mkdtemp()
+    try:
+        names = install(directory, import_cost)
+        results = {'drivers': len(names), 'import_cost': import_cost}
+        for (scenario, statement) in scenarios.items():
+            timings = []
+            for _ in range(repeat):
+                out = subprocess.check_output(
+                    [sys.executable, '-c', timer.format(statement=statement.format(name=names[0]))],
+                    cwd=directory, env=dict(os.environ, PYTHONPATH=directory)
+                )
+                timings.append(float(out.decode().strip()))
+            results.update({scenario: {'min': min(timings), 'mean': sum(timings) / len(timings)}})
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--import-cost', type=float, default=0.05)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.import_cost, args.repeat), indent=2))
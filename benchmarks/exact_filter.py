@@ -0,0 +1,63 @@
+"""
+Exact spatial post-filtering of the items returned for a detailed search area (requires shapely).
+
+A circular parcel of `--vertices` vertices is simplified to `--max-vertices` for the upstream request with
+`STACQuery.upstream`.  The items of a bounding box search are then filtered against the exact geometry, item by item
+with shapely (`naive`) and with `STACQuery.check_intersects_batch` (bounding box pre-check and prepared geometry).
+
+Usage: python -m benchmarks.exact_filter [--items 10000] [--vertices 3000] [--max-vertices 50]
+"""
+import argparse
+import json
+import math
+import time
+
+from datasources.stac.query import STACQuery
+
+from benchmarks.stubs import stub_item, temporal
+
+
+def parcel(vertices):
+    ring = [[-117.5 + 0.5 * math.cos(2 * math.pi * idx / vertices), 35.5 + 0.5 * math.sin(2 * math.pi * idx / vertices)]
+            for idx in range(vertices)]
+    return {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+
+
+def run(items=10000, vertices=3000, max_vertices=50):
+    from shapely.geometry import shape
+
+    query = STACQuery(parcel(vertices), temporal)
+    features = [stub_item('Stub', idx) for idx in range(items)]
+
+    start = time.perf_counter()
+    upstream = query.upstream(max_vertices)
+    upstream_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    geometry = shape(query.spatial)
+    naive = [geometry.intersects(shape(x['geometry'])) for x in features]
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = STACQuery(parcel(vertices), temporal).check_intersects_batch(features)
+    batch_time = time.perf_counter() - start
+
+    return {
+        'items': items,
+        'matched': int(batch.sum()),
+        'identical': naive == batch.tolist(),
+        'upstream_vertices': len(upstream.spatial['coordinates'][0]) - 1,
+        'upstream_seconds': upstream_time,
+        'naive_seconds': naive_time,
+        'batch_seconds': batch_time,
+        'speedup': naive_time / batch_time,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--vertices', type=int, default=3000)
+    parser.add_argument('--max-vertices', type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.items, args.vertices, args.max_vertices), indent=2))
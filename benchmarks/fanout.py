@@ -0,0 +1,62 @@
+"""
+`Manifest.execute` fan-out across several stub datasources.
+
+Usage: python -m benchmarks.fanout [--sources 8] [--searches 4] [--latency 0.05] [--items 100] [--payload-bytes 1024]
+       [--failure-rate 0] [--executor thread] [--repeat 3]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.stubs import stub_manifest, StubError, spatial, temporal
+
+
+def run(sources=8, searches=4, latency=0.05, items=100, payload_bytes=1024, failure_rate=0.0, executor='thread',
+        repeat=3):
+    timings = []
+    failures = 0
+    for _ in range(repeat):
+        manifest = stub_manifest(sources, latency=latency, items=items, payload_bytes=payload_bytes,
+                                 failure_rate=failure_rate)
+        for source in list(manifest.values()):
+            for _ in range(searches):
+                source.search(spatial, temporal, limit=items)
+        start = time.perf_counter()
+        try:
+            response = manifest.execute(executor=executor, use_cache=False)
+        except StubError:
+            # A failed search aborts `Manifest.execute`
+            failures += 1
+            continue
+        timings.append(time.perf_counter() - start)
+
+    results = {
+        'sources': sources,
+        'searches': sources * searches,
+        'latency': latency,
+        'executor': executor,
+        'failed_runs': failures,
+    }
+    if timings:
+        results.update({
+            'items': sum(len(x['features']) for x in response.values()),
+            'seconds': {'min': min(timings), 'mean': sum(timings) / len(timings)},
+            # Wall time relative to running every search back to back
+            'speedup': sources * searches * latency / min(timings),
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sources', type=int, default=8)
+    parser.add_argument('--searches', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--payload-bytes', type=int, default=1024)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--executor', default='thread')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sources, args.searches, args.latency, args.items, args.payload_bytes,
+                         args.failure_rate, args.executor, args.repeat), indent=2))
@@ -0,0 +1,76 @@
+"""
+Downloads of driver files by `cognition-datasources load --local` against a local fake CDN.
+
+The fake CDN serves the config, CI status, handler, driver and requirements of `--drivers` drivers after `--latency`
+seconds, with `ETag` headers and 304 responses to conditional requests.  The files are downloaded serially without a
+cache like the original `load` command, then with a `Fetcher` on an empty cache (cold), on a populated cache within
+the TTL (warm, no request), on a populated cache with `ttl=0` (revalidated, every file is revalidated with a
+conditional request except the CI statuses) and offline.  Revalidation saves the downloads but not the round trips,
+its gain over a cold fetch depends on the size of the files.
+
+Usage: python -m benchmarks.fetch [--drivers 11] [--latency 0.1]
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+import requests
+
+from datasources.fetch import Fetcher, CI_STATUS_TTL
+from datasources.testing import FakeCDN
+
+
+def driver_files(base_url, name):
+    link = '{}/{}'.format(base_url, name)
+    return ['{}/{}'.format(link, x) for x in ('config.yml', 'handler.py', '{}.py'.format(name), 'requirements.txt')]
+
+
+def serial(base_url, names):
+    for name in names:
+        requests.get('{}/{}/ci'.format(base_url, name)).json()
+        for url in driver_files(base_url, name):
+            requests.get(url).content
+
+
+def fetched(fetcher, base_url, names):
+    # Same pattern as `load`: CI checks first, then every file at once
+    fetcher.map(lambda name: fetcher.get_json('{}/{}/ci'.format(base_url, name), CI_STATUS_TTL), names)
+    fetcher.get_many([url for name in names for url in driver_files(base_url, name)])
+
+
+def run(drivers=11, latency=0.1):
+    names = ['Driver{}'.format(idx) for idx in range(drivers)]
+    results = {'drivers': drivers, 'latency': latency}
+    server = FakeCDN(latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    directory = tempfile.mkdtemp()
+    try:
+        runs = [
+            ('serial', lambda: serial(server.url, names)),
+            ('cold', lambda: fetched(Fetcher(directory), server.url, names)),
+            ('warm', lambda: fetched(Fetcher(directory), server.url, names)),
+            ('revalidated', lambda: fetched(Fetcher(directory, ttl=0), server.url, names)),
+            ('offline', lambda: fetched(Fetcher(directory, offline=True), server.url, names)),
+        ]
+        for name, fn in runs:
+            server.statuses = {}
+            start = time.perf_counter()
+            fn()
+            results.update({name: {'seconds': time.perf_counter() - start, 'server_statuses': server.statuses}})
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(directory)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drivers', type=int, default=11)
+    parser.add_argument('--latency', type=float, default=0.1)
+    args = parser.parse_args()
+    print(json.dumps(run(args.drivers, args.latency), indent=2))
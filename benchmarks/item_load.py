@@ -0,0 +1,77 @@
+"""
+`STACItem.load` and `STACItem.load_many` throughput on stub items.
+
+`legacy` reproduces the previous `STACItem.load`, which built a new `Schema` for every item and scanned property keys
+with substring tests.  `load` and `load_many` share the same single-pass validator and are expected to run at the
+same speed, `load_many` exists to report every invalid item of a page instead of stopping at the first one.
+
+Usage: python -m benchmarks.item_load [--items 10000] [--payload-bytes 1024]
+"""
+import argparse
+import json
+import re
+import time
+
+from schema import Schema, And
+
+from datasources.stac.item import STACItem, eo_extension, sar_extension
+
+from benchmarks.stubs import stub_item
+
+
+def legacy_load(stac_item):
+    def extensions(n):
+        for (k, v) in n.items():
+            if 'eo' in k and type(v) != eo_extension[k.split(':')[-1]]['type']:
+                raise ValueError(k)
+            if 'sar' in k and type(v) != sar_extension[k.split(':')[-1]]['type']:
+                raise ValueError(k)
+        return True
+
+    Schema({
+        "id": str,
+        "type": And(str, 'Feature'),
+        "properties": And(
+            dict,
+            lambda n: re.match(r'^(19|20)\d\d-(0[1-9]|1[012])-([012]\d|3[01])T([01]\d|2[0-3]):([0-5]\d):([0-5]\d).(\d+?)Z$',
+                               n['datetime']),
+            extensions
+        ),
+        "assets": And(dict, lambda n: all('title' in v and 'href' in v for v in n.values())),
+        "bbox": And(list, lambda n: STACItem.validate_bbox(n)),
+        "geometry": And(dict, lambda n: STACItem.validate_geometry(n))
+    }).validate(stac_item)
+    return STACItem(stac_item)
+
+
+def run(count=10000, payload_bytes=1024):
+    features = [stub_item('Stub', idx, payload_bytes) for idx in range(count)]
+
+    start = time.perf_counter()
+    for feature in features:
+        legacy_load(feature)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for feature in features:
+        STACItem.load(feature)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    STACItem.load_many(features)
+    load_many_time = time.perf_counter() - start
+
+    return {
+        'items': count,
+        'legacy': {'items_per_second': count / legacy_time},
+        'load': {'items_per_second': count / load_time},
+        'load_many': {'items_per_second': count / load_many_time},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--payload-bytes', type=int, default=1024)
+    args = parser.parse_args()
+    print(json.dumps(run(args.items, args.payload_bytes), indent=2))
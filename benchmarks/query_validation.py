@@ -0,0 +1,123 @@
+"""
+Per-query validation cost of `STACQuery`.
+
+`legacy` reproduces the previous implementation, which built new `Schema` objects on every call and parsed each date
+with repeated splits and `strptime`.  `compiled` is the current `STACQuery`.
+
+`per_driver` and `shared` measure the query work of a search of `--drivers` datasources, each reading the bounding box
+and WKT of a detailed polygon (1000 vertices): `per_driver` compiles a query in each driver as drivers used to,
+`shared` compiles it once like `Manifest.search`.
+
+Usage: python -m benchmarks.query_validation [--number 2000] [--drivers 11]
+"""
+import argparse
+import json
+import math
+import timeit
+from datetime import datetime
+
+from schema import Schema, And
+
+from datasources.stac.query import STACQuery
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[-118.96, 34.96], [-111.71, 34.96], [-111.71, 40.75], [-118.96, 40.75], [-118.96, 34.96]]]
+}
+temporal = ("2018-10-30T06:30:00.000Z", "2018-12-31T23:59:59.999Z")
+
+
+class LegacySTACQuery(object):
+
+    @staticmethod
+    def load_spatial(spatial):
+        schema = Schema({
+            "type": And(
+                str,
+                lambda n: n == "Polygon"
+            ),
+            "coordinates": And(
+                list,
+                lambda n: n[0][0] == n[0][-1],
+                lambda n: len(list(filter(lambda x: -180 <= x[0] <= 180, n[0]))) == len(n[0]),
+                lambda n: len(list(filter(lambda y: -90 <= y[1] <= 90, n[0]))) == len(n[0])
+            )
+        })
+        schema.validate(spatial)
+        return spatial
+
+    @staticmethod
+    def load_temporal(temporal):
+        Schema((str, str)).validate(temporal)
+        dates = []
+        for item in temporal:
+            if len(item) == 10:
+                Schema(
+                    And(
+                        lambda n: 0 <= int(n.split('-')[0]) <= 2100,
+                        lambda n: 1 <= int(n.split('-')[1]) <= 12,
+                        lambda n: 1 <= int(n.split('-')[2]) <= 31,
+                        error="Invalid configuration, must be of format `YYYY-MM-DD`"
+                    )
+                ).validate(item)
+                dates.append(datetime.strptime("{}T00:00:00.000Z".format(item), "%Y-%m-%dT%H:%M:%S.%fZ"))
+            else:
+                Schema(
+                    And(
+                        lambda n: 0 <= int(n.split('-')[0]) <= 2100,
+                        lambda n: 1 <= int(n.split('-')[1]) <= 12,
+                        lambda n: 1 <= int(n.split('-')[2].split('T')[0]) <= 31,
+                        lambda n: n[10] == 'T',
+                        lambda n: 0 <= int(n.split(':')[0].split('T')[-1]) <= 24,
+                        lambda n: 0 <= int(n.split(':')[1]) <= 60,
+                        lambda n: 0 <= int(n.split(':')[-1].split('.')[0]) <= 60,
+                        lambda n: 0 <= int(n.split(':')[-1].split('.')[-1][:-1]) <= 999,
+                        lambda n: n[-1] == 'Z',
+                        error="Invalid temporal configuration, must be of format `YYYY-MM-DDThh:mm:ss.mssZ`"
+                    )
+                ).validate(item)
+                dates.append(datetime.strptime(item, "%Y-%m-%dT%H:%M:%S.%fZ"))
+        return tuple(dates)
+
+    def __init__(self, spatial, temporal=None):
+        self.spatial = self.load_spatial(spatial)
+        if temporal:
+            self.temporal = self.load_temporal(temporal)
+
+
+def detailed_polygon(vertices=1000):
+    ring = [[-115.0 + 3 * math.cos(2 * math.pi * idx / vertices), 37.5 + 3 * math.sin(2 * math.pi * idx / vertices)]
+            for idx in range(vertices)]
+    return {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+
+
+def multi_source(polygon, drivers, shared):
+    query = STACQuery(polygon, temporal) if shared else None
+    for _ in range(drivers):
+        stac_query = query or STACQuery(polygon, temporal)
+        stac_query.bbox()
+        stac_query.wkt()
+
+
+def run(number=2000, drivers=11):
+    results = {'number': number, 'drivers': drivers}
+    for (name, cls) in [('legacy', LegacySTACQuery), ('compiled', STACQuery)]:
+        seconds = min(timeit.repeat(lambda: cls(spatial, temporal), number=number, repeat=3))
+        results.update({name: {'us_per_query': seconds / number * 1e6}})
+    results.update({'speedup': results['legacy']['us_per_query'] / results['compiled']['us_per_query']})
+
+    polygon = detailed_polygon()
+    searches = max(1, number // 20)
+    for (name, shared) in [('per_driver', False), ('shared', True)]:
+        seconds = min(timeit.repeat(lambda: multi_source(polygon, drivers, shared), number=searches, repeat=3))
+        results.update({name: {'us_per_search': seconds / searches * 1e6}})
+    results.update({'shared_speedup': results['per_driver']['us_per_search'] / results['shared']['us_per_search']})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=2000)
+    parser.add_argument('--drivers', type=int, default=11)
+    args = parser.parse_args()
+    print(json.dumps(run(args.number, args.drivers), indent=2))
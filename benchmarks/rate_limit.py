@@ -0,0 +1,90 @@
+"""
+Throttled vs. unthrottled searches against a local fake HTTP API.
+
+The fake API accepts `--server-rate` requests per second and answers 429 above that rate.  It also fails a fraction
+of requests with a 503, like an overloaded upstream API.  The same burst of searches is sent by a driver without
+retries or limits, and by a driver declaring a rate limit, adaptive concurrency and retries.
+
+Usage: python -m benchmarks.rate_limit [--searches 100] [--server-rate 50] [--error-rate 0.05]
+"""
+import argparse
+import json
+import threading
+import time
+
+import requests
+
+from datasources.executors import get_executor
+from datasources.sources.base import Datasource
+from datasources.testing import FakeServer
+
+
+class Unthrottled(Datasource):
+
+    stac_compliant = False
+    tags = ['Raster']
+    retries = 0
+
+    def __init__(self, manifest, url=None):
+        super().__init__(manifest)
+        self.url = url
+        self.session = requests.Session()
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+        pass
+
+    def execute(self, api_request):
+        r = self.session.get(self.url, params={'q': api_request})
+        r.raise_for_status()
+        return r.json()['results']
+
+
+class Throttled(Unthrottled):
+
+    rate_limit = None
+    rate_burst = 5
+    max_concurrency = 16
+    retries = 4
+    retry_backoff = 0.1
+
+
+def burst(source, searches, max_workers):
+    pool = get_executor('thread', max_workers)
+    start = time.perf_counter()
+    futures = [pool.submit(source, idx) for idx in range(searches)]
+    failed = sum(1 for future in futures if future.exception() is not None)
+    retries = sum(future.result()[1]['counters'].get('retries', 0) for future in futures
+                  if future.exception() is None)
+    return {
+        'succeeded': searches - failed,
+        'failed': failed,
+        'retries': retries,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def run(searches=100, server_rate=50, error_rate=0.05, max_workers=16):
+    results = {'searches': searches, 'server_rate': server_rate, 'error_rate': error_rate}
+    Throttled.rate_limit = server_rate
+    for cls in (Unthrottled, Throttled):
+        server = FakeServer(server_rate, error_rate)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            result = burst(cls(None, server.url), searches, max_workers)
+            result.update({'server_statuses': server.statuses})
+            results.update({cls.__name__.lower(): result})
+        finally:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--searches', type=int, default=100)
+    parser.add_argument('--server-rate', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--max-workers', type=int, default=16)
+    args = parser.parse_args()
+    print(json.dumps(run(args.searches, args.server_rate, args.error_rate, args.max_workers), indent=2))
@@ -0,0 +1,133 @@
+"""
+Synthetic datasources used by the offline benchmarks.
+
+`StubDatasource` answers searches locally after a configurable latency, with a configurable number of items of a
+configurable size, and fails a configurable fraction of its searches.  Use `stub_source` to derive a datasource
+with its own name and settings, and `stub_manifest` to build a `Manifest` of several stub datasources.
+"""
+import json
+import random
+import time
+
+from datasources import Manifest, metrics
+from datasources.sources.base import Datasource
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[-118.96, 34.96], [-111.71, 34.96], [-111.71, 40.75], [-118.96, 40.75], [-118.96, 34.96]]]
+}
+temporal = ("2018-10-30T06:30:00.000Z", "2018-12-31T23:59:59.999Z")
+
+
+class StubError(Exception):
+    pass
+
+
+def stub_item(source_name, idx, payload_bytes=0):
+    """
+    Valid STAC Item, padded with an asset description of `payload_bytes` characters.
+    """
+    x = -118.0 + (idx % 100) * 0.05
+    y = 35.0 + (idx // 100 % 100) * 0.05
+    return {
+        'id': '{}_{}'.format(source_name, idx),
+        'type': 'Feature',
+        'bbox': [x, y, x + 0.05, y + 0.05],
+        'geometry': {
+            'type': 'Polygon',
+            'coordinates': [[[x, y], [x + 0.05, y], [x + 0.05, y + 0.05], [x, y + 0.05], [x, y]]]
+        },
+        'properties': {
+            'datetime': '2018-11-{:02d}T18:30:00.000Z'.format(idx % 28 + 1),
+            'eo:cloud_cover': float(idx % 100),
+            'eo:gsd': 10.0,
+            'eo:platform': 'stub',
+        },
+        'assets': {
+            'thumbnail': {
+                'title': 'Thumbnail',
+                'href': 'https://example.com/{}/{}.jpg'.format(source_name, idx),
+                'description': 'x' * payload_bytes,
+            }
+        }
+    }
+
+
+class StubDatasource(Datasource):
+
+    stac_compliant = False
+    tags = ['EO', 'Raster']
+
+    # Seconds spent waiting on the "upstream API" per search
+    latency = 0.05
+    # Number of items returned per search (capped by the search limit) and padding added to each item in bytes
+    items = 100
+    payload_bytes = 1024
+    # Fraction of searches which raise `StubError`
+    failure_rate = 0.0
+    seed = 0
+    # Return a serialized FeatureCollection (bytes) like a STAC compliant API, requires `stac_compliant`
+    raw = False
+
+    def __init__(self, manifest):
+        super().__init__(manifest)
+        self.random = random.Random(self.seed)
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+        self.manifest.searches.append([self, {'spatial': spatial, 'temporal': temporal, 'limit': limit}])
+
+    def execute(self, api_request):
+        time.sleep(self.latency)
+        if self.random.random() < self.failure_rate:
+            raise StubError("{} failed".format(self.__class__.__name__))
+        name = self.__class__.__name__
+        items = [stub_item(name, idx, self.payload_bytes) for idx in range(min(self.items, api_request['limit']))]
+        if self.raw:
+            return json.dumps({'type': 'FeatureCollection', 'features': items}).encode('utf-8')
+        return items
+
+
+def stub_source(name, **settings):
+    """
+    :param settings: Overrides of the `StubDatasource` class attributes (latency, items, payload_bytes, ...).
+    :return: Subclass of `StubDatasource` named `name`.
+    """
+    return type(name, (StubDatasource,), settings)
+
+
+def stub_manifest(sources=4, **settings):
+    """
+    :return: Manifest containing `sources` stub datasources named `Stub0`, `Stub1`, ...
+    """
+    manifest = Manifest(tags=[])
+    for idx in range(sources):
+        name = 'Stub{}'.format(idx)
+        manifest.update({name: stub_source(name, seed=idx, **settings)(manifest)})
+    return manifest
+
+
+class LocalLambda(object):
+    """
+    Stand-in for `handler.lambda_invoke`.  Each invocation runs the driver handler (`driver/handler.py`) of a stub
+    datasource in-process, with the JSON round trips of a Lambda invocation.
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self.invocations = 0
+
+    def __call__(self, service, stage, source, args):
+        self.invocations += 1
+        manifest = Manifest(tags=[])
+        manifest.update({source: stub_source(source, seed=self.invocations, **self.settings)(manifest)})
+        with metrics.span('upstream'):
+            event = json.loads(json.dumps(args))
+            manifest[source].search(**event)
+            try:
+                response = manifest.execute_raw(use_cache=False)
+            except StubError as exc:
+                raise RuntimeError("{} failed: {}".format(source, exc))
+            payload = json.dumps(response.decode('utf-8'))
+        metrics.count('bytes', len(payload))
+        with metrics.span('parse'):
+            return json.loads(payload)
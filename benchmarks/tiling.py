@@ -0,0 +1,92 @@
+"""
+One large search vs. the same search split into tiles, against a local stub datasource.
+
+The stub serves a synthetic catalog of 0.25 degree footprints.  Like most upstream APIs it caps the number of items
+returned per request and takes longer to answer large requests, so a continental-scale search is both slow and
+incomplete when sent as a single query.  Both searches return at most `--limit` items, the merged response of the
+tiles is truncated to the limit like the single search.
+
+Usage: python -m benchmarks.tiling [--rows 4 --cols 4] [--max-per-source 8] [--limit 1000]
+"""
+import argparse
+import json
+import time
+
+from datasources import Manifest
+from datasources.sources.base import Datasource
+from datasources.tiling import GridTiling
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[-125.0, 25.0], [-67.0, 25.0], [-67.0, 49.0], [-125.0, 49.0], [-125.0, 25.0]]]
+}
+
+
+class TiledStub(Datasource):
+
+    stac_compliant = False
+    tags = ['Raster']
+
+    resolution = 0.25
+    # Maximum number of items returned per request
+    result_cap = 1000
+    # Request latency in seconds, fixed cost plus a cost per item scanned upstream
+    latency = 0.05
+    latency_per_item = 0.00002
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+        ring = spatial['coordinates'][0]
+        bbox = [min(x[0] for x in ring), min(x[1] for x in ring), max(x[0] for x in ring), max(x[1] for x in ring)]
+        self.manifest.searches.append([self, {'bbox': bbox, 'limit': limit}])
+
+    def execute(self, api_request):
+        xmin, ymin, xmax, ymax = api_request['bbox']
+        result_cap = min(self.result_cap, api_request['limit'])
+        cols = range(int(xmin // self.resolution), int(xmax // self.resolution) + 1)
+        rows = range(int(ymin // self.resolution), int(ymax // self.resolution) + 1)
+        time.sleep(self.latency + self.latency_per_item * len(cols) * len(rows))
+
+        items = []
+        for col in cols:
+            for row in rows:
+                if len(items) == result_cap:
+                    return items
+                x, y = col * self.resolution, row * self.resolution
+                items.append({
+                    'id': '{}_{}'.format(col, row),
+                    'type': 'Feature',
+                    'bbox': [x, y, x + self.resolution, y + self.resolution],
+                    'properties': {'datetime': '2019-01-01T00:00:00.000Z'},
+                })
+        return items
+
+
+def timed_search(tiling=None, max_per_source=None, limit=1000):
+    manifest = Manifest(tags=[])
+    manifest.update({'TiledStub': TiledStub(manifest)})
+    manifest.search(spatial, limit=limit, datasources=['TiledStub'], tiling=tiling)
+    start = time.perf_counter()
+    response = manifest.execute(max_workers=16, max_per_source=max_per_source)
+    return {
+        'searches': len(manifest.searches),
+        'items': len(response['TiledStub']['features']),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def run(rows=4, cols=4, max_per_source=8, limit=1000):
+    return {
+        'limit': limit,
+        'single': timed_search(limit=limit),
+        'tiled': timed_search(GridTiling(rows, cols), max_per_source, limit),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=4)
+    parser.add_argument('--cols', type=int, default=4)
+    parser.add_argument('--max-per-source', type=int, default=8)
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.cols, args.max_per_source, args.limit), indent=2))
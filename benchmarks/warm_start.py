@@ -0,0 +1,106 @@
+"""
+Cold vs. warm invocation latency of a driver's Lambda handler, using a local invoke harness.
+
+Copies the library into a temporary directory with a stub driver whose instantiation is slow (opening an HTTP session,
+loading a spatial index, ...), renders the driver handler template (`driver/handler.py`) for it and invokes the handler
+repeatedly in a fresh interpreter, as a Lambda container would.  `legacy` is the previous handler, which created a new
+`Manifest` on every invocation.
+
+Usage: python -m benchmarks.warm_start [--init-cost 0.1] [--invocations 10]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+root = os.path.join(os.path.dirname(__file__), '..')
+
+driver = '''import time
+
+from datasources.sources.base import Datasource
+
+
+class StubSat(Datasource):
+
+    stac_compliant = False
+    tags = ['EO', 'Raster']
+
+    def __init__(self, manifest):
+        super().__init__(manifest)
+        # Simulate creating a session and loading precomputed indexes
+        time.sleep({init_cost})
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+        self.manifest.searches.append([self, {{'spatial': spatial, 'limit': limit}}])
+
+    def execute(self, api_request):
+        return []
+'''
+
+legacy_handler = '''from datasources import Manifest
+
+def StubSat(event, context):
+    manifest = Manifest()
+    manifest['StubSat'].search(**event)
+    response = manifest.execute()
+    return response
+'''
+
+harness = '''import json
+import time
+
+event = {{'spatial': {{'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}}}}
+timings = []
+start = time.perf_counter()
+from {module} import StubSat
+for _ in range({invocations}):
+    StubSat(event, None)
+    timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+print(json.dumps(timings))
+'''
+
+
+def install(directory, init_cost):
+    shutil.copytree(os.path.join(root, 'datasources'), os.path.join(directory, 'datasources'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    with open(os.path.join(directory, 'datasources', 'sources', 'StubSat.py'), 'w') as f:
+        f.write(driver.format(init_cost=init_cost))
+    with open(os.path.join(root, 'driver', 'handler.py')) as f:
+        template = f.read()
+    with open(os.path.join(directory, 'pooled_handler.py'), 'w') as f:
+        f.write(template.replace('__TEMPLATENAME__', 'StubSat'))
+    with open(os.path.join(directory, 'legacy_handler.py'), 'w') as f:
+        f.write(legacy_handler)
+
+
+def run(init_cost=0.1, invocations=10):
+    directory = tempfile.mkdtemp()
+    try:
+        install(directory, init_cost)
+        results = {'init_cost': init_cost, 'invocations': invocations}
+        for (name, module) in [('legacy', 'legacy_handler'), ('pooled', 'pooled_handler')]:
+            out = subprocess.check_output(
+                [sys.executable, '-c', harness.format(module=module, invocations=invocations)],
+                cwd=directory, env=dict(os.environ, PYTHONPATH=directory)
+            )
+            timings = json.loads(out.decode())
+            results.update({name: {
+                'cold': timings[0],
+                'warm_mean': sum(timings[1:]) / len(timings[1:]),
+                'warm_min': min(timings[1:]),
+            }})
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--init-cost', type=float, default=0.1)
+    parser.add_argument('--invocations', type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.init_cost, args.invocations), indent=2))
@@ -1,5 +1,5 @@
 from . import sources
-from .manifest import Manifest
+from .manifest import Manifest, ManifestPool
 
 
 layer_arn = 'arn:aws:lambda:us-east-1:725820063953:layer:cognition-datasources:8'
\ No newline at end of file
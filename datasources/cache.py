@@ -0,0 +1,198 @@
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+MISS = object()
+
+
+def _canonical(value):
+    """
+    JSON serializable representation of the values of an `api_request` which aren't JSON types.  Objects define a
+    `__cache_key__` method, ex. `STACQuery`.
+    """
+    if hasattr(value, '__cache_key__'):
+        return value.__cache_key__()
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    # The repr of most objects holds their memory address, it would differ between processes and runs
+    raise TypeError("Can't build a cache key from {!r}, define a `__cache_key__` method".format(value))
+
+
+def request_key(source_name, api_request):
+    """
+    Canonical key for a search, built from the datasource name and the `api_request` appended to `manifest.searches`.
+    Dictionaries are serialized with sorted keys so equivalent requests share a key.
+
+    :raises TypeError: if the request holds values which can't be serialized canonically.
+    """
+    canonical = json.dumps(api_request, sort_keys=True, separators=(',', ':'), default=_canonical)
+    return hashlib.sha256("{}:{}".format(source_name, canonical).encode('utf-8')).hexdigest()
+
+
+class Cache(object):
+    """
+    Base class for query result caches used by `Manifest.execute`.  Entries expire after `ttl` seconds (overridden per
+    datasource with `source_ttl`) and the least recently used entry is evicted once `max_size` entries are stored.
+    """
+
+    def __init__(self, ttl=3600, max_size=1024, source_ttl=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.source_ttl = source_ttl or {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def get(self, source_name, api_request):
+        """
+        :return: Cached response or `MISS`.
+        """
+        key = request_key(source_name, api_request)
+        with self.lock:
+            value = self._get(key)
+            if value is MISS:
+                self.misses += 1
+                return MISS
+            self.hits += 1
+        return pickle.loads(value)
+
+    def set(self, source_name, api_request, response):
+        ttl = self.source_ttl.get(source_name, self.ttl)
+        if not ttl:
+            return
+        key = request_key(source_name, api_request)
+        # Responses are stored pickled so callers can't mutate cached entries
+        value = pickle.dumps(response, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._set(key, value, time.time() + ttl)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, expires):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryCache(Cache):
+
+    def __init__(self, ttl=3600, max_size=1024, source_ttl=None):
+        super().__init__(ttl, max_size, source_ttl)
+        self.entries = OrderedDict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _get(self, key):
+        if key not in self.entries:
+            return MISS
+        expires, value = self.entries[key]
+        if expires < time.time():
+            del self.entries[key]
+            return MISS
+        self.entries.move_to_end(key)
+        return value
+
+    def _set(self, key, value, expires):
+        self.entries[key] = (expires, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DiskCache(Cache):
+    """
+    Cache stored as one file per entry.  Defaults to a directory in `/tmp` so entries survive across warm Lambda
+    invocations.  File modification times track recency for LRU eviction, once more than `max_size` entries are stored
+    the least recently used are evicted down to 90% of `max_size`.
+    """
+
+    def __init__(self, ttl=3600, max_size=1024, source_ttl=None, directory=None):
+        super().__init__(ttl, max_size, source_ttl)
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'cognition-datasources-cache')
+        os.makedirs(self.directory, exist_ok=True)
+        # Approximate number of entries, the directory is only listed once it exceeds `max_size`
+        self.size = len(self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, '{}.pkl'.format(key))
+
+    def _entries(self):
+        return [os.path.join(self.directory, x) for x in os.listdir(self.directory) if x.endswith('.pkl')]
+
+    @staticmethod
+    def _remove(path):
+        # Entries may be removed concurrently by other threads or processes sharing the directory
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            for path in self._entries():
+                self._remove(path)
+            self.size = 0
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return MISS
+        if expires < time.time():
+            self._remove(path)
+            return MISS
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def _set(self, key, value, expires):
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.size += 1
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+        if self.size > self.max_size:
+            # Evict down to 90% of `max_size` so the directory isn't listed again on the next insertions
+            entries = []
+            for entry in self._entries():
+                try:
+                    entries.append((os.path.getmtime(entry), entry))
+                except FileNotFoundError:
+                    pass
+            entries.sort()
+            keep = int(self.max_size * 0.9)
+            for (_, entry) in entries[:max(0, len(entries) - keep)]:
+                self._remove(entry)
+            self.size = min(len(entries), keep)
+
+    def __len__(self):
+        return len(self._entries())
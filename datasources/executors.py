@@ -0,0 +1,175 @@
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from datasources import metrics
+from datasources.pagination import collect_pages, collect_async_pages
+from datasources.throttle import get_throttle
+
+DEFAULT_MAX_WORKERS = 16
+
+
+def _execute(source, api_request, limit=None):
+    """Internal use"""
+    if limit is not None and limit <= 0:
+        return []
+    response = source.execute(api_request)
+    if inspect.iscoroutine(response) or inspect.isasyncgen(response):
+        # Coroutine drivers run outside of the asyncio executor get their own event loop
+        loop = asyncio.new_event_loop()
+        try:
+            if inspect.isasyncgen(response):
+                response = collect_async_pages(get_throttle(source).async_pages(response), limit)
+            response = loop.run_until_complete(response)
+        finally:
+            loop.close()
+    # Paginated drivers yield pages lazily, stop requesting pages once the limit is met
+    if inspect.isgenerator(response):
+        response = collect_pages(get_throttle(source).pages(response), limit)
+    return response
+
+
+def _timed_execute(source, api_request, limit=None):
+    """
+    Run `_execute` within the datasource's throttle (see `datasources.throttle`), recording the `execute` span, the
+    number of `retries` and any span or counter reported by the driver.
+
+    :return: (response, metrics record as a dictionary)
+    """
+    record = metrics.SearchMetrics(source.__class__.__name__)
+    with metrics.recording(record), record.span('execute'):
+        response, retries = get_throttle(source).call(source, _execute, source, api_request, limit)
+    if retries:
+        record.count('retries', retries)
+    return response, record.to_dict()
+
+
+class Executor(object):
+    """
+    Backend used by `Manifest.execute` to run driver searches concurrently.  Executors are reusable across calls to
+    `Manifest.execute`, the manifest itself caps the number of searches in flight at `max_workers`.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+
+    def submit(self, source, api_request, limit=None):
+        """
+        Schedule `source.execute(api_request)` and return a `concurrent.futures.Future` for its result and metrics
+        record (see `_timed_execute`).  Paginated responses are collected until `limit` items are returned.
+        """
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class ThreadExecutor(Executor):
+    """
+    Bounded thread pool.  Driver work is mostly network I/O so this is the default backend.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        super().__init__(max_workers)
+        self.pool = ThreadPoolExecutor(max_workers)
+
+    def submit(self, source, api_request, limit=None):
+        return self.pool.submit(_timed_execute, source, api_request, limit)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+class ProcessExecutor(Executor):
+    """
+    Reusable process pool for CPU-bound drivers.  The driver instance is pickled without its manifest (see
+    `Datasource.__getstate__`), so drivers must be picklable.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        super().__init__(max_workers)
+        self.pool = ProcessPoolExecutor(max_workers)
+
+    def submit(self, source, api_request, limit=None):
+        return self.pool.submit(_timed_execute, source, api_request, limit)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+class AsyncioExecutor(Executor):
+    """
+    Event loop running in a background thread.  Drivers which define `execute` as a coroutine function are awaited
+    directly on the loop, blocking drivers are run in the loop's thread pool.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        super().__init__(max_workers)
+        self.pool = ThreadPoolExecutor(max_workers)
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.pool)
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def _execute(self, source, api_request, limit=None):
+        if not (asyncio.iscoroutinefunction(source.execute) or inspect.isasyncgenfunction(source.execute)):
+            return await self.loop.run_in_executor(None, functools.partial(_timed_execute, source, api_request, limit))
+
+        # Coroutines share the loop's thread, so only the `execute` span is recorded for them
+        async def execute():
+            if limit is not None and limit <= 0:
+                return []
+            if inspect.isasyncgenfunction(source.execute):
+                pages = get_throttle(source).async_pages(source.execute(api_request))
+                return await collect_async_pages(pages, limit)
+            return await source.execute(api_request)
+
+        record = metrics.SearchMetrics(source.__class__.__name__)
+        start = time.perf_counter()
+        response, retries = await get_throttle(source).call_async(source, execute)
+        record.add_span('execute', time.perf_counter() - start)
+        if retries:
+            record.count('retries', retries)
+        return response, record.to_dict()
+
+    def submit(self, source, api_request, limit=None):
+        return asyncio.run_coroutine_threadsafe(self._execute(source, api_request, limit), self.loop)
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.pool.shutdown()
+
+
+backends = {
+    'thread': ThreadExecutor,
+    'process': ProcessExecutor,
+    'asyncio': AsyncioExecutor,
+}
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(executor='thread', max_workers=None):
+    """
+    Return the executor shared by every search of the process for the requested backend, creating it on first use so
+    pools (and the connections held by drivers running in them) are reused across searches.  The number of searches
+    in flight is capped by `Manifest.execute`, not by the size of the pool.
+
+    :param executor: Name of the backend (`thread`, `process` or `asyncio`) or an `Executor` instance.
+    :param max_workers: Size of the pool when it is created, at least `DEFAULT_MAX_WORKERS`.  Searches beyond the
+        size of an existing pool wait in its queue.
+    """
+    if isinstance(executor, Executor):
+        return executor
+    if executor not in backends:
+        raise ValueError("Unknown executor `{}`, expecting one of {}".format(executor, list(backends)))
+    with _lock:
+        if executor not in _executors:
+            _executors[executor] = backends[executor](max(max_workers or 0, DEFAULT_MAX_WORKERS))
+        return _executors[executor]
@@ -0,0 +1,172 @@
+"""
+Concurrent, cached downloads of remote driver files (configs, handlers, drivers, READMEs, examples and CI statuses)
+used by the `cognition-datasources` CLI.
+
+Downloaded files are stored once per content in `objects/<sha256 of the content>`, and each URL has an entry in
+`urls/<sha256 of the URL>.json` holding the digest of its last response with its `ETag` and `Last-Modified` headers.
+Cached URLs younger than `ttl` seconds aren't requested at all, older ones are revalidated with conditional requests
+(`If-None-Match` / `If-Modified-Since`) so unchanged files are never downloaded twice.  A conditional request costs
+the same round trip as a download of a small file, so only fresh entries avoid the latency.  When the network is
+unavailable (or `offline` is set) cached files are reused as-is.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FETCH_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'cognition-datasources')
+
+# Driver files are reused for 5 minutes without revalidation, so repeated CLI runs don't wait on the network
+FETCH_TTL = 300
+# CI statuses are reused for 10 minutes instead of querying CircleCI on every `load`
+CI_STATUS_TTL = 600
+
+
+class FetchError(Exception):
+    pass
+
+
+class Fetcher(object):
+    """
+    :param directory: Cache directory, defaults to `$COGNITION_DATASOURCES_CACHE` or `~/.cache/cognition-datasources`.
+    :param offline: Only serve cached files, never send requests.
+    :param ttl: Seconds during which a cached file is reused without revalidation, defaults to `FETCH_TTL` (0 always
+        revalidates).
+    """
+
+    def __init__(self, directory=None, offline=False, ttl=None, max_workers=16, timeout=30, session=None):
+        self.directory = directory or os.environ.get('COGNITION_DATASOURCES_CACHE', FETCH_DIRECTORY)
+        self.offline = offline
+        self.ttl = FETCH_TTL if ttl is None else ttl
+        self.max_workers = max_workers
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        for folder in ('objects', 'urls'):
+            os.makedirs(os.path.join(self.directory, folder), exist_ok=True)
+        self.stats = {'downloaded': 0, 'revalidated': 0, 'cached': 0}
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def _entry_path(self, url):
+        return os.path.join(self.directory, 'urls', '{}.json'.format(self.digest(url.encode('utf-8'))))
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest)
+
+    def _write(self, path, data):
+        # Written to a temporary file first so concurrent fetches never read partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _entry(self, url):
+        """
+        :return: (cache entry, cached content) of `url`, or (None, None).
+        """
+        try:
+            with open(self._entry_path(url), 'r') as f:
+                entry = json.load(f)
+            with open(self._object_path(entry['digest']), 'rb') as f:
+                return entry, f.read()
+        except (OSError, ValueError, KeyError):
+            return None, None
+
+    def _store(self, url, response):
+        content = response.content
+        digest = self.digest(content)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            self._write(path, content)
+        entry = {
+            'digest': digest,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched': time.time(),
+        }
+        self._write(self._entry_path(url), json.dumps(entry).encode('utf-8'))
+        return content
+
+    def _count(self, name):
+        # Only used for reporting, races between threads are harmless
+        self.stats[name] += 1
+
+    def get(self, url, ttl=None):
+        """
+        :param ttl: Overrides `Fetcher.ttl` for this URL.
+        :return: Content of `url` (bytes).
+        """
+        ttl = self.ttl if ttl is None else ttl
+        entry, content = self._entry(url)
+        if entry is not None and (self.offline or time.time() - entry['fetched'] < ttl):
+            self._count('cached')
+            return content
+        if self.offline:
+            raise FetchError("{} isn't cached and fetching is offline".format(url))
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+            if entry is None:
+                raise FetchError("Failed to fetch {}: {}".format(url, exc))
+            print("WARNING: Failed to fetch {}, using the cached copy.".format(url))
+            self._count('cached')
+            return content
+
+        if r.status_code == 304 and entry is not None:
+            entry['fetched'] = time.time()
+            self._write(self._entry_path(url), json.dumps(entry).encode('utf-8'))
+            self._count('revalidated')
+            return content
+        if r.status_code != 200:
+            raise FetchError("Failed to fetch {}: HTTP {}".format(url, r.status_code))
+        self._count('downloaded')
+        return self._store(url, r)
+
+    def get_text(self, url, ttl=None):
+        return self.get(url, ttl).decode('utf-8')
+
+    def get_json(self, url, ttl=None):
+        return json.loads(self.get_text(url, ttl))
+
+    def map(self, fn, iterable):
+        """
+        Call `fn` on each value of `iterable` concurrently.
+
+        :return: List of results, in the order of `iterable`.
+        """
+        iterable = list(iterable)
+        if len(iterable) < 2:
+            return [fn(x) for x in iterable]
+        with ThreadPoolExecutor(min(self.max_workers, len(iterable))) as pool:
+            return list(pool.map(fn, iterable))
+
+    def get_many(self, urls, ttl=None):
+        """
+        :return: List of contents (bytes), in the order of `urls`.
+        """
+        return self.map(lambda url: self.get(url, ttl), urls)
+
+    def ci_status(self, project_path, token, ttl=CI_STATUS_TTL):
+        """
+        :return: Status of the last CircleCI build of a GitHub project (ex. `success`).
+        """
+        url = 'https://circleci.com/api/v1.1/project/github/{}?circle-token={}&limit=1'.format(project_path, token)
+        return self.get_json(url, ttl)[0]['status']
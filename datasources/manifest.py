@@ -1,81 +1,534 @@
-from multiprocessing import Process, Pipe
+import inspect
+import json
+import threading
+from collections import Counter, deque
+from collections.abc import ItemsView, KeysView, ValuesView
+from contextlib import contextmanager
+from itertools import chain
+from concurrent.futures import wait, FIRST_COMPLETED
 
+from datasources import metrics
 from datasources.sources import collections
+from datasources.executors import get_executor, _timed_execute
+from datasources.cache import MISS, request_key
+from datasources.merge import FeatureMerger
+from datasources.singleflight import singleflight, completed
+from datasources.throttle import get_throttle
+from datasources.stac.query import STACQuery
+from datasources.tiling import tile
+
+# Whether the `search` method of each driver class takes a precompiled `stac_query`
+_accepts_stac_query = {}
+
+
+def accepts_stac_query(source):
+    cls = source.__class__
+    if cls not in _accepts_stac_query:
+        _accepts_stac_query[cls] = 'stac_query' in inspect.signature(source.search).parameters
+    return _accepts_stac_query[cls]
+
 
 class Manifest(dict):
 
     # shouldn't use mutable default
-    def __init__(self, tags=['all']):
+    def __init__(self, tags=['all'], cache=None):
         super().__init__()
         self.searches = []
+        self.cache = cache
+        self.registered = set()
+        # `datasources.metrics.SearchMetrics` of each datasource searched since the last execution or flush
+        self.metrics = {}
         self.load_sources(tags)
 
     @property
     def sources(self):
-        for (k,v) in self.items():
-            yield v
+        for name in list(self):
+            yield self[name]
 
     def load_sources(self, tags):
-        tagged = []
+        """
+        Register the drivers matching `tags`.  Drivers are imported and instantiated on first access.
+        """
         for tag in tags:
-            tagged += getattr(collections, tag)
-        tagged = list(set(tagged))
+            self.registered.update(collections.names(tag))
+
+    def __missing__(self, key):
+        if key not in self.registered:
+            raise KeyError(key)
+        source = collections.load(key)(self)
+        self.update({key: source})
+        return source
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self.registered
+
+    # Registered drivers are listed like loaded ones, `values` and `items` load them as they are enumerated
+    def __iter__(self):
+        return iter(list(dict.keys(self)) + sorted(x for x in self.registered if not dict.__contains__(self, x)))
+
+    def __len__(self):
+        return len(set(dict.keys(self)) | self.registered)
 
-        for source in tagged:
-            self.update({source.__name__: source(self)})
+    def keys(self):
+        return KeysView(self)
 
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
 
     def flush(self):
         self.searches = []
+        self.metrics = {}
+
+    def record(self, source_name):
+        """
+        :return: Metrics of a datasource, see `datasources.metrics`.
+        """
+        if source_name not in self.metrics:
+            self.metrics.update({source_name: metrics.SearchMetrics(source_name)})
+        return self.metrics[source_name]
+
+    def _emit_metrics(self):
+        """
+        Pass the metrics of each datasource to the hooks of `datasources.metrics`, then start new records so the next
+        execution only reports its own searches.
+        """
+        records, self.metrics = self.metrics, {}
+        for source_metrics in records.values():
+            metrics.emit(source_metrics)
+
+    @staticmethod
+    def search_limit(search, limit=None):
+        """
+        Limit of a search, the smallest of the `limit` passed to `Manifest.execute` and the optional options appended
+        by the driver (`[self, api_request, {'limit': limit}]`).
+        """
+        limits = [x for x in (limit, search[2].get('limit') if len(search) > 2 else None) if x is not None]
+        return min(limits) if limits else None
+
+    @staticmethod
+    def spatial_filter(search):
+        """
+        `STACQuery` whose exact geometry filters the items of a search, see `Manifest.search(exact=True)`.
+        """
+        return search[2].get('spatial_filter') if len(search) > 2 else None
+
+    @staticmethod
+    def merge_limit(search):
+        """
+        Maximum number of items in the merged response of the datasource of a tiled search, the `limit` passed to
+        `Manifest.search(tiling=...)`.
+        """
+        return search[2].get('merge_limit') if len(search) > 2 else None
+
+    @classmethod
+    def request(cls, search, limit=None):
+        """
+        Request identifying a search in the cache and between concurrent identical searches.
+        """
+        # Paginated responses are truncated at the limit, so it is part of the request
+        search_limit = cls.search_limit(search, limit)
+        return search[1] if search_limit is None else {'api_request': search[1], 'limit': search_limit}
+
+    @classmethod
+    def cacheable(cls, search, limit=None):
+        """
+        Whether the request of a search can be serialized into a cache key (see `datasources.cache.request_key`).
+        Other searches are neither cached nor coalesced.
+        """
+        try:
+            request_key(search[0].__class__.__name__, cls.request(search, limit))
+        except TypeError:
+            return False
+        return True
+
+    def _dispatch(self, searches, executor='thread', max_workers=None, use_cache=True, limit=None,
+                  max_per_source=None, coalesce=True):
+        """
+        Run each search and yield `(search, stac_items, record)` in completion order, where `record` holds the metrics
+        of the search.  Searches found in the cache are yielded without being executed.  `searches` may be any
+        iterable, it is consumed as workers become available.
+        """
+        cache = self.cache if use_cache else None
+
+        for search, stac_items, record in self._run(searches, executor, max_workers, limit, max_per_source, coalesce,
+                                                    cache):
+            # Only successful searches which returned items are cached, failures raise before reaching this point
+            if cache is not None and stac_items and not record['counters'].get('cache_hits') and \
+                    not (isinstance(stac_items, dict) and not stac_items.get('features')) and \
+                    self.cacheable(search, limit):
+                cache.set(search[0].__class__.__name__, self.request(search, limit), stac_items)
+            yield search, stac_items, record
+
+    def _submit(self, submit, search, limit=None, coalesce=True, cache=None):
+        """
+        Schedule a search with `submit`, unless its response is cached or an identical search is already in flight in
+        this process.
+        """
+        if not self.cacheable(search, limit):
+            return submit()
+        if cache is not None:
+            stac_items = cache.get(search[0].__class__.__name__, self.request(search, limit))
+            if stac_items is not MISS:
+                return completed(lambda: (stac_items, {'spans': {}, 'counters': {'cache_hits': 1}}))
+        if not coalesce:
+            return submit()
+        key = request_key(search[0].__class__.__name__, self.request(search, limit))
+        # Only the search which made the upstream request reports its spans, the others count as coalesced
+        return singleflight.submit(key, submit,
+                                   joined=lambda result: (result[0], {'spans': {}, 'counters': {'coalesced': 1}}))
+
+    def _run(self, searches, executor='thread', max_workers=None, limit=None, max_per_source=None, coalesce=True,
+             cache=None):
+        """
+        Execute searches on the requested executor, keeping at most `max_workers` searches in flight and at most
+        `max_per_source` searches (or the adaptive limit of its throttle) of a single datasource.
+        """
+        queued = iter(searches)
+        first = next(queued, None)
+        if first is None:
+            return
+        second = next(queued, None)
+
+        # Run in main thread if only a single search
+        if second is None:
+            future = self._submit(
+                lambda: completed(_timed_execute, first[0], first[1], self.search_limit(first, limit)),
+                first, limit, coalesce, cache
+            )
+            stac_items, record = future.result()
+            yield first, stac_items, record
+            return
+
+        pool = get_executor(executor, max_workers)
+        # The pool is shared, the searches in flight are capped here
+        if max_workers is None:
+            max_workers = min(len(searches), pool.max_workers) if isinstance(searches, list) else pool.max_workers
+        queued = chain([first, second], queued)
+        # Searches held back because their datasource is at `max_per_source`
+        deferred = deque()
+        active = Counter()
+        pending = {}
+
+        def ready(search):
+            running = active[search[0].__class__.__name__]
+            # The datasource's adaptive concurrency limit, see `datasources.throttle`
+            concurrency = get_throttle(search[0]).concurrency
+            return (not max_per_source or running < max_per_source) and (not concurrency or running < concurrency)
+
+        def next_search():
+            for search in deferred:
+                if ready(search):
+                    deferred.remove(search)
+                    return search
+            for search in queued:
+                if ready(search):
+                    return search
+                deferred.append(search)
+                if len(deferred) >= 4 * max_workers:
+                    break
+            return None
+
+        try:
+            while True:
+                while len(pending) < max_workers:
+                    search = next_search()
+                    if search is None:
+                        break
+                    active[search[0].__class__.__name__] += 1
+                    future = self._submit(
+                        lambda: pool.submit(search[0], search[1], self.search_limit(search, limit)),
+                        search, limit, coalesce, cache
+                    )
+                    pending[future] = search
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    search = pending.pop(future)
+                    active[search[0].__class__.__name__] -= 1
+                    stac_items, record = future.result()
+                    yield search, stac_items, record
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, datasources=None, tiling=None, exact=False,
+               **kwargs):
+        """
+        Queue a search of several datasources at once.  The query is validated and compiled into a single `STACQuery`
+        passed to every driver whose `search` takes a `stac_query` argument, other drivers receive the raw arguments.
+
+        :param datasources: Names of the datasources to search, defaults to every datasource of the manifest (an empty
+            list searches none).
+        :param tiling: Optional `datasources.tiling.GridTiling` or `QuadtreeTiling`.  The search area is split into
+            tiles which are searched separately, results are merged and deduplicated by `Manifest.execute`, and the
+            merged response of each datasource is truncated to `limit` items.  Use the `max_per_source` argument of
+            `Manifest.execute` to limit how many tiles of a datasource run concurrently.
+        :param exact: Only return items intersecting the exact search area.  Drivers are searched with a geometry
+            simplified to their `max_vertices` (see `STACQuery.upstream`) and items are filtered locally once
+            returned, which also removes the false positives of drivers only searching the bounding box.  Requires
+            shapely.
+        """
+        areas = [spatial]
+        if tiling:
+            areas = tile(STACQuery(spatial).spatial, tiling)
+        first_search = len(self.searches)
+        queries = None
+        for name in (list(self) if datasources is None else datasources):
+            source = self[name]
+            shared = accepts_stac_query(source)
+            if not (shared or exact):
+                for area in areas:
+                    with self.record(name).span('query'):
+                        source.search(area, temporal=temporal, properties=properties, limit=limit, **kwargs)
+                continue
+            if queries is None:
+                queries = [STACQuery(area, temporal, properties) for area in areas]
+            for query in queries:
+                upstream = query.upstream(source.max_vertices) if exact else query
+                queued = len(self.searches)
+                with self.record(name).span('query'):
+                    if shared:
+                        source.search(upstream.spatial, temporal=temporal, properties=properties, limit=limit,
+                                      stac_query=upstream, **kwargs)
+                    else:
+                        source.search(upstream.spatial, temporal=temporal, properties=properties, limit=limit,
+                                      **kwargs)
+                if exact:
+                    # Tag the searches queued by the driver with the exact query
+                    for idx in range(queued, len(self.searches)):
+                        search = self.searches[idx]
+                        options = dict(search[2]) if len(search) > 2 else {}
+                        options.update({'spatial_filter': query})
+                        self.searches[idx] = [search[0], search[1], options]
+        if tiling and limit is not None:
+            # Each tile returns up to `limit` items, the merged response of the tiles is truncated to `limit` too
+            for idx in range(first_search, len(self.searches)):
+                search = self.searches[idx]
+                options = dict(search[2]) if len(search) > 2 else {}
+                options.update({'limit': self.search_limit(search, limit), 'merge_limit': limit})
+                self.searches[idx] = [search[0], search[1], options]
+
+    def execute_iter(self, executor='thread', max_workers=None, use_cache=True, limit=None, max_per_source=None,
+                     coalesce=True):
+        """
+        Execute all queued searches, yielding results as each search completes.
+
+        :param executor: Backend used to run searches concurrently (`thread`, `process`, `asyncio`), or an instance of
+            `datasources.executors.Executor`.
+        :param max_workers: Maximum number of searches executed concurrently.
+        :param use_cache: Set to False to bypass the manifest's cache for this execution.
+        :param limit: Maximum number of items returned by each search.  Paginated drivers stop requesting pages once
+            it is met.
+        :param max_per_source: Maximum number of searches of a single datasource executed concurrently.
+        :param coalesce: Share a single upstream request between identical searches in flight at the same time, from
+            this or any other manifest of the process.
+        :return: Generator of `(source_name, feature_collection)` in completion order.  A datasource is yielded once
+            per search.  The metrics of each datasource (see `Manifest.metrics`) are passed to the hooks registered
+            with `datasources.metrics.add_hook` once every search completed.
+        """
+        for search, stac_items, record in self._dispatch(self.searches, executor, max_workers, use_cache, limit,
+                                                          max_per_source, coalesce):
+            yield search[0].__class__.__name__, self._feature_collection(search, stac_items, record)
 
-    def execute(self):
-        response = {}
+        self._emit_metrics()
+
+    def _feature_collection(self, search, stac_items, record):
+        """
+        Format a driver response into a feature collection and record the metrics of its search.
+        """
+        if search[0].stac_compliant and isinstance(stac_items, bytes):
+            with self.record(search[0].__class__.__name__).span('parse'):
+                stac_items = json.loads(stac_items.decode('utf-8'))
+        if search[0].stac_compliant and stac_items:
+            feature_collection = stac_items
+        else:
+            feature_collection = {
+                "type": "FeatureCollection",
+                "features": stac_items or []
+            }
+        source_metrics = self.record(search[0].__class__.__name__)
+        source_metrics.update(record)
+        source_metrics.count('searches')
+        query = self.spatial_filter(search)
+        if query is not None and feature_collection['features']:
+            features = feature_collection['features']
+            with source_metrics.span('filter'):
+                mask = query.check_intersects_batch(features)
+                feature_collection = dict(feature_collection, features=[x for (x, m) in zip(features, mask) if m])
+            source_metrics.count('filtered', len(features) - len(feature_collection['features']))
+        source_metrics.count('items', len(feature_collection['features']))
+        return feature_collection
+
+    def execute(self, merge_policy='first', **kwargs):
+        """
+        Execute all queued searches.  Accepts the same arguments as `execute_iter`.  Items returned by several searches
+        of a datasource (ex. overlapping tiles) are only included once.
+
+        :param merge_policy: Which duplicate item is kept, see `datasources.merge.FeatureMerger`.
+        :return: Dictionary of feature collections keyed by datasource name.
+        """
+        merger = FeatureMerger(merge_policy)
+        for search in self.searches:
+            merger.declare(search[0].__class__.__name__, self.merge_limit(search))
+
+        for source_name, feature_collection in self.execute_iter(**kwargs):
+            with self.record(source_name).span('merge'):
+                merger.add(source_name, feature_collection)
+
+        return merger.response
+
+    def execute_raw(self, merge_policy='first', spill=None, **kwargs):
+        """
+        Execute all queued searches into a JSON document, equivalent to `json.dumps(manifest.execute())`.  STAC compliant
+        drivers may return the upstream FeatureCollection as bytes from their `execute` method, these responses are
+        spliced into the document without being parsed when the datasource was only searched once (and not with
+        `exact=True`).  Accepts the same arguments as `Manifest.execute`.
+
+        :param spill: Optional `datasources.storage.Spiller`, large feature collections are written to storage and
+            replaced by pointers so the document stays under the spiller's threshold.
+        :return: UTF-8 encoded JSON object of feature collections keyed by datasource name.
+        """
+        searches = Counter(search[0].__class__.__name__ for search in self.searches)
+        merger = FeatureMerger(merge_policy)
+        segments = {}
         for search in self.searches:
+            merger.declare(search[0].__class__.__name__, self.merge_limit(search))
+
+        for search, stac_items, record in self._dispatch(self.searches, **kwargs):
             source_name = search[0].__class__.__name__
-            if source_name not in response:
-                response.update({source_name: {
-                    "type": "FeatureCollection",
-                    "features": []
-                }})
-
-        response_list = []
-        # Run in main process if only a single search
-        if len(self.searches) == 1:
-            print("Detecting a single search (inside driver)")
-            resp = {
-                'stac_items': self.searches[0][0].execute(self.searches[0][1]),
-                'source': self.searches[0][0].__class__.__name__
-            }
-            print(resp)
-            response_list.append(resp)
-        # Spawn child processes if multiple searches
-        else:
-            processes = []
-            parent_connections = []
-
-            for search in self.searches:
-                parent_conn, child_conn = Pipe()
-                parent_connections.append(parent_conn)
-                process = Process(target=search[0].execute_multi, args=(search[1], child_conn))
-                processes.append(process)
-
-            for process in processes:
-                process.start()
-
-            for process in processes:
-                process.join()
-
-            for parent_connection in parent_connections:
-                resp = parent_connection.recv()
-                response_list.append(resp)
-
-        # Format driver response into feature collection
-        for resp in response_list:
-            if resp['stac_items']:
-                stac_compliant = self[resp['source']].stac_compliant
-                if stac_compliant:
-                    response.update({resp['source']: resp['stac_items']})
-                else:
-                    [response[resp['source']]['features'].append(x) for x in resp['stac_items']]
-
-        return response
\ No newline at end of file
+            if isinstance(stac_items, bytes) and searches[source_name] == 1 and self.spatial_filter(search) is None \
+                    and self.merge_limit(search) is None:
+                source_metrics = self.record(source_name)
+                source_metrics.update(record)
+                source_metrics.count('searches')
+                source_metrics.count('bytes', len(stac_items))
+                segments.update({source_name: stac_items})
+                continue
+            feature_collection = self._feature_collection(search, stac_items, record)
+            with self.record(source_name).span('merge'):
+                merger.add(source_name, feature_collection)
+
+        members = []
+        for (source_name, feature_collection) in merger.response.items():
+            with self.record(source_name).span('serialization'):
+                members.append((source_name,
+                                segments.get(source_name) or json.dumps(feature_collection).encode('utf-8')))
+        if spill is not None:
+            members = spill.fit(members, {k: len(v['features']) for (k, v) in merger.response.items()
+                                          if k not in segments})
+
+        self._emit_metrics()
+
+        return b'{' + b', '.join(json.dumps(k).encode('utf-8') + b': ' + v for (k, v) in members) + b'}'
+
+    def search_many(self, geometries, temporal=None, properties=None, limit=10, datasources=None, skip=None,
+                    executor='thread', max_workers=None, max_per_source=None, use_cache=True, coalesce=True,
+                    merge_policy='first', **kwargs):
+        """
+        Search and execute many areas (ex. thousands of field polygons) at once, with the drivers and executor shared
+        by every area.  Areas are searched lazily as workers become available, so memory use doesn't grow with the
+        number of areas.  Searches queued with `Manifest.search` are left untouched.
+
+        :param geometries: Iterable of `(feature_id, geojson_polygon)` tuples.
+        :param skip: Collection of feature ids which are not searched, ex. when resuming an interrupted batch.
+        :param merge_policy: Which duplicate item is kept, see `datasources.merge.FeatureMerger`.
+        :return: Generator of `(feature_id, response)` where `response` is a dictionary of feature collections keyed by
+            datasource name, as returned by `Manifest.execute`.  Features are yielded once all of their searches
+            complete, in completion order.  Other arguments are the same as `Manifest.search` and
+            `Manifest.execute_iter`.
+        """
+        skip = skip or ()
+        queued_searches = self.searches
+        # Response and number of searches left for each feature in flight, keyed by feature id
+        responses = {}
+        remaining = {}
+        owners = {}
+        completed_features = deque()
+
+        def queue():
+            for (feature_id, geometry) in geometries:
+                if feature_id in skip:
+                    continue
+                # Drivers append to `manifest.searches`, collect the searches of each feature separately
+                self.searches = []
+                self.search(geometry, temporal=temporal, properties=properties, limit=limit, datasources=datasources,
+                            **kwargs)
+                searches, self.searches = self.searches, queued_searches
+                merger = FeatureMerger(merge_policy)
+                for search in searches:
+                    merger.declare(search[0].__class__.__name__, self.merge_limit(search))
+                if not searches:
+                    completed_features.append((feature_id, merger.response))
+                    continue
+                responses[feature_id] = merger
+                remaining[feature_id] = len(searches)
+                for search in searches:
+                    owners[id(search)] = feature_id
+                    yield search
+
+        try:
+            for search, stac_items, record in self._dispatch(queue(), executor, max_workers, use_cache, None,
+                                                              max_per_source, coalesce):
+                while completed_features:
+                    yield completed_features.popleft()
+                feature_id = owners.pop(id(search))
+                source_name = search[0].__class__.__name__
+                with self.record(source_name).span('merge'):
+                    responses[feature_id].add(source_name, self._feature_collection(search, stac_items, record))
+                remaining[feature_id] -= 1
+                if not remaining[feature_id]:
+                    del remaining[feature_id]
+                    yield feature_id, responses.pop(feature_id).response
+            while completed_features:
+                yield completed_features.popleft()
+        finally:
+            self.searches = queued_searches
+
+        self._emit_metrics()
+
+    def execute_columnar(self, properties=None, **kwargs):
+        """
+        Execute all queued searches into columnar results.  Each feature collection is converted as soon as its search
+        completes, so at most one search's features are held as dictionaries at a time.  Accepts the same arguments
+        as `execute_iter`.
+
+        :param properties: Names of the properties stored as typed columns.
+        :return: Dictionary of `datasources.stac.columnar.ColumnarFeatureCollection` keyed by datasource name.
+        """
+        from datasources.stac.columnar import ColumnarFeatureCollection
+
+        collected = {}
+        for source_name, feature_collection in self.execute_iter(**kwargs):
+            collected.setdefault(source_name, []).append(
+                ColumnarFeatureCollection.from_features(feature_collection, properties)
+            )
+        return {k: ColumnarFeatureCollection.concat(v) for (k, v) in collected.items()}
+
+
+class ManifestPool(object):
+    """
+    Manifests reused across requests, ex. created once per Lambda container so driver instances (and the sessions or
+    indexes they hold) persist across warm invocations.  Each request takes a manifest from the pool and returns it
+    flushed, so concurrent requests never share a manifest.
+    """
+
+    def __init__(self, tags=['all'], cache=None):
+        self.tags = tags
+        self.cache = cache
+        self.idle = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def manifest(self):
+        with self.lock:
+            manifest = self.idle.pop() if self.idle else Manifest(self.tags, cache=self.cache)
+        try:
+            yield manifest
+        finally:
+            manifest.flush()
+            with self.lock:
+                self.idle.append(manifest)
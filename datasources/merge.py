@@ -0,0 +1,106 @@
+import calendar
+import re
+
+# RFC 3339 datetimes of STAC Items, with any precision of fractional seconds and a `Z` or numeric UTC offset
+datetime_pattern = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})(?:[Tt ](\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?)?\s*(?:([Zz])|([+-])(\d{2}):?(\d{2}))?$'
+)
+
+
+def timestamp(value):
+    """
+    :return: Seconds since the epoch of a STAC datetime string (UTC when it has no offset), or None if it can't be
+        parsed.
+    """
+    match = datetime_pattern.match(value.strip()) if isinstance(value, str) else None
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, _, sign, offset_hours, offset_minutes = match.groups()
+    seconds = calendar.timegm((int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0)))
+    if fraction:
+        seconds += float('0.' + fraction)
+    if sign:
+        offset = int(offset_hours) * 3600 + int(offset_minutes) * 60
+        seconds -= offset if sign == '+' else -offset
+    return seconds
+
+
+class FeatureMerger(object):
+    """
+    Merge the feature collections returned by several searches (tiles, retries, subdatasets, lambda invocations) into
+    a single response of feature collections keyed by datasource name.  Items are deduplicated by `(source, id)`
+    through a hash index so merging is linear in the number of items.
+
+    :param policy: Which of two items sharing an id is kept: `first` keeps the first item merged, `newest` keeps the
+        item with the latest `properties.datetime`.
+    """
+
+    policies = ('first', 'newest')
+
+    def __init__(self, policy='first'):
+        if policy not in self.policies:
+            raise ValueError("Unknown merge policy `{}`, expecting one of {}".format(policy, list(self.policies)))
+        self.policy = policy
+        self.response = {}
+        # Maximum number of items merged per datasource, see `declare`
+        self.limits = {}
+        # Position of each item in its feature collection, keyed by (source, id)
+        self.index = {}
+
+    @staticmethod
+    def datetime(feature):
+        """
+        :return: Timestamp of the item's `properties.datetime`, -inf when it is missing or can't be parsed.
+        """
+        value = timestamp((feature.get('properties') or {}).get('datetime'))
+        return float('-inf') if value is None else value
+
+    def declare(self, source_name, limit=None):
+        """
+        Make sure `source_name` is in the response, even if none of its searches return items.
+
+        :param limit: Maximum number of items merged for `source_name`, later items are dropped.
+        """
+        if limit is not None:
+            self.limits[source_name] = min(limit, self.limits.get(source_name, limit))
+        if source_name not in self.response:
+            self.response.update({source_name: {
+                "type": "FeatureCollection",
+                "features": []
+            }})
+
+    def add(self, source_name, feature_collection):
+        """
+        Merge a feature collection into the response.  The first feature collection of a datasource is reused (with
+        any extra members such as `links`), later ones only contribute their features.
+        """
+        features = feature_collection['features']
+        if not self.response.get(source_name, {}).get('features'):
+            feature_collection.update({'features': []})
+            self.response.update({source_name: feature_collection})
+        merged = self.response[source_name]['features']
+        limit = self.limits.get(source_name)
+
+        for feature in features:
+            item_id = feature.get('id')
+            if item_id is None:
+                if limit is None or len(merged) < limit:
+                    merged.append(feature)
+                continue
+            key = (source_name, item_id)
+            position = self.index.get(key)
+            if position is None:
+                if limit is not None and len(merged) >= limit:
+                    continue
+                self.index[key] = len(merged)
+                merged.append(feature)
+            elif self.policy == 'newest' and self.datetime(feature) > self.datetime(merged[position]):
+                merged[position] = feature
+
+    def add_response(self, response):
+        """
+        Merge a dictionary of feature collections keyed by datasource name.
+        """
+        for (source_name, feature_collection) in response.items():
+            self.add(source_name, feature_collection)
+        return self.response
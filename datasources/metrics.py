@@ -0,0 +1,154 @@
+"""
+Timing spans and counters collected for each datasource during a search.
+
+`Manifest` records a `SearchMetrics` per datasource: the `query` span (time spent in the driver's `search` method),
+the `execute` span (time spent in the driver's `execute` method, measured in the worker running it), `merge` and
+counters for the number of searches, cache hits, coalesced searches (sharing the upstream request of an identical
+search in flight) and items returned.  Drivers may report finer spans and counters from their `execute` method, ex:
+
+    with metrics.span('upstream'):
+        r = requests.get(url)
+    metrics.count('bytes', len(r.content))
+    with metrics.span('parse'):
+        items = [self.to_stac(x) for x in r.json()['results']]
+
+Once a search completes, its records are passed to every hook registered with `add_hook` as a dictionary of the form
+`{"source": name, "spans": {name: seconds}, "counters": {name: value}}`.
+"""
+import json
+import sys
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+
+hooks = []
+_local = threading.local()
+
+
+class SearchMetrics(object):
+
+    def __init__(self, source_name):
+        self.source = source_name
+        self.spans = {}
+        self.counters = {}
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def update(self, record):
+        """
+        Add the spans and counters of another record (ex. returned by a worker process).
+        """
+        for (name, seconds) in record['spans'].items():
+            self.add_span(name, seconds)
+        for (name, value) in record['counters'].items():
+            self.count(name, value)
+
+    def to_dict(self):
+        return {'source': self.source, 'spans': dict(self.spans), 'counters': dict(self.counters)}
+
+
+def add_hook(hook):
+    """
+    Register a callable receiving a record (see module docstring) for each datasource once its searches complete.
+    """
+    hooks.append(hook)
+
+
+def remove_hook(hook):
+    hooks.remove(hook)
+
+
+def emit(record):
+    for hook in list(hooks):
+        try:
+            hook(record.to_dict() if isinstance(record, SearchMetrics) else record)
+        except Exception as exc:
+            # Instrumentation must never fail a search
+            warnings.warn("Metrics hook {} failed: {}".format(hook, exc))
+
+
+@contextmanager
+def recording(record):
+    """
+    Make `record` the target of `span` and `count` in the current thread.
+    """
+    previous = getattr(_local, 'record', None)
+    _local.record = record
+    try:
+        yield record
+    finally:
+        _local.record = previous
+
+
+def current():
+    """
+    :return: `SearchMetrics` of the search running in the current thread, or None.
+    """
+    return getattr(_local, 'record', None)
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block of a driver's `execute` method.  Does nothing outside of a search.
+    """
+    record = current()
+    if record is None:
+        yield None
+        return
+    with record.span(name):
+        yield record
+
+
+def count(name, value=1):
+    """
+    Increment a counter of the search running in the current thread.  Does nothing outside of a search.
+    """
+    record = current()
+    if record is not None:
+        record.count(name, value)
+
+
+class EMFExporter(object):
+    """
+    Hook writing each record as a JSON log line in CloudWatch Embedded Metric Format, so spans (in milliseconds) and
+    counters become CloudWatch metrics with a `Source` dimension.
+    """
+
+    units = {'bytes': 'Bytes'}
+
+    def __init__(self, namespace='cognition-datasources', stream=None):
+        self.namespace = namespace
+        self.stream = stream
+
+    def __call__(self, record):
+        line = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [['Source']],
+                    'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in record['spans']] +
+                               [{'Name': name, 'Unit': self.units.get(name, 'Count')} for name in record['counters']]
+                }]
+            },
+            'Source': record['source'],
+        }
+        line.update({name: seconds * 1000 for (name, seconds) in record['spans'].items()})
+        line.update(record['counters'])
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(line) + '\n')
+        stream.flush()
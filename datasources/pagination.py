@@ -0,0 +1,146 @@
+import json
+import threading
+from queue import Queue, Full
+
+from datasources import metrics
+
+
+class _Pages(object):
+    """
+    Accumulates pages of a paginated driver response until the limit is reached.  Pages are lists of STAC Items or,
+    for STAC compliant drivers, FeatureCollections.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.feature_collection = None
+        self.features = []
+
+    @staticmethod
+    def parse(page):
+        if isinstance(page, bytes):
+            # Raw FeatureCollection returned by a STAC compliant driver
+            page = json.loads(page.decode('utf-8'))
+        return page
+
+    @staticmethod
+    def size(page):
+        """
+        :return: Number of items of a parsed page.
+        """
+        if isinstance(page, dict):
+            page = page['features']
+        return len(page or [])
+
+    def add(self, page):
+        """
+        :return: True once enough items were collected.
+        """
+        page = self.parse(page)
+        if isinstance(page, dict):
+            if self.feature_collection is None:
+                self.feature_collection = page
+            page = page['features']
+        self.features.extend(page or [])
+        return self.limit is not None and len(self.features) >= self.limit
+
+    def result(self):
+        features = self.features[:self.limit] if self.limit is not None else self.features
+        if self.feature_collection is not None:
+            self.feature_collection.update({'features': features})
+            return self.feature_collection
+        return features
+
+
+def prefetch(pages, limit=None):
+    """
+    Iterate over a page generator while the next page is requested in a background thread.  Closing the iterator
+    stops the background thread after its in-flight request.  No page is requested once the pages already fetched hold
+    `limit` items.  Metrics reported by the driver while requesting pages go to the record of the calling thread (see
+    `datasources.metrics.recording`).
+    """
+    queue = Queue(maxsize=1)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    # The driver's spans and counters are recorded by the thread requesting the pages
+    record = metrics.current()
+
+    def produce():
+        with metrics.recording(record):
+            fetch()
+
+    def fetch():
+        fetched = 0
+        try:
+            for page in pages:
+                page = _Pages.parse(page)
+                fetched += _Pages.size(page)
+                if not put((page, None)):
+                    break
+                if limit is not None and fetched >= limit:
+                    break
+        except BaseException as exc:
+            put((done, exc))
+            return
+        finally:
+            pages.close()
+        put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            page, exc = queue.get()
+            if page is done:
+                if exc is not None:
+                    raise exc
+                return
+            yield page
+    finally:
+        stop.set()
+
+
+def collect_pages(pages, limit=None, prefetch_pages=True):
+    """
+    Consume a paginated driver response, stopping once `limit` items are collected so no further pages are
+    requested upstream.
+    """
+    collected = _Pages(limit)
+    if limit is not None and limit <= 0:
+        pages.close()
+        return collected.result()
+    iterator = prefetch(pages, limit) if prefetch_pages else pages
+    try:
+        for page in iterator:
+            if collected.add(page):
+                break
+    finally:
+        iterator.close()
+    return collected.result()
+
+
+async def collect_async_pages(pages, limit=None):
+    """
+    Equivalent of `collect_pages` for drivers whose `execute` method is an async generator.
+    """
+    collected = _Pages(limit)
+    if limit is not None and limit <= 0:
+        await pages.aclose()
+        return collected.result()
+    try:
+        async for page in pages:
+            if collected.add(page):
+                break
+    finally:
+        await pages.aclose()
+    return collected.result()
@@ -1,15 +1,15 @@
 import json
 import click
 import os
-import requests
 import tempfile
 import time
 import subprocess
 import shutil
 import yaml
-from multiprocessing.pool import ThreadPool
+from itertools import chain
 
-from datasources import Manifest, sources, layer_arn
+from datasources import Manifest, sources, layer_arn, metrics
+from datasources.merge import FeatureMerger
 
 @click.group(short_help="Cognition datasource query")
 def cognition_datasources():
@@ -20,10 +20,14 @@ def cognition_datasources():
 @click.option('--start_date', '-sd', type=str, help="Start date as either YYYY-MM-DD or YYYY-MM-DDTHH:mm:ss:%fZ")
 @click.option('--end_date', '-ed', type=str, help="End date as either YYYY-MM-DD or YYYY-MM-DDTHH:mm:ss:%fZ")
 @click.option('--properties', '-p', type=str, help="STAC properties for filtering query results")
-@click.option('--datasource', '-d', type=str, multiple=True)
+@click.option('--datasource', '-d', type=str, multiple=True,
+              help="Datasource to search, repeat for several datasources.  Nothing is searched without -d")
 @click.option('--debug/--no-debug', default=False)
 @click.option('--output', '-o', type=click.File(mode='w'))
-def search(spatial, start_date, end_date, properties, datasource, debug, output):
+@click.option('--format', '-f', 'output_format', type=click.Choice(['json', 'ndjson']), default='json',
+              help="`ndjson` writes one feature per line (tagged with its `source`) as each datasource completes, "
+                   "to --output or stdout")
+def search(spatial, start_date, end_date, properties, datasource, debug, output, output_format):
     if debug:
         start = time.time()
 
@@ -43,23 +47,98 @@ def search(spatial, start_date, end_date, properties, datasource, debug, output)
     temporal = (start_date, end_date) if start_date and end_date else None
 
     manifest = Manifest()
-    for source in datasource:
-        manifest[source].search(geoj, temporal=temporal, properties=properties, limit=10)
+    manifest.search(geoj, temporal=temporal, properties=properties, limit=10, datasources=datasource)
 
     if debug:
-        click.echo("Number of searches: {}".format(len(manifest.searches)))
-
-    response = manifest.execute()
+        click.echo("Number of searches: {}".format(len(manifest.searches)), err=True)
+        # Print the spans and counters of each datasource once its searches complete
+        debug_hook = lambda record: click.echo("Metrics: {}".format(json.dumps(record)), err=True)
+        metrics.add_hook(debug_hook)
+
+    try:
+        if output_format == 'ndjson':
+            output = output or click.get_text_stream('stdout')
+
+        # Deduplicates the items of each datasource like `Manifest.execute`
+        merger = FeatureMerger()
+        for search in manifest.searches:
+            merger.declare(search[0].__class__.__name__, manifest.merge_limit(search))
+        for source_name, feature_collection in manifest.execute_iter():
+            if debug:
+                click.echo("Found {} features for {}".format(len(feature_collection['features']), source_name),
+                           err=True)
+            if output_format == 'ndjson':
+                # Write and release each feature collection as soon as its datasource completes
+                with manifest.record(source_name).span('serialization'):
+                    for feature in feature_collection['features']:
+                        feature['source'] = source_name
+                        output.write(json.dumps(feature))
+                        output.write('\n')
+                    output.flush()
+            else:
+                with manifest.record(source_name).span('merge'):
+                    merger.add(source_name, feature_collection)
+
+        if output and output_format == 'json':
+            json.dump(merger.response, output)
+    finally:
+        # Hooks are global, never leave the hook registered when the search fails
+        if debug:
+            metrics.remove_hook(debug_hook)
 
     if debug:
-        for item in list(response):
-            print("Found {} features for {}".format(len(response[item]['features']), item))
+        click.echo("Runtime: {}".format(time.time()-start), err=True)
 
-    if output:
-        json.dump(response, output)
+    return 0
 
-    if debug:
-        print("Runtime: {}".format(time.time()-start))
+@cognition_datasources.command(name="search-batch")
+@click.option('--input', '-i', 'infile', type=click.File(mode='r'), required=True,
+              help="GeoJSON FeatureCollection or NDJSON file of polygon features to search")
+@click.option('--output', '-o', type=str, help="NDJSON output, one line per input feature (defaults to stdout)")
+@click.option('--progress', type=str,
+              help="File recording the ids of completed features.  Completed features are skipped and the output is "
+                   "appended to when the command is run again")
+@click.option('--id-field', type=str, help="Property used as feature id (defaults to the feature id, then its index)")
+@click.option('--start_date', '-sd', type=str, help="Start date as either YYYY-MM-DD or YYYY-MM-DDTHH:mm:ss:%fZ")
+@click.option('--end_date', '-ed', type=str, help="End date as either YYYY-MM-DD or YYYY-MM-DDTHH:mm:ss:%fZ")
+@click.option('--properties', '-p', type=str, help="STAC properties (as JSON) for filtering query results")
+@click.option('--datasource', '-d', type=str, multiple=True,
+              help="Datasource to search, repeat for several datasources (defaults to every datasource)")
+@click.option('--limit', type=int, default=10)
+@click.option('--max-workers', type=int, default=16, help="Maximum number of searches executed concurrently")
+@click.option('--max-per-source', type=int, help="Maximum number of concurrent searches of a single datasource")
+def search_batch(infile, output, progress, id_field, start_date, end_date, properties, datasource, limit, max_workers,
+                 max_per_source):
+    completed = set()
+    if progress and os.path.exists(progress):
+        with open(progress, 'r') as f:
+            completed = {json.loads(line) for line in f if line.strip()}
+
+    temporal = (start_date, end_date) if start_date and end_date else None
+    properties = json.loads(properties) if properties else None
+
+    manifest = Manifest()
+    results = manifest.search_many(read_features(infile, id_field), temporal=temporal, properties=properties,
+                                   limit=limit, datasources=datasource or None, skip=completed,
+                                   max_workers=max_workers, max_per_source=max_per_source)
+
+    outfile = open(output, 'a' if progress else 'w') if output else click.get_text_stream('stdout')
+    progressfile = open(progress, 'a') if progress else None
+    try:
+        for feature_id, response in results:
+            outfile.write(json.dumps({'id': feature_id, 'results': response}))
+            outfile.write('\n')
+            outfile.flush()
+            # Only record progress once the results are written, a crash in between repeats the feature
+            if progressfile:
+                progressfile.write(json.dumps(feature_id))
+                progressfile.write('\n')
+                progressfile.flush()
+    finally:
+        if output:
+            outfile.close()
+        if progressfile:
+            progressfile.close()
 
     return 0
 
@@ -87,30 +166,31 @@ def new(name):
 @cognition_datasources.command(name='load')
 @click.option('--datasource', '-d', type=str, multiple=True)
 @click.option('--local/--deployed', default=False)
-def load(datasource, local):
+@click.option('--offline/--online', default=False, help="Only use driver files cached by previous runs")
+@click.option('--ttl', type=int, help="Seconds during which cached files are used without being revalidated "
+                                      "(defaults to 300, 0 always revalidates)")
+def load(datasource, local, offline, ttl):
+    from datasources.fetch import Fetcher
 
+    fetcher = Fetcher(offline=offline, ttl=ttl)
     handler = []
     sls_functions = {}
+    source_links = {source: getattr(sources.remote, source) for source in datasource}
 
-    for source in datasource:
+    def _check_build(source):
         print("Loading the {} driver.".format(source))
-        source_link = getattr(sources.remote, source)
+        source_link = source_links[source]
         project_path = '/'.join(source_link.split('/')[4:])
+        md = yaml.load(fetcher.get_text(os.path.join(source_link, 'config.yml')), Loader=yaml.BaseLoader)
+        return md, fetcher.ci_status(project_path, md["circle-token"])
 
-        # Check CI build
-        r = requests.get(os.path.join(source_link, 'config.yml'))
-        md = yaml.load(r.text, Loader=yaml.BaseLoader)
-        build_info = requests.get(f'https://circleci.com/api/v1.1/project/github/{project_path}?circle-token={md["circle-token"]}&limit=1')
-        build_status = build_info.json()[0]['status']
+    # Check CI builds
+    loaded = []
+    for source, (md, build_status) in zip(datasource, fetcher.map(_check_build, datasource)):
         if build_status != 'success':
             print("WARNING: {} was not loaded because it failed CI".format(source))
             continue
-
-        # Download remote file handler
-        handler_url = os.path.join(source_link, 'handler.py')
-        r = requests.get(handler_url)
-        for line in r.text.splitlines()[2:]:
-            handler.append(line + '\n')
+        loaded.append(source)
 
         # Build sls function config
         sls_functions.update({
@@ -127,24 +207,31 @@ def load(datasource, local):
         if 'db-arn' in md:
             sls_functions[source]['layers'].append(md['db-arn'])
 
+    # Download remote file handlers (and drivers with their requirements when installing locally) at once
+    files = [(source, 'handler.py') for source in loaded]
+    if local:
+        files += chain.from_iterable([(source, f"{source}.py"), (source, 'requirements.txt')] for source in loaded)
+    contents = dict(zip(files, fetcher.get_many([os.path.join(source_links[source], name) for (source, name) in files])))
+
+    requirements = []
+    for source in loaded:
+        handler.extend(line + '\n' for line in handler_function(contents[(source, 'handler.py')].decode('utf-8')))
 
         if local:
             # Download driver file to local installation of cognition-datasources
-            driver_url = os.path.join(source_link, f"{source}.py")
-            r = requests.get(driver_url)
-            with open(os.path.join(os.path.dirname(__file__), '..', 'sources', f"{source}.py"), "w+") as driver_file:
-                driver_file.write(r.text)
-
-            # Install dependencies
-            fd, path = tempfile.mkstemp()
-            req_url = os.path.join(source_link, "requirements.txt")
-            try:
-                with os.fdopen(fd, 'w') as tmp:
-                    r = requests.get(req_url)
-                    tmp.write(r.text)
-            finally:
-                subprocess.call("pip install -r {}".format(path), shell=True)
-                os.remove(path)
+            with open(os.path.join(os.path.dirname(__file__), '..', 'sources', f"{source}.py"), "wb+") as driver_file:
+                driver_file.write(contents[(source, f"{source}.py")])
+            requirements.append(contents[(source, 'requirements.txt')])
+
+    if requirements:
+        # Install the dependencies of every driver with a single pip call
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(b'\n'.join(requirements))
+            subprocess.call("pip install -r {}".format(path), shell=True)
+        finally:
+            os.remove(path)
 
     # Write handler.py
     with open(os.path.join(os.path.dirname(__file__), '..', '..', 'handler.py'), 'a+') as outfile:
@@ -161,37 +248,45 @@ def load(datasource, local):
 
 
 @cognition_datasources.command(name='build-examples')
-def build_examples():
+@click.option('--offline/--online', default=False, help="Only use examples cached by previous runs")
+@click.option('--ttl', type=int, help="Seconds during which cached files are used without being revalidated "
+                                      "(defaults to 300, 0 always revalidates)")
+def build_examples(offline, ttl):
+    from datasources.fetch import Fetcher
     from datasources.sources import remote
     remote_assets = {k: v for (k, v) in remote.__dict__.items() if type(v) == str and 'https' in v}
     example_rel_path = 'docs/example.json'
 
-    def _fetch_examples(data):
-        print("Pulling example for {}.".format(data['name']))
-        with open(os.path.join(os.path.dirname(__file__), '..', '..', 'docs', 'examples', '{}.json'.format(data['name'])),
+    fetcher = Fetcher(offline=offline, ttl=ttl)
+    examples = fetcher.get_many([os.path.join(url, example_rel_path) for url in remote_assets.values()])
+    for name, example in zip(remote_assets, examples):
+        print("Pulled example for {}.".format(name))
+        with open(os.path.join(os.path.dirname(__file__), '..', '..', 'docs', 'examples', '{}.json'.format(name)),
                   'wb+') as examplefile:
-            r = requests.get(os.path.join(data['url'], example_rel_path))
-            examplefile.write(r.content)
-
-    m = ThreadPool()
-    m.map(_fetch_examples, [{'name': k, 'url': v} for k,v in remote_assets.items()])
+            examplefile.write(example)
 
 @cognition_datasources.command(name='build-docs')
-def build_docs():
+@click.option('--offline/--online', default=False, help="Only use docs cached by previous runs")
+@click.option('--ttl', type=int, help="Seconds during which cached files are used without being revalidated "
+                                      "(defaults to 300, 0 always revalidates)")
+def build_docs(offline, ttl):
+    from datasources.fetch import Fetcher
     from datasources.sources import remote
 
     remote_assets = {k: v for (k, v) in remote.__dict__.items() if type(v) == str and 'https' in v}
     docs_rel_path = 'README.md'
 
+    fetcher = Fetcher(offline=offline, ttl=ttl)
+    print("Pulling docs for {}.".format(', '.join(remote_assets)))
+    readmes = fetcher.get_many([os.path.join(url, docs_rel_path) for url in remote_assets.values()])
+
     build_status = []
     with open(os.path.join(os.path.dirname(__file__), '..', '..', 'docs', 'datasource-reference.md'), 'wb+') as docfile:
-        for item in remote_assets:
-            print("Pulling docs for {}.".format(item))
-            r = requests.get(os.path.join(remote_assets[item], docs_rel_path))
-            docfile.write(r.content)
+        for item, readme in zip(remote_assets, readmes):
+            docfile.write(readme)
             docfile.write(b"\n---\n")
 
-            lines = r.text.splitlines()
+            lines = readme.decode('utf-8').splitlines()
             if 'CircleCI' in lines[0]:
                 build_status.append({'name': item, 'status': lines[0]})
 
@@ -204,14 +299,58 @@ def build_docs():
             statusfile.write("| {} | {} |\n".format(item['name'], item['status']))
 
 
+@cognition_datasources.command(name='build-index')
+@click.option('--input', '-i', 'infile', type=click.File(mode='r'), required=True,
+              help="GeoJSON FeatureCollection of footprints")
+@click.option('--output', '-o', type=str, required=True, help="Path of the spatial index (ex. static/Landsat8_rtree)")
+@click.option('--id-field', type=str, help="Property used as footprint ID (defaults to the feature id)")
+@click.option('--node-size', type=int, default=16)
+def build_index(infile, output, id_field, node_size):
+    from datasources.stac.spatial_index import SpatialIndex
+    SpatialIndex.from_geojson(json.load(infile), output, id_field=id_field, node_size=node_size)
+    print("Wrote spatial index to {}.".format(output))
+
+
 @cognition_datasources.command(name='list')
 def list():
     from datasources.sources import collections
-    sources = collections.load_sources()
-    print([x.__name__ for x in sources])
+    print(collections.names())
 
 
 # Some helper methods used by the CLI
+def read_features(infile, id_field=None):
+    """
+    Read `(feature_id, geometry)` tuples from a GeoJSON FeatureCollection or NDJSON file of features.  NDJSON files are
+    read one line at a time.
+    """
+    first = infile.readline()
+    try:
+        feature = json.loads(first)
+        features = chain([feature], (json.loads(line) for line in infile if line.strip())) \
+            if feature.get('type') == 'Feature' else None
+    except ValueError:
+        features = None
+    if features is None:
+        features = json.loads(first + infile.read())['features']
+
+    for (idx, feature) in enumerate(features):
+        if id_field:
+            feature_id = feature['properties'][id_field]
+        else:
+            feature_id = feature.get('id', idx)
+        yield feature_id, feature['geometry']
+
+
+def handler_function(contents):
+    """
+    Lines of a driver's handler.py from its handler function on.  The imports and module-level state (`manifests`,
+    `spill`) before it are already defined by the service's handler.py, the driver handlers are appended to.
+    """
+    lines = contents.splitlines()
+    start = next((i for (i, line) in enumerate(lines) if line.startswith(('def ', '@'))), len(lines))
+    return [''] + lines[start:]
+
+
 def replace_template_name(fpath, name):
     with open(fpath, 'r') as f:
         contents = f.read()
@@ -0,0 +1,116 @@
+"""
+Process-wide coalescing of identical searches.  While a search is in flight, identical searches (same datasource and
+api request, see `datasources.cache.request_key`) submitted by any `Manifest` wait for its result instead of calling
+the upstream API again.
+"""
+import pickle
+import threading
+from concurrent.futures import Future
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.future = None
+        self.consumers = []
+        # Function applied to the result of each consumer which joined the flight, keyed by consumer
+        self.joined = {}
+
+
+class SingleFlight(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def submit(self, key, submit, joined=None):
+        """
+        Join the in-flight search identified by `key`, or start it by calling `submit`.
+
+        :param submit: Callable scheduling the search and returning a `concurrent.futures.Future`.
+        :param joined: Optional callable applied to the result received by callers which joined the search instead of
+            starting it.
+        :return: Future for the result.  When several callers share a search, each receives its own copy of the
+            result so callers may modify it.  Cancelling the future only cancels the search once every caller
+            cancelled theirs.
+        """
+        consumer = Future()
+        with self.lock:
+            flight = self.flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = self.flights[key] = _Flight()
+            elif joined is not None:
+                flight.joined[consumer] = joined
+            flight.consumers.append(consumer)
+        consumer.add_done_callback(lambda f: self._release(key, flight, f))
+
+        if owner:
+            try:
+                flight.future = submit()
+            except Exception as exc:
+                self._finish(key, flight, exception=exc)
+            else:
+                flight.future.add_done_callback(lambda f: self._finish(key, flight, future=f))
+        return consumer
+
+    def _finish(self, key, flight, future=None, exception=None):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+            consumers = [x for x in flight.consumers if not x.cancelled()]
+
+        if future is not None:
+            if future.cancelled():
+                for consumer in consumers:
+                    consumer.cancel()
+                return
+            exception = future.exception()
+        if exception is None:
+            result = future.result()
+            if len(consumers) > 1:
+                # Shared results are copied so callers never see each other's modifications
+                result = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        for consumer in consumers:
+            try:
+                if exception is not None:
+                    consumer.set_exception(exception)
+                    continue
+                value = pickle.loads(result) if len(consumers) > 1 else result
+                if consumer in flight.joined:
+                    value = flight.joined[consumer](value)
+                consumer.set_result(value)
+            except Exception:
+                # Cancelled since the list of consumers was taken
+                pass
+
+    def _release(self, key, flight, consumer):
+        if not consumer.cancelled():
+            return
+        with self.lock:
+            if any(not x.cancelled() for x in flight.consumers) or self.flights.get(key) is not flight:
+                return
+            del self.flights[key]
+        if flight.future is not None:
+            flight.future.cancel()
+
+    def __len__(self):
+        return len(self.flights)
+
+
+def completed(fn, *args):
+    """
+    Run `fn` in the current thread.
+
+    :return: `concurrent.futures.Future` holding its result.
+    """
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+# Shared by every `Manifest` of the process
+singleflight = SingleFlight()
@@ -1,27 +1,94 @@
+import ast
+import importlib
+import os
 
 
-class collections(object):
-
-    def load_sources():
-        import os
-        source_files = os.listdir(os.path.dirname(__file__))
-        sources = []
-        for item in source_files:
-            if item.endswith('.py') and item != '__init__.py' and item != 'base.py':
-                module = os.path.splitext(item)[0]
-                imported = getattr(__import__("datasources.sources.{}".format(module), fromlist=[module]), module)
-                sources.append(imported)
-        return sources
-
-    all = load_sources()
-    eo = [x for x in all if 'EO' in x.tags]
-    ms = [x for x in all if 'MS' in x.tags]
-    sar = [x for x in all if 'SAR' in x.tags]
-    satellite = [x for x in all if 'Satellite' in x.tags]
-    aerial = [x for x in all if 'Aerial' in x.tags]
-    elevation = [x for x in all if 'Elevation' in x.tags]
-    raster = [x for x in all if 'Raster' in x.tags]
-    vector = [x for x in all if 'Vector' in x.tags]
+class Registry(object):
+    """
+    Registry of the drivers installed in `datasources/sources`.  Driver names and tags are read from the driver files
+    without importing them, each driver module is imported the first time it is used.
+    """
+
+    tag_names = {
+        'eo': 'EO',
+        'ms': 'MS',
+        'sar': 'SAR',
+        'satellite': 'Satellite',
+        'aerial': 'Aerial',
+        'elevation': 'Elevation',
+        'raster': 'Raster',
+        'vector': 'Vector',
+    }
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tags = None
+        self._loaded = {}
+
+    @staticmethod
+    def parse_tags(fpath, name):
+        """
+        Read the `tags` class attribute of a driver without importing it.  Returns None if the tags can't be determined
+        statically (for example if they are inherited or computed).
+        """
+        with open(fpath, 'r') as f:
+            tree = ast.parse(f.read(), fpath)
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and node.name == name:
+                for stmt in node.body:
+                    if isinstance(stmt, ast.Assign) and any(getattr(x, 'id', None) == 'tags' for x in stmt.targets):
+                        try:
+                            return list(ast.literal_eval(stmt.value))
+                        except ValueError:
+                            return None
+        return None
+
+    @property
+    def tags(self):
+        """
+        :return: Dictionary of tags keyed by driver name.
+        """
+        if self._tags is None:
+            tags = {}
+            for item in sorted(os.listdir(self.directory)):
+                if item.endswith('.py') and item != '__init__.py' and item != 'base.py':
+                    module = os.path.splitext(item)[0]
+                    module_tags = self.parse_tags(os.path.join(self.directory, item), module)
+                    if module_tags is None:
+                        module_tags = list(self.load(module).tags)
+                    tags.update({module: module_tags})
+            self._tags = tags
+        return self._tags
+
+    def names(self, tag='all'):
+        if tag == 'all':
+            return list(self.tags)
+        if tag not in self.tag_names:
+            raise AttributeError("Unknown tag `{}`".format(tag))
+        return [k for (k, v) in self.tags.items() if self.tag_names[tag] in v]
+
+    def load(self, name):
+        """
+        Import a driver by name.
+        """
+        if name not in self._loaded:
+            module = importlib.import_module("datasources.sources.{}".format(name))
+            self._loaded.update({name: getattr(module, name)})
+        return self._loaded[name]
+
+    def load_sources(self):
+        """
+        Import every installed driver.
+        """
+        return [self.load(name) for name in self.names()]
+
+    def __getattr__(self, tag):
+        if tag == 'all' or tag in self.tag_names:
+            return [self.load(name) for name in self.names(tag)]
+        raise AttributeError(tag)
+
+
+collections = Registry(os.path.dirname(__file__))
 
 class remote(object):
 
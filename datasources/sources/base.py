@@ -3,25 +3,72 @@ class Datasource(object):
 
     stac_compliant = False
     tags = ['tag1', 'tag2']
+    # Preferred number of items per upstream request, for drivers which page through their API
+    page_size = 100
+    # Maximum number of vertices of the geometries sent upstream by `Manifest.search(exact=True)` (None for no limit)
+    max_vertices = None
+    # Upstream requests per second (None for no limit) and number of requests which may be sent at once
+    rate_limit = None
+    rate_burst = 1
+    # Maximum number of concurrent searches (None for no limit), lowered while searches fail or take longer than
+    # `latency_target` seconds
+    max_concurrency = None
+    latency_target = None
+    # Number of times a failed search is retried (see `is_retryable`), with jittered exponential backoff.  Searches
+    # aren't retried unless the driver opts in
+    retries = 0
+    retry_backoff = 0.5
+    max_backoff = 30
 
     def __init__(self, manifest):
         self.manifest = manifest
 
-    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+    def search(self, spatial, temporal=None, properties=None, limit=10, stac_query=None, **kwargs):
         """
         Method to preprocess spatial/temporal/properties arguments into arguments compatible with specific API.
+
+        `Manifest.search` passes the query compiled once for every driver as `stac_query` (`STACQuery`, read-only) to
+        drivers declaring the argument, use it rather than building a new `STACQuery` when it isn't None.
         """
         raise NotImplementedError
 
     def execute(self, query):
         """
         Method to execute API request using arguments generated with `search` method and return as STAC item.
+
+        Drivers which page through their API may instead yield one page (list of STAC items, or FeatureCollection if
+        `stac_compliant`) at a time.  The manifest requests the next page while the current one is processed and
+        stops pulling pages once the search's limit is met, see `page_size_hint`.
         """
         pass
 
-    def execute_multi(self, query_body, conn):
-        """Internal use"""
-        response = self.execute(query_body)
-        conn.send({'stac_items': response, 'source': self.__class__.__name__})
-        conn.close()
+    def page_size_hint(self, limit=None):
+        """
+        Number of items paginated drivers should request per page.
+        """
+        return min(self.page_size, limit) if limit else self.page_size
+
+    def is_retryable(self, exc):
+        """
+        Whether a search which raised `exc` is retried.  By default, searches are retried on connection errors,
+        timeouts and responses with a 429 or 5xx status code (ex. `requests.HTTPError` raised by `raise_for_status`).
+        """
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+        if status is not None:
+            return status == 429 or status >= 500
+        retryable = (ConnectionError, TimeoutError)
+        try:
+            import requests
+            retryable += (requests.ConnectionError, requests.Timeout)
+        except ImportError:
+            pass
+        return isinstance(exc, retryable)
+
+    def __getstate__(self):
+        """
+        Drop the manifest when pickling so the process executor only ships the driver to its workers.
+        """
+        state = self.__dict__.copy()
+        state['manifest'] = None
+        return state
 
@@ -0,0 +1,250 @@
+import json
+
+import numpy as np
+
+from datasources.stac.query import feature_bbox
+
+
+class PackedColumn(object):
+    """
+    Variable length JSON values (geometries, assets, ...) packed into a single buffer with an offset array.
+    """
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [json.dumps(x, separators=(',', ':')).encode('utf-8') for x in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in encoded], out=offsets[1:])
+        return cls(b''.join(encoded), offsets)
+
+    @classmethod
+    def concat(cls, columns):
+        offsets = [np.zeros(1, dtype=np.int64)]
+        shift = 0
+        for column in columns:
+            offsets.append(column.offsets[1:] + shift)
+            shift += len(column.buffer)
+        return cls(b''.join(x.buffer for x in columns), np.concatenate(offsets))
+
+    def raw(self, idx):
+        """
+        :return: JSON encoded value as bytes.
+        """
+        return self.buffer[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def __getitem__(self, idx):
+        return json.loads(self.raw(idx).decode('utf-8'))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def object_column(values):
+    """
+    :return: One-dimensional object array, `np.array` would build a 2D array out of lists of equal length and fail on
+        ragged lists.
+    """
+    column = np.empty(len(values), dtype=object)
+    for (idx, value) in enumerate(values):
+        column[idx] = value
+    return column
+
+
+def property_column(values):
+    """
+    :return: Typed numpy array of property values, or an object array when the values are lists or dictionaries
+        (ex. `eo:bands` of varying length) or of different types (`np.array` would convert `[1, 'a']` to strings).
+    """
+    if any(isinstance(x, (list, tuple, dict)) for x in values):
+        return object_column(values)
+    # Integers and floats share a float column
+    if len({float if type(x) is int else type(x) for x in values}) > 1:
+        return object_column(values)
+    return np.array(values)
+
+
+class ColumnarFeatureCollection(object):
+    """
+    Struct-of-arrays alternative to a FeatureCollection.  IDs, datetimes, bounding boxes and selected properties are
+    stored as typed numpy arrays while geometries, assets and the remaining item metadata are kept as packed JSON
+    buffers.  Features are only materialized as dictionaries when exported.
+    """
+
+    def __init__(self, ids, datetimes, bboxes, properties, geometries, assets, metadata):
+        self.ids = ids
+        self.datetimes = datetimes
+        self.bboxes = bboxes
+        self.properties = properties
+        self.geometries = geometries
+        self.assets = assets
+        # Full properties and any other top-level members of each item, used for lossless export
+        self.metadata = metadata
+
+    @classmethod
+    def from_features(cls, features, properties=None):
+        """
+        :param features: List of STAC Items or a FeatureCollection.
+        :param properties: Names of the properties stored as typed columns.
+        """
+        if isinstance(features, dict):
+            features = features['features']
+        properties = properties or []
+
+        ids, datetimes, bboxes, geometries, assets, metadata = [], [], [], [], [], []
+        columns = {name: [] for name in properties}
+        for feature in features:
+            item_properties = feature.get('properties') or {}
+            ids.append(feature.get('id'))
+            datetimes.append(item_properties.get('datetime') or 'NaT')
+            # 2D bounding box, NaN for features without bbox nor geometry
+            bboxes.append(feature_bbox(feature))
+            geometries.append(feature.get('geometry'))
+            assets.append(feature.get('assets'))
+            # 3D bounding boxes are kept as-is in the metadata for export
+            excluded = ('id', 'bbox', 'geometry', 'assets') if len(feature.get('bbox') or []) == 4 else \
+                ('id', 'geometry', 'assets')
+            metadata.append({k: v for (k, v) in feature.items() if k not in excluded})
+            for name in properties:
+                columns[name].append(item_properties.get(name))
+
+        datetimes = np.char.rstrip(np.array(datetimes, dtype=str), 'Z').astype('datetime64[us]') if datetimes \
+            else np.array([], dtype='datetime64[us]')
+        return cls(
+            ids=np.array(ids, dtype=object),
+            datetimes=datetimes,
+            bboxes=np.array(bboxes, dtype=np.float64).reshape(-1, 4),
+            properties={name: property_column(values) for (name, values) in columns.items()},
+            geometries=PackedColumn.from_values(geometries),
+            assets=PackedColumn.from_values(assets),
+            metadata=PackedColumn.from_values(metadata),
+        )
+
+    @classmethod
+    def concat(cls, collections):
+        collections = list(collections)
+        return cls(
+            ids=np.concatenate([x.ids for x in collections]),
+            datetimes=np.concatenate([x.datetimes for x in collections]),
+            bboxes=np.concatenate([x.bboxes for x in collections]),
+            properties={name: np.concatenate([x.properties[name] for x in collections])
+                        for name in collections[0].properties},
+            geometries=PackedColumn.concat([x.geometries for x in collections]),
+            assets=PackedColumn.concat([x.assets for x in collections]),
+            metadata=PackedColumn.concat([x.metadata for x in collections]),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def feature(self, idx):
+        """
+        Materialize a single STAC Item.
+        """
+        feature = self.metadata[idx]
+        feature.update({
+            'id': self.ids[idx],
+            'geometry': self.geometries[idx],
+            'assets': self.assets[idx],
+        })
+        if 'bbox' not in feature and not np.isnan(self.bboxes[idx]).any():
+            feature.update({'bbox': self.bboxes[idx].tolist()})
+        return feature
+
+    def iter_features(self):
+        for idx in range(len(self)):
+            yield self.feature(idx)
+
+    def to_geojson(self, fp=None):
+        """
+        Export as a FeatureCollection.  Returns a dictionary, or streams the collection to `fp` one feature at a time.
+        """
+        if fp is None:
+            return {'type': 'FeatureCollection', 'features': list(self.iter_features())}
+        fp.write('{"type": "FeatureCollection", "features": [')
+        for idx, feature in enumerate(self.iter_features()):
+            if idx:
+                fp.write(', ')
+            json.dump(feature, fp)
+        fp.write(']}')
+
+    def to_ndjson(self, fp):
+        """
+        Write one feature per line.
+        """
+        for feature in self.iter_features():
+            fp.write(json.dumps(feature))
+            fp.write('\n')
+
+    def save(self, path):
+        """
+        Write the columns to an uncompressed `.npz` file, one array per column.
+        """
+        arrays = {
+            'datetimes': self.datetimes,
+            'bboxes': self.bboxes,
+        }
+        if all(isinstance(x, str) for x in self.ids):
+            arrays.update({'ids': self.ids.astype(str)})
+        else:
+            # Missing ids are stored as JSON so they are loaded back as None rather than "None"
+            arrays.update({'json_ids': np.array([json.dumps(x) for x in self.ids], dtype=str)})
+        for name in ('geometries', 'assets', 'metadata'):
+            column = getattr(self, name)
+            arrays.update({
+                '{}_buffer'.format(name): np.frombuffer(column.buffer, dtype=np.uint8),
+                '{}_offsets'.format(name): column.offsets,
+            })
+        for (idx, name) in enumerate(self.properties):
+            values = self.properties[name]
+            if values.dtype.kind == 'O':
+                # Mixed or missing values are stored as JSON so the file can be loaded without pickle
+                arrays.update({'json_property_{}'.format(idx): np.array([json.dumps(x) for x in values], dtype=str)})
+            else:
+                arrays.update({'property_{}'.format(idx): values})
+        arrays.update({'property_names': np.array(list(self.properties), dtype=str)})
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        packed = {name: PackedColumn(data['{}_buffer'.format(name)].tobytes(), data['{}_offsets'.format(name)])
+                  for name in ('geometries', 'assets', 'metadata')}
+        properties = {}
+        for (idx, name) in enumerate(data['property_names']):
+            if 'json_property_{}'.format(idx) in data:
+                values = object_column([json.loads(x) for x in data['json_property_{}'.format(idx)]])
+            else:
+                values = data['property_{}'.format(idx)]
+            properties.update({str(name): values})
+        if 'json_ids' in data:
+            ids = object_column([json.loads(x) for x in data['json_ids']])
+        else:
+            ids = data['ids'].astype(object)
+        return cls(
+            ids=ids,
+            datetimes=data['datetimes'],
+            bboxes=data['bboxes'],
+            properties=properties,
+            **packed
+        )
+
+    def to_arrow(self):
+        """
+        :return: `pyarrow.Table` of the typed columns (requires pyarrow).
+        """
+        import pyarrow as pa
+
+        columns = {
+            'id': pa.array(self.ids.tolist(), type=pa.string()),
+            'datetime': pa.array(self.datetimes),
+            'bbox': pa.array(self.bboxes.tolist(), type=pa.list_(pa.float64(), 4)),
+            'geometry': pa.array([self.geometries.raw(x) for x in range(len(self))], type=pa.binary()),
+            'assets': pa.array([self.assets.raw(x) for x in range(len(self))], type=pa.binary()),
+        }
+        for (name, values) in self.properties.items():
+            columns.update({name: pa.array(values.tolist())})
+        return pa.table(columns)
@@ -1,4 +1,4 @@
-from schema import Schema, And
+from schema import Schema, SchemaError, And
 import re
 import json
 
@@ -36,33 +36,47 @@ sar_extension = {
 
 }
 
+item_keys = {'id', 'type', 'properties', 'assets', 'bbox', 'geometry'}
+
+# Confirming datetime is STAC compliant
+datetime_pattern = re.compile(r'^(19|20)\d\d-(0[1-9]|1[012])-([012]\d|3[01])T([01]\d|2[0-3]):([0-5]\d):([0-5]\d).(\d+?)Z$')
+
+
 class STACItemError(BaseException):
-    pass
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        # List of (index, message) tuples when raised by `STACItem.load_many`
+        self.errors = errors or []
 
 class STACItem(object):
 
     @staticmethod
     def validate_sar_extension(n):
         for (k,v) in n.items():
-            if 'sar' in k:
-                if type(v) != sar_extension[k.split(':')[-1]]['type']:
+            if k.startswith('sar:'):
+                if k[4:] not in sar_extension:
+                    raise STACItemError("{} is not a property of the SAR extension".format(k))
+                if type(v) != sar_extension[k[4:]]['type']:
                     raise STACItemError("The {} property of the SAR extension is invalid.  Got {}, expecting {}.".format(k,
                                                                                                                          type(v),
-                                                                                                                         sar_extension[k.split(':')[-1]]['type']))
+                                                                                                                         sar_extension[k[4:]]['type']))
         return True
 
     @staticmethod
     def validate_eo_extension(n):
         for (k,v) in n.items():
-            if 'eo' in k:
-                if type(v) != eo_extension[k.split(':')[-1]]['type']:
+            if k.startswith('eo:'):
+                if k[3:] not in eo_extension:
+                    raise STACItemError("{} is not a property of the EO extension".format(k))
+                if type(v) != eo_extension[k[3:]]['type']:
                     raise STACItemError("The {} property of the EO extension is invalid".format(k))
         return True
 
     @staticmethod
     def validate_assets(n):
         for (k,v) in n.items():
-            if 'title' not in list(v) or 'href' not in list(v):
+            if 'title' not in v or 'href' not in v:
                 raise STACItemError("STAC assets require 'title' and 'href'")
         return True
 
@@ -113,37 +127,94 @@ class STACItem(object):
         else:
             raise STACItemError("STAC geometry error: {}".format(message))
 
+    @classmethod
+    def schema(cls):
+        """
+        :return: Schema used to validate STAC Items, built once per class.
+        """
+        if '_schema' not in cls.__dict__:
+            cls._schema = Schema({
+                "id": str,
+                "type": And(
+                    str,
+                    'Feature'
+                ),
+                "properties": And(
+                    dict,
+                    lambda n: datetime_pattern.match(n['datetime']),
+                    lambda n: cls.validate_eo_extension(n),
+                    lambda n: cls.validate_sar_extension(n)
+                ),
+                "assets": And(
+                    dict,
+                    lambda n: cls.validate_assets(n)
+                ),
+                "bbox": And(
+                    list,
+                    lambda n: cls.validate_bbox(n)
+                ),
+                "geometry": And(
+                    dict,
+                    lambda n: cls.validate_geometry(n)
+                )
+            })
+        return cls._schema
+
+    @classmethod
+    def is_valid(cls, stac_item):
+        """
+        Single-pass equivalent of `STACItem.schema` which returns a boolean instead of raising.
+        """
+        try:
+            properties = stac_item['properties']
+            return (type(stac_item) == dict and stac_item.keys() == item_keys and
+                    isinstance(stac_item['id'], str) and
+                    isinstance(stac_item['type'], str) and stac_item['type'] == 'Feature' and
+                    isinstance(properties, dict) and bool(datetime_pattern.match(properties['datetime'])) and
+                    cls.validate_eo_extension(properties) and cls.validate_sar_extension(properties) and
+                    isinstance(stac_item['assets'], dict) and cls.validate_assets(stac_item['assets']) and
+                    isinstance(stac_item['bbox'], list) and cls.validate_bbox(stac_item['bbox']) and
+                    isinstance(stac_item['geometry'], dict) and cls.validate_geometry(stac_item['geometry']))
+        except (Exception, STACItemError):
+            return False
+
     @classmethod
     def load(cls, stac_item):
-        schema = Schema({
-            "id": str,
-            "type": And(
-                str,
-                'Feature'
-            ),
-            "properties": And(
-                dict,
-                # Confirming datetime is STAC compliant
-                lambda n: re.match(r'^(19|20)\d\d-(0[1-9]|1[012])-([012]\d|3[01])T([01]\d|2[0-3]):([0-5]\d):([0-5]\d).(\d+?)Z$', n['datetime']),
-                lambda n: cls.validate_eo_extension(n),
-                lambda n: cls.validate_sar_extension(n)
-            ),
-            "assets": And(
-                dict,
-                lambda n: cls.validate_assets(n)
-            ),
-            "bbox": And(
-                list,
-                lambda n: cls.validate_bbox(n)
-            ),
-            "geometry": And(
-                dict,
-                lambda n: cls.validate_geometry(n)
-            )
-        })
-        schema.validate(stac_item)
+        if not cls.is_valid(stac_item):
+            cls.schema().validate(stac_item)
         return cls(stac_item)
 
+    @classmethod
+    def load_many(cls, features):
+        """
+        Validate a list of STAC Items (or a FeatureCollection) in a single pass.  Unlike `load`, validation continues
+        past invalid items and every error is reported.  Valid items are checked at the same speed as with `load`,
+        both skip the schema unless an item is invalid.
+
+        :return: List of STACItem
+        """
+        if isinstance(features, dict):
+            features = features['features']
+
+        items = []
+        errors = []
+        for idx, stac_item in enumerate(features):
+            if not cls.is_valid(stac_item):
+                # Only invalid items go through the schema, to build the error message
+                try:
+                    cls.schema().validate(stac_item)
+                except SchemaError as e:
+                    errors.append((idx, str(e)))
+                    continue
+            items.append(cls(stac_item))
+
+        if errors:
+            message = "{} of {} STAC Items are invalid:\n".format(len(errors), len(errors) + len(items))
+            message += "\n".join("[{}] {}".format(idx, error) for (idx, error) in errors)
+            raise STACItemError(message, errors)
+
+        return items
+
     def __init__(self, stac_item):
         self.stac_item = stac_item
 
@@ -1,110 +1,304 @@
+import copy
+import json
 import operator
 from datetime import datetime
 import os
+import re
 
-from schema import Schema, And
+from schema import Schema, SchemaError, And
 from geomet import wkt
 
+from datasources.stac.spatial_index import SpatialIndex
+
 
 class STACQueryError(BaseException):
     pass
 
+
+# Validators are built once at import, not on every query
+spatial_schema = Schema({
+    "type": And(
+        str,
+        lambda n: n == "Polygon"
+    ),
+    "coordinates": And(
+        # Checking type of coordinates
+        list,
+        # Confirming the geometry is closed (the first and last positions are equivalent)
+        lambda n: n[0][0] == n[0][-1],
+        # Confirming individual coordinates are [lat, long] ordered
+        lambda n: all(-180 <= x[0] <= 180 for x in n[0]),
+        lambda n: all(-90 <= y[1] <= 90 for y in n[0])
+    )
+})
+
+temporal_schema = Schema((str, str))
+
+# Comparison operators applied to whole numpy columns by `STACQuery.check_properties_batch`
+vectorized_operators = {'lt', 'le', 'eq', 'ne', 'ge', 'gt'}
+missing = object()
+
+# Spatial indices are memory-mapped once per process and reused across queries
+spatial_indices = {}
+
+
+def valid_spatial(spatial):
+    """
+    Single-pass equivalent of `spatial_schema`.
+    """
+    try:
+        if type(spatial) != dict or len(spatial) != 2 or type(spatial['type']) != str or spatial['type'] != 'Polygon':
+            return False
+        coordinates = spatial['coordinates']
+        if type(coordinates) != list or coordinates[0][0] != coordinates[0][-1]:
+            return False
+        for position in coordinates[0]:
+            if not (-180 <= position[0] <= 180 and -90 <= position[1] <= 90):
+                return False
+    except Exception:
+        return False
+    return True
+
+# Full-date notation "YYYY-MM-DD"
+date_pattern = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+date_error = "Invalid configuration, must be of format `YYYY-MM-DD`"
+
+# Full-date-full-time notation "YYYY-MM-DDThh:mm:ss.msZ"
+datetime_pattern = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})\.(\d{3})Z$')
+datetime_error = "Invalid temporal configuration, must be of format `YYYY-MM-DDThh:mm:ss.mssZ`"
+
+
+def parse_date(item):
+    """
+    Parse a date in one of the two notations accepted by `STACQuery` in a single pass.
+
+    :return: datetime.datetime
+    """
+    if len(item) == 10:
+        match = date_pattern.match(item)
+        if not match:
+            raise SchemaError([date_error], [date_error])
+        year, month, day = [int(x) for x in match.groups()]
+        if not (0 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31):
+            raise SchemaError([date_error], [date_error])
+        return datetime(year, month, day)
+    elif len(item) == 24:
+        match = datetime_pattern.match(item)
+        if not match:
+            raise SchemaError([datetime_error], [datetime_error])
+        year, month, day, hour, minute, second, millisecond = [int(x) for x in match.groups()]
+        if not (0 <= year <= 2100 and 1 <= month <= 12 and 1 <= day <= 31 and hour <= 24 and minute <= 60 and
+                second <= 60):
+            raise SchemaError([datetime_error], [datetime_error])
+        return datetime(year, month, day, hour, minute, second, millisecond * 1000)
+    else:
+        raise STACQueryError("Temporal must be of form `YYYY-MM-DD` or `YYYY-MM-DDThh:mm:ss.msZ`")
+
+
+def feature_bbox(feature):
+    """
+    :return: [xmin, ymin, xmax, ymax] of a GeoJSON feature, from its `bbox` member or computed from its geometry (NaN
+        if it has neither).
+    """
+    bbox = feature.get('bbox')
+    if bbox and len(bbox) in (4, 6):
+        half = len(bbox) // 2
+        return [bbox[0], bbox[1], bbox[half], bbox[half + 1]]
+    geometry = feature.get('geometry')
+    if not geometry:
+        return [float('nan')] * 4
+    coordinates = geometry['coordinates']
+    if coordinates and not isinstance(coordinates[0], (list, tuple)):
+        # Point
+        coordinates = [coordinates]
+    # Unnest polygons, multi-polygons, ... down to a list of positions
+    while coordinates and isinstance(coordinates[0][0], (list, tuple)):
+        coordinates = [position for part in coordinates for position in part]
+    if not coordinates:
+        return [float('nan')] * 4
+    xs = [x[0] for x in coordinates]
+    ys = [x[1] for x in coordinates]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
 class STACQuery(object):
+    """
+    Validated search parameters.  The bounding box, WKT, GeoJSON and shapely geometries of the query are computed on
+    first use and cached, so a query compiled once by `Manifest.search` and shared by every driver is only parsed
+    once.  Shared queries are read-only.
+    """
 
     @staticmethod
     def load_spatial(spatial):
-        schema = Schema({
-            "type": And(
-                str,
-                lambda n: n == "Polygon"
-            ),
-            "coordinates": And(
-                # Checking type of coordinates
-                list,
-                # Confirming the geometry is closed (the first and last positions are equivalent)
-                lambda n: n[0][0] == n[0][-1],
-                # Confirming individual coordinates are [lat, long] ordered
-                lambda n: len(list(filter(lambda x: -180 <= x[0] <= 180, n[0]))) == len(n[0]),
-                lambda n: len(list(filter(lambda y: -90 <= y[1] <= 90, n[0]))) == len(n[0])
-        )
-        })
-        schema.validate(spatial)
+        # Fast path for valid geometries, the schema is only run to build the error message
+        if not valid_spatial(spatial):
+            spatial_schema.validate(spatial)
         return spatial
 
     @staticmethod
     def load_temporal(temporal):
-        type_schema = Schema((str, str))
-        type_schema.validate(temporal)
-
-        # Validate the dates individually
-        for idx, item in enumerate(temporal):
-            # Checking for full-date notation "YYYY-MM-DD"
-            if len(item) == 10:
-                date_schema = Schema(
-                    And(
-                        lambda n: 0 <= int(n.split('-')[0]) <= 2100,
-                        lambda n: 1 <= int(n.split('-')[1]) <= 12,
-                        lambda n: 1 <= int(n.split('-')[2]) <= 31,
-                        error="Invalid configuration, must be of format `YYYY-MM-DD`"
-                    )
-                )
-                date_schema.validate(item)
-                _date = datetime.strptime("{}T00:00:00.000Z".format(item), "%Y-%m-%dT%H:%M:%S.%fZ")
-            # Checking for full-date-full-time notation "YYYY-MM-DDT:hh:mm:ss.msZ"
-            elif len(item) == 24:
-                date_schema = Schema(
-                    And(
-                        lambda n: 0 <= int(n.split('-')[0]) <= 2100, # YYYY
-                        lambda n: 1 <= int(n.split('-')[1]) <= 12, # MM
-                        lambda n: 1 <= int(n.split('-')[2].split('T')[0]) <= 31, # DD
-                        lambda n: n[10] == 'T',
-                        lambda n: 0 <= int(n.split(':')[0].split('T')[-1]) <= 24, # hh
-                        lambda n: 0 <= int(n.split(':')[1]) <= 60, # mm
-                        lambda n: 0 <= int(n.split(':')[-1].split('.')[0]) <= 60, # ss
-                        lambda n: 0 <= int(n.split(':')[-1].split('.')[-1][:-1]) <= 999, # ms
-                        lambda n: n[-1] == 'Z',
-                        error="Invalid temporal configuration, must be of format `YYYY-MM-DDThh:mm:ss.mssZ`"
-                    )
-                )
-                date_schema.validate(item)
-                _date = datetime.strptime(item, "%Y-%m-%dT%H:%M:%S.%fZ")
-            else:
-                raise STACQueryError("Temporal must be of form `YYYY-MM-DD` or `YYYY-MM-DDThh:mm:ss.msZ`")
-
-
-            if idx == 0:
-                start_date = _date
-            elif idx == 1:
-                end_date = _date
+        if not (type(temporal) == tuple and len(temporal) == 2 and all(type(x) == str for x in temporal)):
+            temporal_schema.validate(temporal)
+        dates = [parse_date(item) for item in temporal]
+        start_date, end_date = dates[0], dates[1]
 
         if start_date > end_date:
             raise STACQueryError("Temporal must be of form (start_date, end_date)")
 
         return (start_date, end_date)
 
-
-
     def __init__(self, spatial, temporal=None, properties=None):
         self.spatial = self.load_spatial(spatial)
         if temporal:
             self.temporal = self.load_temporal(temporal)
         if properties:
             self.properties = properties
+        self._cache = {}
 
+    def _cached(self, name, fn):
+        # Concurrent first calls may both compute the value, which is harmless
+        if name not in self._cache:
+            self._cache[name] = fn()
+        return self._cache[name]
+
+    def _bbox(self):
+        positions = self.spatial['coordinates'][0]
+        xs = [x[0] for x in positions]
+        ys = [x[1] for x in positions]
+        return (min(xs), min(ys), max(xs), max(ys))
 
     def bbox(self):
         """
         :return: Standard STAC bounding box of [xmin, ymin, xmax, ymax]
         """
-        return [
-            min([x[0] for x in self.spatial['coordinates'][0]]),
-            min([x[1] for x in self.spatial['coordinates'][0]]),
-            max([x[0] for x in self.spatial['coordinates'][0]]),
-            max([x[1] for x in self.spatial['coordinates'][0]]),
-        ]
+        return list(self._cached('bbox', self._bbox))
 
     def wkt(self):
-        return wkt.dumps(self.spatial)
+        return self._cached('wkt', lambda: wkt.dumps(self.spatial))
+
+    def geojson(self):
+        """
+        :return: Serialized GeoJSON geometry of the query.
+        """
+        return self._cached('geojson', lambda: json.dumps(self.spatial))
+
+    def geometry(self):
+        """
+        :return: shapely geometry of the query (requires shapely).
+        """
+        def _geometry():
+            from shapely.geometry import shape
+            return shape(self.spatial)
+        return self._cached('geometry', _geometry)
+
+    def prepared(self):
+        """
+        :return: shapely prepared geometry of the query, for fast repeated `intersects` / `contains` tests.
+        """
+        def _prepared():
+            from shapely.prepared import prep
+            return prep(self.geometry())
+        return self._cached('prepared', _prepared)
+
+    def upstream(self, max_vertices=None, hull=False):
+        """
+        Query covering this one with a simpler geometry, for APIs limiting the size of requests.  Items returned for
+        the simplified geometry must be filtered with the exact geometry, see `check_intersects_batch` and
+        `Manifest.search(exact=True)`.
+
+        :param max_vertices: Maximum number of vertices of the geometry, None to keep it (unless `hull` is set).
+        :param hull: Use the convex hull of the geometry instead of a simplified outline.
+        :return: STACQuery, this query if its geometry is already simple enough.
+        """
+        return self._cached(('upstream', max_vertices, hull), lambda: self._upstream(max_vertices, hull))
+
+    def _upstream(self, max_vertices, hull):
+        from shapely.geometry import Polygon, box
+
+        if not hull and (max_vertices is None or len(self.spatial['coordinates'][0]) - 1 <= max_vertices):
+            return self
+        geometry = self.geometry()
+        bbox = self.bbox()
+        outline = None
+        if not hull:
+            tolerance = max(bbox[2] - bbox[0], bbox[3] - bbox[1]) / 1000.0
+            for _ in range(10):
+                # Buffered by twice the simplification tolerance so the outline still covers the exact geometry
+                candidate = geometry.buffer(2 * tolerance, join_style=2).simplify(tolerance)
+                if candidate.geom_type == 'Polygon' and len(candidate.exterior.coords) - 1 <= max_vertices:
+                    outline = candidate
+                    break
+                tolerance *= 2
+        if outline is None:
+            outline = geometry.convex_hull
+            if max_vertices is not None and len(outline.exterior.coords) - 1 > max_vertices:
+                outline = box(*bbox)
+
+        query = copy.copy(self)
+        query._cache = {}
+        query.spatial = {
+            "type": "Polygon",
+            "coordinates": [[[min(180.0, max(-180.0, x)), min(90.0, max(-90.0, y))]
+                             for (x, y) in Polygon(outline.exterior).exterior.coords]]
+        }
+        return query
+
+    def check_intersects(self, geometry):
+        """
+        :param geometry: GeoJSON geometry.
+        :return: Whether the geometry intersects the exact geometry of the query, False for a null geometry.
+        """
+        from shapely.geometry import shape
+
+        if not geometry:
+            return False
+        xmin, ymin, xmax, ymax = feature_bbox({'geometry': geometry})
+        bbox = self.bbox()
+        if not (xmin <= bbox[2] and xmax >= bbox[0] and ymin <= bbox[3] and ymax >= bbox[1]):
+            return False
+        return self.prepared().intersects(shape(geometry))
+
+    def check_intersects_batch(self, features):
+        """
+        Vectorized `check_intersects` for a list of GeoJSON features.  The bounding boxes of the features (their `bbox`
+        member, or computed from their geometry) are compared with the query's in a single operation, only the
+        overlapping features are tested against the prepared geometry of the query.  Features with a null or missing
+        geometry never match, even when their `bbox` overlaps the query.
+
+        :return: numpy boolean mask
+        """
+        import numpy as np
+        from shapely.geometry import shape
+
+        mask = np.zeros(len(features), dtype=bool)
+        if not features:
+            return mask
+        bboxes = np.array([feature_bbox(x) for x in features], dtype=float)
+        xmin, ymin, xmax, ymax = self.bbox()
+        candidates = (bboxes[:, 0] <= xmax) & (bboxes[:, 2] >= xmin) & (bboxes[:, 1] <= ymax) & (bboxes[:, 3] >= ymin)
+        prepared = self.prepared()
+        for idx in np.flatnonzero(candidates):
+            geometry = features[idx].get('geometry')
+            if geometry:
+                mask[idx] = prepared.intersects(shape(geometry))
+        return mask
+
+    def __cache_key__(self):
+        """
+        Canonical representation of the query in cache keys, see `datasources.cache.request_key`.
+        """
+        temporal = getattr(self, 'temporal', None)
+        return {
+            'spatial': self.spatial,
+            'temporal': [x.isoformat() for x in temporal] if temporal else None,
+            'properties': getattr(self, 'properties', None),
+        }
+
+    def __getstate__(self):
+        # Prepared geometries can't be pickled (ex. by the process executor), they are rebuilt on demand
+        state = self.__dict__.copy()
+        state['_cache'] = {k: v for (k, v) in self._cache.items() if k in ('bbox', 'wkt', 'geojson')}
+        return state
 
     def check_temporal(self, date_time):
         if self.temporal[0] <= date_time <= self.temporal[1]:
@@ -120,17 +314,71 @@ class STACQuery(object):
                 return False
         return True
 
-    # def check_spatial(self, name):
-    #     static_dir = os.path.join(os.path.dirname(__file__), '..', 'static')
-    #     rtree_location = os.path.join(static_dir, '{}_rtree'.format(name))
-    #
-    #     try:
-    #         idx = index.Rtree(rtree_location)
-    #         return [x.object for x in idx.intersection(self.bbox(), objects=True)]
-    #     except:
-    #         # Look for rtree in current directory
-    #         try:
-    #             idx = index.Rtree('index')
-    #             return [x.object for x in idx.intersection(self.bbox(), objects=True)]
-    #         except:
-    #             raise FileNotFoundError("Could not find rtree for the datasource at the following path: {}".format(rtree_location))
+    def check_temporal_batch(self, date_times):
+        """
+        Vectorized `check_temporal` for a list of datetimes or STAC datetime strings.
+
+        :return: numpy boolean mask
+        """
+        import numpy as np
+
+        values = np.array(date_times)
+        if values.dtype.kind == 'U':
+            # numpy doesn't parse the UTC designator
+            values = np.char.rstrip(values, 'Z')
+        values = values.astype('datetime64[us]')
+        return (values >= np.datetime64(self.temporal[0], 'us')) & (values <= np.datetime64(self.temporal[1], 'us'))
+
+    def check_properties_batch(self, assets):
+        """
+        Vectorized `check_properties` for a list of assets.  Each property is extracted into a numpy column once and
+        compared in a single operation.
+
+        :return: numpy boolean mask
+        """
+        import numpy as np
+
+        mask = np.ones(len(assets), dtype=bool)
+        for item in self.properties:
+            equality = next(iter(self.properties[item]))
+            value = self.properties[item][equality]
+            comparison_operator = getattr(operator, equality)
+
+            column = [asset.get(item, missing) for asset in assets]
+            absent = np.fromiter((x is missing for x in column), dtype=bool, count=len(column))
+            if absent.any():
+                # Match `check_properties`, which only reads a property if the previous ones matched
+                if (absent & mask).any():
+                    raise KeyError(item)
+                column = [None if x is missing else x for x in column]
+                mask &= ~absent
+
+            array = np.array(column)
+            if equality in vectorized_operators and (
+                    (array.dtype.kind in 'biuf' and type(value) in (bool, int, float)) or
+                    (array.dtype.kind == 'U' and type(value) == str)):
+                matched = comparison_operator(array, value)
+            else:
+                matched = np.fromiter((bool(comparison_operator(x, value)) if m else False for (x, m) in zip(column, mask)),
+                                      dtype=bool, count=len(column))
+            mask &= matched
+        return mask
+
+    def check_spatial(self, name):
+        """
+        Find the static footprints (tiles, scenes, grid cells) of a datasource which intersect the query, using the
+        packed spatial index built with `cognition-datasources build-index`.
+
+        :param name: Name of the datasource, the index is read from `datasources/static/{name}_rtree` or from `index`
+            in the current directory.
+        :return: List of footprint IDs
+        """
+        static_dir = os.path.join(os.path.dirname(__file__), '..', 'static')
+        rtree_location = os.path.join(static_dir, '{}_rtree'.format(name))
+
+        for location in (rtree_location, 'index'):
+            if location not in spatial_indices and os.path.exists(location):
+                spatial_indices.update({location: SpatialIndex(location)})
+            if location in spatial_indices:
+                return spatial_indices[location].intersects(self.bbox())
+        raise FileNotFoundError("Could not find rtree for the datasource at the following path: {}".format(rtree_location))
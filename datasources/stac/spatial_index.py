@@ -0,0 +1,235 @@
+"""
+Read-only packed Hilbert R-tree used to map a search area to the static footprints (tiles, scenes, grid cells) of a
+datasource without calling its API.
+
+File layout (little-endian):
+    header          magic (8s), node size (I), number of items (I), number of levels (I), padding (I)
+    level bounds    uint32 * number of levels, padded to 8 bytes
+    boxes           float64 * 4 * number of nodes ([xmin, ymin, xmax, ymax] of each node, leaves first)
+    indices         uint32 * number of nodes (item index for leaves, position of the first child otherwise)
+    id offsets      uint64 * (number of items + 1)
+    ids             utf-8 encoded item ids
+
+The file is memory-mapped when queried so only the pages touched by a search are read from disk.
+"""
+
+import mmap
+import struct
+
+MAGIC = b'CDSINDEX'
+HEADER = struct.Struct('<8sIIII')
+NODE_SIZE = 16
+
+
+class SpatialIndexError(BaseException):
+    pass
+
+
+def hilbert(x, y):
+    """
+    Position of (x, y) on a 16-bit Hilbert curve.
+    """
+    a = x ^ y
+    b = 0xFFFF ^ a
+    c = 0xFFFF ^ (x | y)
+    d = x & (y ^ 0xFFFF)
+
+    A = a | (b >> 1)
+    B = (a >> 1) ^ a
+    C = ((c >> 1) ^ (b & (d >> 1))) ^ c
+    D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 2)) ^ (b & (b >> 2))
+    B = (a & (b >> 2)) ^ (b & ((a ^ b) >> 2))
+    C ^= (a & (c >> 2)) ^ (b & (d >> 2))
+    D ^= (b & (c >> 2)) ^ ((a ^ b) & (d >> 2))
+
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 4)) ^ (b & (b >> 4))
+    B = (a & (b >> 4)) ^ (b & ((a ^ b) >> 4))
+    C ^= (a & (c >> 4)) ^ (b & (d >> 4))
+    D ^= (b & (c >> 4)) ^ ((a ^ b) & (d >> 4))
+
+    a, b, c, d = A, B, C, D
+    C ^= (a & (c >> 8)) ^ (b & (d >> 8))
+    D ^= (b & (c >> 8)) ^ ((a ^ b) & (d >> 8))
+
+    a = C ^ (C >> 1)
+    b = D ^ (D >> 1)
+
+    i0 = x ^ y
+    i1 = b | (0xFFFF ^ (i0 | a))
+
+    i0 = (i0 | (i0 << 8)) & 0x00FF00FF
+    i0 = (i0 | (i0 << 4)) & 0x0F0F0F0F
+    i0 = (i0 | (i0 << 2)) & 0x33333333
+    i0 = (i0 | (i0 << 1)) & 0x55555555
+
+    i1 = (i1 | (i1 << 8)) & 0x00FF00FF
+    i1 = (i1 | (i1 << 4)) & 0x0F0F0F0F
+    i1 = (i1 | (i1 << 2)) & 0x33333333
+    i1 = (i1 | (i1 << 1)) & 0x55555555
+
+    return (i1 << 1) | i0
+
+
+def geometry_bbox(geometry):
+    """
+    :return: [xmin, ymin, xmax, ymax] of any GeoJSON geometry.
+    """
+    def positions(coordinates):
+        if isinstance(coordinates[0], (int, float)):
+            yield coordinates
+        else:
+            for item in coordinates:
+                yield from positions(item)
+
+    if geometry['type'] == 'GeometryCollection':
+        boxes = [geometry_bbox(x) for x in geometry['geometries']]
+        return [min(x[0] for x in boxes), min(x[1] for x in boxes), max(x[2] for x in boxes), max(x[3] for x in boxes)]
+
+    xs, ys = zip(*[(x[0], x[1]) for x in positions(geometry['coordinates'])])
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+class SpatialIndex(object):
+
+    @staticmethod
+    def build(items, path, node_size=NODE_SIZE):
+        """
+        Write a packed index to `path`.
+
+        :param items: List of (id, [xmin, ymin, xmax, ymax]) tuples.
+        """
+        num_items = len(items)
+        if num_items == 0:
+            raise SpatialIndexError("Can't build a spatial index without any items")
+        ids = [str(x[0]).encode('utf-8') for x in items]
+        boxes = [tuple(float(v) for v in x[1]) for x in items]
+
+        # Sort leaves along a hilbert curve so neighbouring footprints share parent nodes
+        extent = [min(x[0] for x in boxes), min(x[1] for x in boxes), max(x[2] for x in boxes), max(x[3] for x in boxes)]
+        width = (extent[2] - extent[0]) or 1.0
+        height = (extent[3] - extent[1]) or 1.0
+        order = sorted(range(num_items), key=lambda i: hilbert(
+            int(0xFFFF * ((boxes[i][0] + boxes[i][2]) / 2 - extent[0]) / width),
+            int(0xFFFF * ((boxes[i][1] + boxes[i][3]) / 2 - extent[1]) / height)
+        ))
+
+        nodes = [boxes[i] for i in order]
+        indices = list(order)
+        level_bounds = [num_items]
+        start = 0
+        # Pack each level into parent nodes until a single root node remains
+        while level_bounds[-1] - start > 1:
+            end = level_bounds[-1]
+            for child in range(start, end, node_size):
+                children = nodes[child:min(child + node_size, end)]
+                nodes.append((min(x[0] for x in children), min(x[1] for x in children),
+                              max(x[2] for x in children), max(x[3] for x in children)))
+                indices.append(child)
+            start = end
+            level_bounds.append(len(nodes))
+
+        id_offsets = [0]
+        for item_id in ids:
+            id_offsets.append(id_offsets[-1] + len(item_id))
+
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, node_size, num_items, len(level_bounds), 0))
+            f.write(struct.pack('<{}I'.format(len(level_bounds)), *level_bounds))
+            if len(level_bounds) % 2:
+                f.write(b'\0' * 4)
+            f.write(struct.pack('<{}d'.format(4 * len(nodes)), *[v for node in nodes for v in node]))
+            f.write(struct.pack('<{}I'.format(len(nodes)), *indices))
+            if len(nodes) % 2:
+                f.write(b'\0' * 4)
+            f.write(struct.pack('<{}Q'.format(len(id_offsets)), *id_offsets))
+            f.write(b''.join(ids))
+
+    @classmethod
+    def from_geojson(cls, feature_collection, path, id_field=None, node_size=NODE_SIZE):
+        """
+        Build an index from a GeoJSON FeatureCollection of footprints.  Items are identified by the feature's `id` or by
+        the `id_field` property.
+        """
+        items = []
+        for feature in feature_collection['features']:
+            item_id = feature['properties'][id_field] if id_field else feature['id']
+            bbox = feature.get('bbox') or geometry_bbox(feature['geometry'])
+            if len(bbox) == 6:
+                # Drop elevation from 3D bounding boxes
+                bbox = [bbox[0], bbox[1], bbox[3], bbox[4]]
+            items.append((item_id, bbox))
+        cls.build(items, path, node_size)
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.node_size, self.num_items, num_levels, _ = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise SpatialIndexError("{} is not a spatial index".format(path))
+
+        self.view = view = memoryview(self.mmap)
+        offset = HEADER.size
+        self.level_bounds = list(struct.unpack_from('<{}I'.format(num_levels), self.mmap, offset))
+        offset += 4 * (num_levels + num_levels % 2)
+        self.num_nodes = self.level_bounds[-1]
+        self.boxes = view[offset:offset + 32 * self.num_nodes].cast('d')
+        offset += 32 * self.num_nodes
+        self.indices = view[offset:offset + 4 * self.num_nodes].cast('I')
+        offset += 4 * (self.num_nodes + self.num_nodes % 2)
+        self.id_offsets = view[offset:offset + 8 * (self.num_items + 1)].cast('Q')
+        self.ids_offset = offset + 8 * (self.num_items + 1)
+
+    def __len__(self):
+        return self.num_items
+
+    def item_id(self, idx):
+        start = self.ids_offset + self.id_offsets[idx]
+        end = self.ids_offset + self.id_offsets[idx + 1]
+        return self.mmap[start:end].decode('utf-8')
+
+    def search(self, bbox):
+        """
+        :param bbox: [xmin, ymin, xmax, ymax]
+        :return: Indices of the items intersecting `bbox`.
+        """
+        xmin, ymin, xmax, ymax = bbox
+        boxes = self.boxes
+        indices = self.indices
+        results = []
+
+        # Start at the root node (the last node of the top level)
+        node = self.num_nodes - 1
+        level = len(self.level_bounds) - 1
+        queue = []
+        while True:
+            end = min(node + self.node_size, self.level_bounds[level])
+            for pos in range(node, end):
+                if boxes[4 * pos + 2] < xmin or boxes[4 * pos + 3] < ymin or \
+                        boxes[4 * pos] > xmax or boxes[4 * pos + 1] > ymax:
+                    continue
+                if level == 0:
+                    results.append(indices[pos])
+                else:
+                    queue.append((indices[pos], level - 1))
+            if not queue:
+                break
+            node, level = queue.pop()
+        return results
+
+    def intersects(self, bbox):
+        """
+        :param bbox: [xmin, ymin, xmax, ymax]
+        :return: IDs of the items intersecting `bbox`.
+        """
+        return [self.item_id(x) for x in self.search(bbox)]
+
+    def close(self):
+        for view in (self.boxes, self.indices, self.id_offsets, self.view):
+            view.release()
+        self.mmap.close()
@@ -0,0 +1,222 @@
+"""
+Spilling of large responses to object storage.
+
+Lambda functions can't return more than 6 MB.  When a serialized response grows past a threshold, its largest feature
+collections are written gzip-compressed (as GeoJSON or NDJSON) to a `Storage` backend and replaced in the response by
+a pointer:
+
+    {"type": "FeatureCollection", "features": [],
+     "spilled": {"href": "s3://bucket/...", "format": "application/geo+json", "compression": "gzip",
+                 "size": 12345678, "items": 5000}}
+
+`items` is null when the feature collection was spliced without being parsed (see `Manifest.execute_raw`).  Use
+`load_spilled` to read the feature collection back.
+"""
+import gzip
+import json
+import os
+import uuid
+
+SPILL_THRESHOLD = 5 * 1024 * 1024
+
+formats = {
+    'json': 'application/geo+json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Storage(object):
+
+    def put(self, key, data, content_type):
+        """
+        Store gzip-compressed `data` under `key`.
+
+        :return: URL of the object.
+        """
+        raise NotImplementedError
+
+    def get(self, url):
+        """
+        :return: Compressed content of the object at `url` (as returned by `put`).
+        """
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """
+    Filesystem backend, for tests and local deployments.
+    """
+
+    def __init__(self, directory=os.path.join(os.sep, 'tmp', 'cognition-datasources-spill')):
+        self.directory = directory
+
+    def put(self, key, data, content_type):
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return 'file://' + path
+
+    def get(self, url):
+        with open(url[len('file://'):] if url.startswith('file://') else url, 'rb') as f:
+            return f.read()
+
+
+class S3Storage(Storage):
+    """
+    S3 backend (requires boto3).  Returns presigned URLs valid for `expires` seconds, or `s3://` URLs if `expires` is
+    None.
+    """
+
+    def __init__(self, bucket, prefix='', expires=3600, client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.expires = expires
+        if client is None:
+            import boto3
+            client = boto3.client('s3')
+        self.client = client
+
+    def put(self, key, data, content_type):
+        key = self.prefix + key
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type,
+                               ContentEncoding='gzip')
+        if self.expires is None:
+            return 's3://{}/{}'.format(self.bucket, key)
+        return self.client.generate_presigned_url('get_object', Params={'Bucket': self.bucket, 'Key': key},
+                                                  ExpiresIn=self.expires)
+
+    def get(self, url):
+        bucket, key = url[len('s3://'):].split('/', 1)
+        return self.client.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
+def get_storage(url):
+    """
+    :param url: `s3://bucket/prefix`, `file:///directory` or a local directory.
+    """
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return S3Storage(bucket, prefix.rstrip('/') + '/' if prefix else '')
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return LocalStorage(url)
+
+
+class Spiller(object):
+    """
+    Replace the largest feature collections of a response by pointers until it fits in `threshold` bytes.
+
+    :param output_format: `json` (a FeatureCollection) or `ndjson` (one feature per line).
+    :param escaped: Measure the response once encoded as a JSON string, the form in which Lambda functions return
+        a `str` (driver handlers) or a `body` (API Gateway responses).  Quotes, backslashes and non-ASCII characters
+        are escaped, which adds about 12% to a typical STAC response.
+    """
+
+    def __init__(self, storage, threshold=SPILL_THRESHOLD, output_format='json', escaped=False):
+        if output_format not in formats:
+            raise ValueError("Unknown spill format `{}`, expecting one of {}".format(output_format, list(formats)))
+        self.storage = storage
+        self.threshold = threshold
+        self.output_format = output_format
+        self.escaped = escaped
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Spiller configured by the `SERVICE_SPILL_STORAGE` (see `get_storage`), `SERVICE_SPILL_THRESHOLD` (bytes) and
+        `SERVICE_SPILL_FORMAT` environment variables, or None if `SERVICE_SPILL_STORAGE` isn't set.  Used by Lambda
+        handlers, so the threshold applies to the escaped response.
+        """
+        url = os.environ.get('SERVICE_SPILL_STORAGE')
+        if not url:
+            return None
+        return cls(get_storage(url), int(os.environ.get('SERVICE_SPILL_THRESHOLD', SPILL_THRESHOLD)),
+                   os.environ.get('SERVICE_SPILL_FORMAT', 'json'), escaped=True)
+
+    def size(self, segment):
+        """
+        :return: Size of a serialized feature collection (bytes or str) in the response.
+        """
+        if not self.escaped:
+            return len(segment)
+        if isinstance(segment, bytes):
+            segment = segment.decode('utf-8')
+        # Much cheaper than parsing the segment, json.dumps of a str only escapes it
+        return len(json.dumps(segment)) - 2
+
+    def spill(self, source_name, feature_collection, items=None):
+        """
+        Write a serialized feature collection (bytes or str) to storage.
+
+        :return: Pointer feature collection.
+        """
+        if isinstance(feature_collection, str):
+            feature_collection = feature_collection.encode('utf-8')
+        if self.output_format == 'ndjson':
+            features = json.loads(feature_collection.decode('utf-8'))['features']
+            items = len(features)
+            data = b''.join(json.dumps(x).encode('utf-8') + b'\n' for x in features)
+        else:
+            data = feature_collection
+        key = '{}/{}.{}.gz'.format(uuid.uuid4().hex, source_name, self.output_format)
+        href = self.storage.put(key, gzip.compress(data), formats[self.output_format])
+        return {
+            "type": "FeatureCollection",
+            "features": [],
+            "spilled": {
+                "href": href,
+                "format": formats[self.output_format],
+                "compression": "gzip",
+                "size": len(data),
+                "items": items,
+            }
+        }
+
+    def fit(self, members, items=None):
+        """
+        :param members: List of `(source_name, serialized feature collection)` making up a response, feature
+            collections are either bytes or str.
+        :param items: Number of items of each feature collection keyed by datasource name, when known.
+        :return: `members`, where the largest feature collections are replaced by serialized pointers until the
+            response is smaller than the threshold.
+        """
+        items = items or {}
+        members = list(members)
+        sizes = [self.size(segment) for (name, segment) in members]
+        size = sum(len(name) + sizes[idx] + 4 for (idx, (name, segment)) in enumerate(members))
+        for idx in sorted(range(len(members)), key=lambda x: sizes[x], reverse=True):
+            if size <= self.threshold:
+                break
+            source_name, segment = members[idx]
+            pointer = json.dumps(self.spill(source_name, segment, items.get(source_name)))
+            if isinstance(segment, bytes):
+                pointer = pointer.encode('utf-8')
+            size -= sizes[idx] - self.size(pointer)
+            members[idx] = (source_name, pointer)
+        return members
+
+
+def load_spilled(feature_collection, storage=None):
+    """
+    :return: Feature collection read back from storage if it was spilled, otherwise `feature_collection`.
+    """
+    if 'spilled' not in feature_collection:
+        return feature_collection
+    spilled = feature_collection['spilled']
+    href = spilled['href']
+    if href.startswith('http'):
+        # Presigned URL
+        import requests
+        r = requests.get(href)
+        r.raise_for_status()
+        data = r.content
+    else:
+        data = (storage or get_storage(href)).get(href)
+    # HTTP clients may already have decompressed the content (`Content-Encoding: gzip`)
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    data = data.decode('utf-8')
+    if spilled['format'] == formats['ndjson']:
+        return {"type": "FeatureCollection", "features": [json.loads(x) for x in data.splitlines() if x]}
+    return json.loads(data)
@@ -0,0 +1,103 @@
+import datetime
+import threading
+
+import pytest
+
+from datasources import Manifest
+from datasources.cache import DiskCache, MemoryCache, request_key
+from datasources.sources.base import Datasource
+from datasources.stac.query import STACQuery
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[-118.96, 34.96], [-111.71, 34.96], [-111.71, 40.75], [-118.96, 40.75], [-118.96, 34.96]]]
+}
+
+
+class Counting(Datasource):
+
+    def __init__(self, manifest, response=None):
+        super().__init__(manifest)
+        self.response = response
+        self.calls = 0
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, stac_query=None, **kwargs):
+        self.manifest.searches.append([self, {'query': stac_query}])
+
+    def execute(self, api_request):
+        self.calls += 1
+        return self.response
+
+
+def test_request_key_stac_query():
+    key = request_key('Source', {'query': STACQuery(spatial, ('2018-10-30', '2018-12-31'))})
+    assert key == request_key('Source', {'query': STACQuery(spatial, ('2018-10-30', '2018-12-31'))})
+    assert key != request_key('Source', {'query': STACQuery(spatial, ('2018-10-30', '2018-12-30'))})
+
+
+def test_request_key_datetime():
+    assert request_key('Source', {'date': datetime.date(2018, 1, 1)}) == request_key('Source', {'date': '2018-01-01'})
+
+
+def test_request_key_rejects_objects():
+    with pytest.raises(TypeError):
+        request_key('Source', {'session': object()})
+
+
+def test_uncacheable_request_still_runs():
+    manifest = Manifest(tags=[], cache=MemoryCache())
+    source = Counting(manifest, [{'id': 'a'}])
+    manifest.searches.append([source, {'session': object()}])
+    assert manifest.execute()['Counting']['features'] == [{'id': 'a'}]
+    assert len(manifest.cache) == 0
+
+
+@pytest.mark.parametrize('response', [[], None, {'type': 'FeatureCollection', 'features': []}])
+def test_empty_responses_are_not_cached(response):
+    manifest = Manifest(tags=[], cache=MemoryCache())
+    manifest.update({'Counting': Counting(manifest, response)})
+    manifest['Counting'].stac_compliant = isinstance(response, dict)
+    for _ in range(2):
+        manifest.search(spatial, datasources=['Counting'])
+        manifest.execute()
+        manifest.flush()
+    assert manifest['Counting'].calls == 2
+
+
+def test_responses_are_cached():
+    manifest = Manifest(tags=[], cache=MemoryCache())
+    manifest.update({'Counting': Counting(manifest, [{'id': 'a'}])})
+    for _ in range(2):
+        manifest.search(spatial, ('2018-10-30', '2018-12-31'), datasources=['Counting'])
+        manifest.execute()
+        manifest.flush()
+    assert manifest['Counting'].calls == 1
+
+
+def test_disk_cache_eviction(tmpdir):
+    cache = DiskCache(max_size=10, directory=str(tmpdir))
+    for idx in range(25):
+        cache.set('Source', {'idx': idx}, [idx])
+    assert len(cache) <= 10
+    assert cache.get('Source', {'idx': 24}) == [24]
+
+
+def test_disk_cache_concurrent_use(tmpdir):
+    cache = DiskCache(ttl=3600, max_size=5, directory=str(tmpdir))
+    errors = []
+
+    def worker(offset):
+        try:
+            for idx in range(50):
+                cache.set('Source', {'idx': offset + idx}, [idx])
+                cache.get('Source', {'idx': offset + idx - 1})
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(x * 100,)) for x in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
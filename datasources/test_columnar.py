@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+from datasources.stac.columnar import ColumnarFeatureCollection
+
+
+def feature(idx, bands, feature_id=True):
+    return {
+        'type': 'Feature',
+        'id': 'item_{}'.format(idx) if feature_id else None,
+        'bbox': [0.0, 0.0, 1.0, 1.0],
+        'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]},
+        'properties': {'datetime': '2018-11-01T18:30:00.000Z', 'eo:bands': bands, 'eo:gsd': 10.0},
+        'assets': {},
+    }
+
+
+def test_ragged_list_properties():
+    features = [feature(0, [{'name': 'B1'}]), feature(1, [{'name': 'B1'}, {'name': 'B2'}])]
+    columnar = ColumnarFeatureCollection.from_features(features, ['eo:bands', 'eo:gsd'])
+    assert columnar.properties['eo:bands'].shape == (2,)
+    assert columnar.properties['eo:bands'][1] == [{'name': 'B1'}, {'name': 'B2'}]
+    assert columnar.properties['eo:gsd'].dtype.kind == 'f'
+
+
+def test_equal_length_list_properties_stay_one_dimensional():
+    features = [feature(0, ['B1', 'B2']), feature(1, ['B3', 'B4'])]
+    columnar = ColumnarFeatureCollection.from_features(features, ['eo:bands'])
+    assert columnar.properties['eo:bands'].shape == (2,)
+
+
+def test_save_and_load(tmpdir):
+    features = [feature(0, ['B1']), feature(1, ['B1', 'B2'], feature_id=False)]
+    path = os.path.join(str(tmpdir), 'collection.npz')
+    ColumnarFeatureCollection.from_features(features, ['eo:bands']).save(path)
+    loaded = ColumnarFeatureCollection.load(path)
+    assert loaded.ids.tolist() == ['item_0', None]
+    assert loaded.properties['eo:bands'].tolist() == [['B1'], ['B1', 'B2']]
+    assert loaded.to_geojson()['features'][1]['properties']['eo:bands'] == ['B1', 'B2']
+
+
+def test_3d_bboxes():
+    features = [dict(feature(idx, []), bbox=[0, 0, 0, 1, 1, 1]) for idx in range(2)]
+    columnar = ColumnarFeatureCollection.from_features(features)
+    assert columnar.bboxes.tolist() == [[0, 0, 1, 1], [0, 0, 1, 1]]
+    assert columnar.to_geojson()['features'][0]['bbox'] == [0, 0, 0, 1, 1, 1]
+
+
+def test_null_geometry_without_bbox():
+    features = [feature(0, []), dict(feature(1, []), geometry=None)]
+    del features[1]['bbox']
+    columnar = ColumnarFeatureCollection.from_features(features)
+    assert len(columnar.bboxes) == len(columnar.ids) == 2
+    assert np.isnan(columnar.bboxes[1]).all()
+    exported = columnar.to_geojson()['features'][1]
+    assert exported['geometry'] is None and 'bbox' not in exported
+
+
+def test_mixed_type_properties(tmpdir):
+    features = [feature(0, 1), feature(1, 'a'), feature(2, 2.5)]
+    columnar = ColumnarFeatureCollection.from_features(features, ['eo:bands', 'eo:gsd'])
+    assert columnar.properties['eo:bands'].tolist() == [1, 'a', 2.5]
+    assert columnar.properties['eo:gsd'].dtype.kind == 'f'
+    path = os.path.join(str(tmpdir), 'collection.npz')
+    columnar.save(path)
+    assert ColumnarFeatureCollection.load(path).properties['eo:bands'].tolist() == [1, 'a', 2.5]
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from datasources.fetch import Fetcher, FetchError
+from datasources.testing import FakeCDN
+
+
+@pytest.fixture
+def server():
+    server = FakeCDN(latency=0, file_bytes=100)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_revalidation_reuses_cached_content(server, tmpdir):
+    url = server.url + '/Driver/handler.py'
+    content = Fetcher(str(tmpdir), ttl=0).get(url)
+    fetcher = Fetcher(str(tmpdir), ttl=0)
+    assert fetcher.get(url) == content
+    assert server.statuses == {200: 1, 304: 1}
+    assert fetcher.stats == {'downloaded': 0, 'revalidated': 1, 'cached': 0}
+
+
+def test_fresh_entries_are_not_requested(server, tmpdir):
+    url = server.url + '/Driver/handler.py'
+    content = Fetcher(str(tmpdir)).get(url)
+    fetcher = Fetcher(str(tmpdir), ttl=60)
+    assert fetcher.get(url) == content
+    assert server.statuses == {200: 1}
+    assert fetcher.stats['cached'] == 1
+
+
+def test_expired_entries_are_revalidated(server, tmpdir):
+    url = server.url + '/Driver/handler.py'
+    fetcher = Fetcher(str(tmpdir), ttl=0.05)
+    fetcher.get(url)
+    fetcher.get(url)
+    time.sleep(0.1)
+    fetcher.get(url)
+    assert server.statuses == {200: 1, 304: 1}
+
+
+def test_offline(server, tmpdir):
+    url = server.url + '/Driver/handler.py'
+    content = Fetcher(str(tmpdir)).get(url)
+    fetcher = Fetcher(str(tmpdir), offline=True, ttl=0)
+    assert fetcher.get(url) == content
+    assert server.statuses == {200: 1}
+    with pytest.raises(FetchError):
+        fetcher.get(server.url + '/Driver/config.yml')
+
+
+def test_cached_copy_is_used_when_the_network_fails(server, tmpdir):
+    url = server.url + '/Driver/handler.py'
+    content = Fetcher(str(tmpdir)).get(url)
+    server.shutdown()
+    server.server_close()
+    fetcher = Fetcher(str(tmpdir), ttl=0, timeout=1)
+    assert fetcher.get(url) == content
+    with pytest.raises(FetchError):
+        fetcher.get(server.url + '/Driver/config.yml')
+
+
+def test_get_many_keeps_order(server, tmpdir):
+    urls = [server.url + '/Driver{}/handler.py'.format(idx) for idx in range(5)]
+    fetcher = Fetcher(str(tmpdir))
+    assert fetcher.get_many(urls) == [Fetcher(str(tmpdir)).get(url) for url in urls]
@@ -0,0 +1,122 @@
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip('boto3')
+
+# handler.py reads its deployment settings and creates a boto3 client at import time
+os.environ.setdefault('SERVICE_NAME', 'cognition-datasources')
+os.environ.setdefault('SERVICE_STAGE', 'test')
+os.environ.setdefault('SERVICE_REGION', 'us-east-1')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('SERVICE_METRICS', '0')
+
+import handler
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]]
+}
+
+
+def feature_collection(*ids):
+    return {"type": "FeatureCollection", "features": [{"id": x, "properties": {}} for x in ids]}
+
+
+@pytest.fixture
+def invoke(monkeypatch):
+    responses = {}
+
+    def lambda_invoke(service, stage, source, args):
+        response = responses[source]
+        if isinstance(response, Exception):
+            raise response
+        if callable(response):
+            return response()
+        return response
+
+    monkeypatch.setattr(handler, 'lambda_invoke', lambda_invoke)
+    return responses
+
+
+def run(sources, status=200, **package):
+    package.update({'intersects': spatial, 'datasources': sources})
+    response = handler.worker({'body': json.dumps(package)}, None)
+    assert response['statusCode'] == status
+    return json.loads(response['body'])
+
+
+def test_raw_responses_are_spliced(invoke):
+    invoke['Raw'] = ' {"Raw": ' + json.dumps(feature_collection('a')) + '} '
+    invoke['Parsed'] = {'Parsed': feature_collection('b')}
+    assert run(['Raw', 'Parsed']) == {'Raw': feature_collection('a'), 'Parsed': feature_collection('b')}
+
+
+def test_other_strings_are_parsed_and_merged(invoke):
+    # Not shaped like `Manifest.execute_raw` output for this datasource
+    invoke['Subdatasets'] = json.dumps({'First': feature_collection('a'), 'Second': feature_collection('b')})
+    invoke['Empty'] = '{}'
+    assert run(['Subdatasets', 'Empty']) == {'First': feature_collection('a'), 'Second': feature_collection('b')}
+
+
+@pytest.mark.parametrize('body', ['Internal error', '[1, 2]', '{"Broken": '])
+def test_invalid_json_only_drops_its_source(invoke, body):
+    invoke['Broken'] = body
+    invoke['Working'] = '{"Working": ' + json.dumps(feature_collection('a')) + '}'
+    response = run(['Broken', 'Working'])
+    assert response['Working'] == feature_collection('a')
+    assert list(response['errors']) == ['Broken']
+
+
+def test_dropped_sources_are_reported(invoke):
+    invoke['Failing'] = RuntimeError('Failing failed')
+    invoke['Slow'] = lambda: time.sleep(1) or {'Slow': feature_collection('b')}
+    invoke['Working'] = {'Working': feature_collection('a')}
+    start = time.time()
+    response = run(['Failing', 'Slow', 'Working'], timeout={'Slow': 0.1})
+    assert time.time() - start < 0.5
+    assert response == {
+        'Working': feature_collection('a'),
+        'errors': {'Failing': 'Failing failed', 'Slow': 'timed out after 0.1 seconds'},
+    }
+
+
+def test_error_status_when_every_source_fails(invoke):
+    invoke['Failing'] = RuntimeError('Failing failed')
+    assert run(['Failing'], status=502) == {'errors': {'Failing': 'Failing failed'}}
+    assert run([]) == {}
+
+
+def test_extra_members_are_merged(invoke):
+    # Prefix and suffix match `execute_raw` output, but a second member follows
+    invoke['A'] = '{"A": ' + json.dumps(feature_collection('a')) + ', "Shared": ' + \
+        json.dumps(feature_collection('s1')) + '}'
+    invoke['B'] = {'Shared': feature_collection('s2')}
+    response = handler.worker({'body': json.dumps({'intersects': spatial, 'datasources': ['A', 'B']})}, None)
+    assert response['body'].count('"Shared"') == 1
+    assert [x['id'] for x in json.loads(response['body'])['Shared']['features']] in (['s1', 's2'], ['s2', 's1'])
+
+
+def test_raw_segment():
+    segment = json.dumps(feature_collection('a'))
+    assert handler.raw_segment('A', '{"A":   ' + segment + '\n}') == segment
+    assert handler.raw_segment('A', '{"A": ' + segment + ', "B": {}}') is None
+    assert handler.raw_segment('A', '{"A": ' + segment[:-1] + '}') is None
+    assert handler.raw_segment('A', '{"A": [1, 2]}') is None
+
+
+def test_exact_filters_every_source(invoke):
+    pytest.importorskip('shapely')
+    outside = {'id': 'outside', 'properties': {}, 'bbox': [0.5, 0.5, 2, 2],
+               'geometry': {'type': 'Polygon', 'coordinates': [[[1.5, 1.5], [2, 1.5], [2, 2], [1.5, 2], [1.5, 1.5]]]}}
+    inside = {'id': 'inside', 'properties': {}, 'bbox': [0.2, 0.2, 0.4, 0.4],
+              'geometry': {'type': 'Polygon', 'coordinates': [[[0.2, 0.2], [0.4, 0.2], [0.4, 0.4], [0.2, 0.2]]]}}
+    features = {'type': 'FeatureCollection', 'features': [inside, outside]}
+    # Driver handlers ignoring `exact` return unfiltered items, raw or parsed
+    invoke['Raw'] = '{"Raw": ' + json.dumps(features) + '}'
+    invoke['Parsed'] = {'Parsed': json.loads(json.dumps(features))}
+    response = run(['Raw', 'Parsed'], exact=True)
+    assert [x['id'] for x in response['Raw']['features']] == ['inside']
+    assert [x['id'] for x in response['Parsed']['features']] == ['inside']
@@ -0,0 +1,36 @@
+import pytest
+from schema import SchemaError
+
+from datasources.stac.item import STACItem, STACItemError
+
+
+def item(idx, **properties):
+    properties.update({'datetime': '2018-11-01T18:30:00.000Z'})
+    return {
+        'id': 'item_{}'.format(idx),
+        'type': 'Feature',
+        'bbox': [0.0, 0.0, 1.0, 1.0],
+        'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]},
+        'properties': properties,
+        'assets': {'thumbnail': {'title': 'Thumbnail', 'href': 'https://example.com/thumbnail.jpg'}},
+    }
+
+
+def test_load_valid_item():
+    assert STACItem.load(item(0, **{'eo:gsd': 10.0, 'sar:looks': 1})).id == 'item_0'
+
+
+@pytest.mark.parametrize('properties', [{'eo:foo': 1}, {'sar:foo': 1}, {'eo:gsd': 'x'}])
+def test_load_rejects_invalid_extension_properties(properties):
+    with pytest.raises(SchemaError):
+        STACItem.load(item(0, **properties))
+
+
+def test_load_ignores_unprefixed_keys():
+    STACItem.load(item(0, **{'legacy:geometry_type': 'x', 'video': 1}))
+
+
+def test_load_many_reports_every_error():
+    with pytest.raises(STACItemError) as exc:
+        STACItem.load_many([item(0), item(1, **{'eo:foo': 1}), item(2), item(3, **{'eo:gsd': 'x'})])
+    assert [idx for (idx, _) in exc.value.errors] == [1, 3]
@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from datasources import Manifest, executors, manifest as manifest_module, metrics
+from datasources.scripts import _cli
+from datasources.sources.base import Datasource
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]]
+}
+
+
+class Lazy(Datasource):
+
+    tags = ['EO']
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+        self.manifest.searches.append([self, {'limit': limit}])
+
+    def execute(self, api_request):
+        return []
+
+
+class FakeRegistry(object):
+
+    def __init__(self, drivers):
+        self.drivers = drivers
+        self.loaded = []
+
+    def names(self, tag='all'):
+        return list(self.drivers)
+
+    def load(self, name):
+        self.loaded.append(name)
+        return self.drivers[name]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = FakeRegistry({'Lazy': type('Lazy', (Lazy,), {}), 'Other': type('Other', (Lazy,), {})})
+    monkeypatch.setattr(manifest_module, 'collections', registry)
+    return registry
+
+
+def test_enumeration_lists_registered_sources(registry):
+    manifest = Manifest()
+    assert sorted(manifest.keys()) == ['Lazy', 'Other']
+    assert sorted(manifest) == ['Lazy', 'Other']
+    assert len(manifest) == 2
+    assert 'Lazy' in manifest
+    # Listing names doesn't import the drivers
+    assert registry.loaded == []
+
+
+def test_values_load_sources(registry):
+    manifest = Manifest()
+    manifest['Lazy']
+    assert sorted(x.__class__.__name__ for x in manifest.values()) == ['Lazy', 'Other']
+    assert sorted(k for (k, v) in manifest.items()) == ['Lazy', 'Other']
+    assert len(manifest) == 2
+    assert sorted(registry.loaded) == ['Lazy', 'Other']
+
+
+def test_metrics_are_emitted_per_execution():
+    records = []
+    metrics.add_hook(records.append)
+    try:
+        manifest = Manifest(tags=[])
+        manifest.update({'Lazy': Lazy(manifest)})
+        for _ in range(2):
+            manifest.search(spatial, datasources=['Lazy'])
+            manifest.execute()
+            manifest.searches = []
+    finally:
+        metrics.remove_hook(records.append)
+    assert [x['counters']['searches'] for x in records] == [1, 1]
+
+
+def test_cli_debug_hook_is_removed_on_failure(monkeypatch):
+    class Failing(Lazy):
+        def execute(self, api_request):
+            raise RuntimeError('upstream failed')
+
+    def failing_manifest():
+        manifest = Manifest(tags=[])
+        manifest.update({'Failing': Failing(manifest)})
+        return manifest
+
+    monkeypatch.setattr(_cli, 'Manifest', failing_manifest)
+    hooks = list(metrics.hooks)
+    result = CliRunner().invoke(_cli.cognition_datasources,
+                                ['search', '--spatial', '0', '0', '1', '1', '-d', 'Failing', '--debug'])
+    assert isinstance(result.exception, RuntimeError)
+    assert metrics.hooks == hooks
+
+
+def test_coalesced_searches_report_upstream_spans_once():
+    class Slow(Lazy):
+        calls = 0
+
+        def execute(self, api_request):
+            Slow.calls += 1
+            time.sleep(0.2)
+            return [{'id': 'a'}]
+
+    records = []
+    metrics.add_hook(records.append)
+    try:
+        manifest = Manifest(tags=[])
+        manifest.update({'Slow': Slow(manifest)})
+        manifest.searches = [[manifest['Slow'], {'q': 1}], [manifest['Slow'], {'q': 1}]]
+        response = manifest.execute(max_workers=2)
+    finally:
+        metrics.remove_hook(records.append)
+    assert Slow.calls == 1
+    assert response['Slow']['features'] == [{'id': 'a'}]
+    assert records[0]['counters']['searches'] == 2
+    assert records[0]['counters']['coalesced'] == 1
+    assert 0.2 <= records[0]['spans']['execute'] < 0.4
+
+
+def test_empty_datasources_searches_nothing(registry):
+    manifest = Manifest()
+    manifest.search(spatial, datasources=[])
+    assert manifest.searches == []
+    manifest.search(spatial)
+    assert len(manifest.searches) == 2
+
+
+def test_cli_search_without_datasource(registry, tmpdir):
+    output = str(tmpdir.join('response.json'))
+    result = CliRunner().invoke(_cli.cognition_datasources, ['search', '--spatial', '0', '0', '1', '1', '-o', output])
+    assert result.exit_code == 0
+    with open(output) as f:
+        assert json.load(f) == {}
+    assert registry.loaded == []
+
+
+def test_one_pool_per_backend():
+    class Concurrent(Lazy):
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def execute(self, api_request):
+            with self.lock:
+                Concurrent.running += 1
+                Concurrent.peak = max(Concurrent.peak, Concurrent.running)
+            time.sleep(0.02)
+            with self.lock:
+                Concurrent.running -= 1
+            return [{'id': str(api_request)}]
+
+    manifest = Manifest(tags=[])
+    manifest.update({'Concurrent': Concurrent(manifest)})
+    for count in range(2, 7):
+        manifest.searches = [[manifest['Concurrent'], idx] for idx in range(count)]
+        assert len(manifest.execute(coalesce=False)['Concurrent']['features']) == count
+    assert Concurrent.peak <= 6
+    manifest.searches = [[manifest['Concurrent'], idx] for idx in range(10)]
+    Concurrent.peak = 0
+    manifest.execute(max_workers=2, coalesce=False)
+    assert Concurrent.peak == 2
+    # A single pool per backend, whatever the number of searches
+    assert set(executors._executors) <= set(executors.backends)
+
+
+def test_cli_search_deduplicates(monkeypatch, tmpdir):
+    class Duplicates(Lazy):
+        def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+            self.manifest.searches.append([self, 'first'])
+            self.manifest.searches.append([self, 'second'])
+
+        def execute(self, api_request):
+            return [{'id': 'a', 'properties': {}}, {'id': api_request, 'properties': {}}]
+
+    def duplicates_manifest():
+        manifest = Manifest(tags=[])
+        manifest.update({'Duplicates': Duplicates(manifest)})
+        return manifest
+
+    monkeypatch.setattr(_cli, 'Manifest', duplicates_manifest)
+    output = str(tmpdir.join('response.json'))
+    result = CliRunner().invoke(_cli.cognition_datasources,
+                                ['search', '--spatial', '0', '0', '1', '1', '-d', 'Duplicates', '-o', output])
+    assert result.exit_code == 0
+    with open(output) as f:
+        assert sorted(x['id'] for x in json.load(f)['Duplicates']['features']) == ['a', 'first', 'second']
+
+
+@pytest.mark.parametrize('template', [
+    os.path.join(os.path.dirname(__file__), '..', 'driver', 'handler.py'),
+    None,
+])
+def test_load_appends_handler_functions_only(template):
+    if template:
+        with open(template) as f:
+            contents = f.read()
+    else:
+        # Handlers of drivers created before the module-level state
+        contents = "from datasources import Manifest\n\ndef __TEMPLATENAME__(event, context):\n    pass\n"
+    lines = _cli.handler_function(contents.replace('__TEMPLATENAME__', 'Example'))
+    assert [x for x in lines if x][0] == 'def Example(event, context):'
+    # The service's handler.py defines the state shared by every driver once
+    assert not [x for x in lines if x.startswith(('from ', 'import ', 'manifests', 'spill'))]
@@ -0,0 +1,35 @@
+from datasources.merge import FeatureMerger, timestamp
+
+
+def feature(item_id, date_time, version):
+    return {'id': item_id, 'properties': {'datetime': date_time, 'version': version}}
+
+
+def merged_versions(policy, *collections):
+    merger = FeatureMerger(policy)
+    for features in collections:
+        merger.add('Source', {'type': 'FeatureCollection', 'features': features})
+    return [x['properties']['version'] for x in merger.response['Source']['features']]
+
+
+def test_first_policy_deduplicates():
+    assert merged_versions('first', [feature('a', None, 1)], [feature('a', None, 2), feature('b', None, 3)]) == [1, 3]
+
+
+def test_newest_policy_compares_instants():
+    assert merged_versions('newest', [feature('a', '2019-01-01T00:00:00.55Z', 1)],
+                           [feature('a', '2019-01-01T00:00:00.5Z', 2)]) == [1]
+    # Same instant in another offset isn't newer
+    assert merged_versions('newest', [feature('a', '2019-01-01T01:00:00Z', 1)],
+                           [feature('a', '2019-01-01T01:30:00+01:00', 2)]) == [1]
+    assert merged_versions('newest', [feature('a', '2019-01-01T01:00:00Z', 1)],
+                           [feature('a', '2019-01-01T03:30:00+02:00', 2)]) == [2]
+    # Items without a datetime are the oldest
+    assert merged_versions('newest', [feature('a', None, 1)], [feature('a', '2019-01-01', 2)]) == [2]
+
+
+def test_timestamp():
+    assert timestamp('2019-01-01T00:00:00Z') == timestamp('2019-01-01') == 1546300800
+    assert timestamp('2019-01-01T00:00:00.123456Z') == 1546300800.123456
+    assert timestamp('2019-01-01T02:00:00+02:00') == 1546300800
+    assert timestamp('01/01/2019') is None
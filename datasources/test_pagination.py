@@ -0,0 +1,79 @@
+import json
+
+from datasources import metrics
+from datasources.executors import _execute, _timed_execute
+from datasources.pagination import collect_pages
+from datasources.sources.base import Datasource
+
+
+class Paginated(Datasource):
+
+    def __init__(self, manifest, pages=10, page_size=10, raw=False):
+        super().__init__(manifest)
+        self.pages = pages
+        self.page_size = page_size
+        self.raw = raw
+        self.requested = 0
+        self.calls = 0
+
+    def execute(self, api_request):
+        self.calls += 1
+        for page in range(self.pages):
+            self.requested += 1
+            items = [{'id': '{}_{}'.format(page, idx)} for idx in range(self.page_size)]
+            if self.raw:
+                yield json.dumps({'type': 'FeatureCollection', 'features': items}).encode('utf-8')
+            else:
+                yield items
+
+
+def test_stops_at_limit():
+    source = Paginated(None)
+    items = _execute(source, {}, limit=25)
+    assert len(items) == 25
+    # The third page holds the 25th item, no page is prefetched past it
+    assert source.requested == 3
+
+
+def test_exact_page_boundary():
+    source = Paginated(None)
+    assert len(_execute(source, {}, limit=20)) == 20
+    assert source.requested == 2
+
+
+def test_raw_pages():
+    source = Paginated(None, raw=True)
+    feature_collection = _execute(source, {}, limit=15)
+    assert len(feature_collection['features']) == 15
+    assert source.requested == 2
+
+
+def test_no_limit():
+    source = Paginated(None, pages=3)
+    assert len(_execute(source, {})) == 30
+
+
+def test_zero_limit_makes_no_request():
+    source = Paginated(None)
+    assert _execute(source, {}, limit=0) == []
+    assert source.calls == 0
+    pages = source.execute({})
+    assert collect_pages(pages, limit=0) == []
+    assert source.requested == 0
+
+
+class Instrumented(Paginated):
+
+    def execute(self, api_request):
+        for page in range(3):
+            with metrics.span('upstream'):
+                items = [{'id': '{}_{}'.format(page, idx)} for idx in range(self.page_size)]
+            metrics.count('bytes', 100)
+            yield items
+
+
+def test_paginated_driver_metrics_are_recorded():
+    response, record = _timed_execute(Instrumented(None), {})
+    assert len(response) == 30
+    assert set(record['spans']) == {'execute', 'upstream'}
+    assert record['counters'] == {'bytes': 300}
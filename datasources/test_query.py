@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+from datasources.stac.query import STACQuery
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[-118.96, 34.96], [-111.71, 34.96], [-111.71, 40.75], [-118.96, 40.75], [-118.96, 34.96]]]
+}
+
+assets = [
+    {'datetime': '2018-02-01T00:00:00.000Z', 'eo:cloud_cover': 10.0, 'eo:platform': 'sentinel-2a'},
+    {'datetime': '2018-04-01T00:00:00.000Z', 'eo:cloud_cover': 10.0, 'eo:platform': 'sentinel-2a'},
+    {'datetime': '2018-05-01T00:00:00.000Z', 'eo:cloud_cover': 50.0, 'eo:platform': 'sentinel-2a'},
+    {'datetime': '2018-06-01T00:00:00.000Z', 'eo:cloud_cover': 5.0, 'eo:platform': 'sentinel-2b'},
+]
+
+
+def test_batch_filters_match_scalar_filters():
+    query = STACQuery(spatial, ("2018-03-01", "2018-09-30"),
+                      {'eo:cloud_cover': {'lt': 25}, 'eo:platform': {'ne': 'sentinel-2b'}})
+    scalar = [query.check_temporal(datetime.strptime(x['datetime'], '%Y-%m-%dT%H:%M:%S.%fZ')) and
+              query.check_properties(x) for x in assets]
+    batch = query.check_temporal_batch([x['datetime'] for x in assets]) & query.check_properties_batch(assets)
+    assert batch.tolist() == scalar == [False, True, False, False]
+
+
+def test_null_geometries_never_intersect():
+    pytest.importorskip('shapely')
+    query = STACQuery(spatial)
+    inside = {'type': 'Polygon', 'coordinates': [[[-115, 37], [-114, 37], [-114, 38], [-115, 38], [-115, 37]]]}
+    bbox = [-115, 37, -114, 38]
+    features = [
+        {'id': 'a', 'bbox': bbox, 'geometry': None},
+        {'id': 'b', 'bbox': bbox},
+        {'id': 'c', 'bbox': bbox, 'geometry': inside},
+        {'id': 'd', 'geometry': None},
+    ]
+    assert query.check_intersects_batch(features).tolist() == [False, False, True, False]
+    assert [query.check_intersects(x.get('geometry')) for x in features] == [False, False, True, False]
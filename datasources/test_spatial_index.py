@@ -0,0 +1,139 @@
+import json
+import random
+
+import pytest
+from click.testing import CliRunner
+
+from datasources.scripts import _cli
+from datasources.stac import query as query_module
+from datasources.stac.query import STACQuery
+from datasources.stac.spatial_index import SpatialIndex, SpatialIndexError, NODE_SIZE
+
+
+def random_boxes(count, rng):
+    boxes = []
+    for _ in range(count):
+        x, y = rng.uniform(-180, 175), rng.uniform(-90, 85)
+        boxes.append([x, y, x + rng.uniform(0, 5), y + rng.uniform(0, 5)])
+    return boxes
+
+
+def brute_force(boxes, bbox):
+    xmin, ymin, xmax, ymax = bbox
+    return sorted(i for (i, b) in enumerate(boxes) if not (b[2] < xmin or b[3] < ymin or b[0] > xmax or b[1] > ymax))
+
+
+@pytest.fixture
+def index(tmpdir):
+    indices = []
+
+    def build(items, node_size=NODE_SIZE):
+        path = str(tmpdir.join('index_{}'.format(len(indices))))
+        SpatialIndex.build(items, path, node_size)
+        indices.append(SpatialIndex(path))
+        return indices[-1]
+
+    yield build
+    for idx in indices:
+        idx.close()
+
+
+# Node size boundaries: a single leaf, one full node, one more item than a node, a full second level and one more
+@pytest.mark.parametrize('count', [1, 2, 15, 16, 17, 255, 256, 257, 1000, 5000])
+def test_search_matches_brute_force(index, count):
+    rng = random.Random(count)
+    boxes = random_boxes(count, rng)
+    idx = index([('item-{}'.format(i), b) for (i, b) in enumerate(boxes)])
+    assert len(idx) == count
+
+    queries = [[-180, -90, 180, 90], [200, 0, 210, 10]] + [
+        [x, y, x + rng.uniform(0, 60), y + rng.uniform(0, 60)]
+        for (x, y) in ((rng.uniform(-200, 180), rng.uniform(-100, 90)) for _ in range(50))
+    ]
+    # Boxes touching the edges of an item intersect it
+    queries += [[b[2], b[3], b[2] + 1, b[3] + 1] for b in boxes[:5]]
+    queries += [[b[0] - 1, b[1] - 1, b[0], b[1]] for b in boxes[:5]]
+    for bbox in queries:
+        expected = brute_force(boxes, bbox)
+        assert sorted(idx.search(bbox)) == expected
+        assert sorted(idx.intersects(bbox)) == sorted('item-{}'.format(i) for i in expected)
+
+
+@pytest.mark.parametrize('node_size', [2, 3, 4])
+def test_small_node_sizes(index, node_size):
+    rng = random.Random(node_size)
+    boxes = random_boxes(300, rng)
+    idx = index(list(enumerate(boxes)), node_size=node_size)
+    for _ in range(50):
+        x, y = rng.uniform(-180, 180), rng.uniform(-90, 90)
+        bbox = [x, y, x + 20, y + 20]
+        assert sorted(idx.search(bbox)) == brute_force(boxes, bbox)
+
+
+def test_identical_boxes(index):
+    # Every item shares the same center on the hilbert curve
+    idx = index([(i, [1, 1, 2, 2]) for i in range(300)])
+    assert sorted(idx.search([1.5, 1.5, 1.6, 1.6])) == list(range(300))
+    assert idx.search([3, 3, 4, 4]) == []
+
+
+def test_empty_index(tmpdir):
+    with pytest.raises(SpatialIndexError):
+        SpatialIndex.build([], str(tmpdir.join('index')))
+
+
+def test_not_an_index(tmpdir):
+    path = tmpdir.join('index')
+    path.write_binary(b'\0' * 64)
+    with pytest.raises(SpatialIndexError):
+        SpatialIndex(str(path))
+
+
+footprints = {
+    'type': 'FeatureCollection',
+    'features': [
+        {'type': 'Feature', 'id': 'a', 'properties': {'name': 'tile-a'},
+         'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}},
+        {'type': 'Feature', 'id': 'b', 'properties': {'name': 'tile-b'}, 'bbox': [10, 10, 0, 11, 11, 100],
+         'geometry': {'type': 'Polygon', 'coordinates': [[[10, 10], [11, 10], [11, 11], [10, 11], [10, 10]]]}},
+        {'type': 'Feature', 'id': 'c', 'properties': {'name': 'tile-c'},
+         'geometry': {'type': 'GeometryCollection', 'geometries': [
+             {'type': 'Point', 'coordinates': [20, 20]}, {'type': 'Point', 'coordinates': [21, 21]}]}},
+    ]
+}
+
+
+@pytest.mark.parametrize('id_field, expected', [(None, ['a', 'b']), ('name', ['tile-a', 'tile-b'])])
+def test_cli_build_index(tmpdir, id_field, expected):
+    infile = tmpdir.join('footprints.geojson')
+    infile.write(json.dumps(footprints))
+    output = str(tmpdir.join('index'))
+    args = ['build-index', '-i', str(infile), '-o', output] + (['--id-field', id_field] if id_field else [])
+    result = CliRunner().invoke(_cli.cognition_datasources, args)
+    assert result.exit_code == 0, result.output
+
+    idx = SpatialIndex(output)
+    try:
+        assert sorted(idx.intersects([0.5, 0.5, 10.5, 10.5])) == expected
+        assert len(idx.intersects([20.5, 20.5, 30, 30])) == 1
+        assert idx.intersects([2, 2, 9, 9]) == []
+    finally:
+        idx.close()
+
+
+def test_check_spatial_falls_back_to_index(tmpdir, monkeypatch):
+    monkeypatch.setattr(query_module, 'spatial_indices', {})
+    monkeypatch.chdir(tmpdir)
+    query = STACQuery({'type': 'Polygon', 'coordinates': [[[0.5, 0.5], [10.5, 0.5], [10.5, 10.5], [0.5, 10.5],
+                                                           [0.5, 0.5]]]})
+    with pytest.raises(FileNotFoundError):
+        query.check_spatial('NoSuchDatasource')
+
+    SpatialIndex.from_geojson(footprints, 'index')
+    try:
+        assert sorted(query.check_spatial('NoSuchDatasource')) == ['a', 'b']
+        # The index stays open for the following searches
+        assert list(query_module.spatial_indices) == ['index']
+    finally:
+        for idx in query_module.spatial_indices.values():
+            idx.close()
@@ -0,0 +1,34 @@
+import json
+
+from datasources.storage import LocalStorage, Spiller, load_spilled
+
+
+def members(count):
+    feature_collection = {
+        "type": "FeatureCollection",
+        "features": [{"id": str(x), "properties": {"name": "été \"{}\"".format(x)}} for x in range(count)]
+    }
+    return [('Source', json.dumps(feature_collection).encode('utf-8'))]
+
+
+def test_spill_roundtrip(tmpdir):
+    storage = LocalStorage(str(tmpdir))
+    spilled = Spiller(storage, threshold=100).fit(members(10), {'Source': 10})
+    pointer = json.loads(spilled[0][1].decode('utf-8'))
+    assert pointer['spilled']['items'] == 10
+    assert len(load_spilled(pointer, storage)['features']) == 10
+
+
+def test_escaped_size(tmpdir):
+    segment = members(100)[0][1]
+    spiller = Spiller(LocalStorage(str(tmpdir)), escaped=True)
+    assert spiller.size(segment) == len(json.dumps(segment.decode('utf-8'))) - 2
+    assert spiller.size(segment) > len(segment)
+
+
+def test_escaped_threshold(tmpdir):
+    segment = members(100)[0][1]
+    # Fits unescaped, but not once returned as a JSON string
+    threshold = len(segment) + 100
+    assert Spiller(LocalStorage(str(tmpdir)), threshold=threshold).fit(members(100))[0][1] == segment
+    assert Spiller(LocalStorage(str(tmpdir)), threshold=threshold, escaped=True).fit(members(100))[0][1] != segment
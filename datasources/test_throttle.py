@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from datasources import throttle
+from datasources.executors import _timed_execute
+from datasources.sources.base import Datasource
+from datasources.testing import FakeServer
+from datasources.throttle import AdaptiveLimit, TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def throttles():
+    # Throttles are shared by every search of a datasource in the process
+    throttle._throttles.clear()
+    yield
+    throttle._throttles.clear()
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(rate=1000, error_rate=0.0):
+        server = FakeServer(rate, error_rate, latency=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class Unthrottled(Datasource):
+
+    def __init__(self, manifest, url=None):
+        super().__init__(manifest)
+        self.url = url
+        self.session = requests.Session()
+
+    def execute(self, api_request):
+        r = self.session.get(self.url, params={'q': api_request})
+        r.raise_for_status()
+        return r.json()['results']
+
+
+class Retrying(Unthrottled):
+
+    retries = 2
+    retry_backoff = 0.05
+
+
+class Paginated(Datasource):
+
+    rate_limit = 20
+
+    def __init__(self, manifest):
+        super().__init__(manifest)
+        self.requested = []
+
+    def execute(self, api_request):
+        for page in range(5):
+            self.requested.append(time.monotonic())
+            yield [{'id': str(page)}]
+
+
+def test_token_bucket():
+    bucket = TokenBucket(10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_aimd_halves_on_failure():
+    limit = AdaptiveLimit(16)
+    limit.update(False)
+    assert limit.concurrency == 8
+    limit.update(False)
+    assert limit.concurrency == 4
+    for _ in range(20):
+        limit.update(False)
+    assert limit.concurrency == 1
+
+
+def test_aimd_increases_by_one_per_round():
+    limit = AdaptiveLimit(16)
+    for _ in range(3):
+        limit.update(False)
+    assert limit.concurrency == 2
+    # Each successful search adds 1 / limit, about one search per round of `limit` searches
+    limit.update(True)
+    limit.update(True)
+    assert limit.concurrency == 2
+    limit.update(True)
+    assert limit.concurrency == 3
+    for _ in range(200):
+        limit.update(True)
+    assert limit.concurrency == 16
+
+
+def test_aimd_latency_target():
+    limit = AdaptiveLimit(16, latency_target=1.0)
+    limit.update(True, 0.5)
+    assert limit.concurrency == 16
+    limit.update(True, 2.0)
+    assert limit.concurrency == 8
+
+
+def test_no_retries_by_default(server):
+    fake = server(error_rate=1.0)
+    with pytest.raises(requests.HTTPError):
+        _timed_execute(Unthrottled(None, fake.url), 'query')
+    assert fake.statuses == {503: 1}
+
+
+def test_retries_on_503(server):
+    fake = server(error_rate=1.0)
+    with pytest.raises(requests.HTTPError):
+        _timed_execute(Retrying(None, fake.url), 'query')
+    assert fake.statuses == {503: 3}
+
+
+def test_retries_on_429(server, monkeypatch):
+    # Wait the longest backoff so the server's bucket refills
+    monkeypatch.setattr(throttle.random, 'uniform', lambda a, b: b)
+    fake = server(rate=10)
+    source = Retrying(None, fake.url)
+    _timed_execute(source, 'first')
+    response, record = _timed_execute(source, 'second')
+    assert response == [{'id': '/search?q=second'}]
+    assert record['counters']['retries'] >= 1
+    assert fake.statuses[429] == record['counters']['retries']
+
+
+def test_rate_limit_applies_to_pages():
+    source = Paginated(None)
+    response, record = _timed_execute(source, 'query')
+    assert len(response) == 5
+    # Burst of one request, then one request every 1 / rate_limit seconds
+    assert source.requested[-1] - source.requested[0] >= 4 / Paginated.rate_limit - 0.01
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from datasources import Manifest
+from datasources.sources.base import Datasource
+from datasources.tiling import GridTiling, QuadtreeTiling, tile
+
+spatial = {
+    "type": "Polygon",
+    "coordinates": [[[0.0, 0.0], [4.0, 0.0], [4.0, 4.0], [0.0, 4.0], [0.0, 0.0]]]
+}
+
+
+class Grid(Datasource):
+
+    stac_compliant = False
+
+    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
+        ring = spatial['coordinates'][0]
+        self.manifest.searches.append([self, [min(x[0] for x in ring), min(x[1] for x in ring)]])
+
+    def execute(self, api_request):
+        # 20 items per tile, all distinct
+        return [{'id': '{}_{}_{}'.format(api_request[0], api_request[1], idx)} for idx in range(20)]
+
+
+def test_grid_tiling():
+    assert len(tile(spatial, GridTiling(2, 2))) == 4
+
+
+def test_quadtree_tiling():
+    assert len(QuadtreeTiling(1.0).split([0, 0, 4, 4])) == 16
+    assert len(QuadtreeTiling(1.0, max_depth=1).split([0, 0, 4, 4])) == 4
+
+
+@pytest.mark.parametrize('max_size', [0, -1.0])
+def test_quadtree_rejects_non_positive_size(max_size):
+    with pytest.raises(ValueError):
+        QuadtreeTiling(max_size)
+
+
+def test_tiled_response_is_truncated_to_limit():
+    manifest = Manifest(tags=[])
+    manifest.update({'Grid': Grid(manifest)})
+    manifest.search(spatial, limit=25, datasources=['Grid'], tiling=GridTiling(2, 2))
+    assert len(manifest.searches) == 4
+    assert len(manifest.execute()['Grid']['features']) == 25
+
+
+def test_tiled_raw_response_is_truncated_to_limit():
+    manifest = Manifest(tags=[])
+    manifest.update({'Grid': Grid(manifest)})
+    manifest.search(spatial, limit=5, datasources=['Grid'], tiling=GridTiling(1, 1))
+    assert len(json.loads(manifest.execute_raw().decode('utf-8'))['Grid']['features']) == 5
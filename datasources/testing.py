@@ -0,0 +1,105 @@
+"""
+Local fake HTTP servers used by the tests and benchmarks, so neither needs network access.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from datasources.throttle import TokenBucket
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+    """
+    Search API accepting `rate` requests per second, answering 429 above that rate and 503 to a fraction
+    `error_rate` of the requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, rate, error_rate, latency=0.02):
+        super().__init__(('127.0.0.1', 0), FakeHandler)
+        self.bucket = TokenBucket(rate, burst=max(1, int(rate / 10)))
+        self.error_rate = error_rate
+        self.latency = latency
+        self.random = random.Random(0)
+        self.lock = threading.Lock()
+        self.statuses = {}
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/search'.format(self.server_address[1])
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        with server.lock:
+            if server.bucket.reserve() > 0:
+                # Over the rate limit, give the token back
+                server.bucket.tokens += 1
+                status = 429
+            elif server.random.random() < server.error_rate:
+                status = 503
+            else:
+                status = 200
+            server.statuses[status] = server.statuses.get(status, 0) + 1
+        body = json.dumps({'results': [{'id': self.path}]}).encode('utf-8') if status == 200 else b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCDN(ThreadingMixIn, HTTPServer):
+    """
+    CDN serving `file_bytes` bytes for every path, or a successful CI status for paths ending with `/ci`, after
+    `latency` seconds, with `ETag` headers and 304 responses to conditional requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency, file_bytes=20000):
+        super().__init__(('127.0.0.1', 0), FakeCDNHandler)
+        self.latency = latency
+        self.file_bytes = file_bytes
+        self.lock = threading.Lock()
+        self.statuses = {}
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+
+class FakeCDNHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        if self.path.endswith('/ci'):
+            body = json.dumps([{'status': 'success'}]).encode('utf-8')
+        else:
+            body = (self.path * (server.file_bytes // len(self.path) + 1)).encode('utf-8')[:server.file_bytes]
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        status = 304 if self.headers.get('If-None-Match') == etag else 200
+        with server.lock:
+            server.statuses[status] = server.statuses.get(status, 0) + 1
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        if status == 200:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if status == 200:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,223 @@
+"""
+Rate limiting, adaptive concurrency and retries of driver searches.
+
+Each datasource gets a `Throttle` built from the class attributes of its driver (see `Datasource`), shared by every
+search of that datasource run in the process:
+
+- A token bucket spaces upstream requests to `rate_limit` requests per second, with bursts of up to `rate_burst`.
+  Paginated searches take a token for each page they request.
+- An AIMD limit caps concurrent searches below `max_concurrency`.  The limit is halved when a search fails with a
+  retryable error or is slower than `latency_target`, and grows back by one search per "round" of successful searches.
+- Failed searches for which `Datasource.is_retryable` returns True are retried up to `retries` times, waiting a random
+  delay of up to `retry_backoff * 2 ** attempt` seconds (or the `Retry-After` header of the response) in between.
+  Drivers opt in to retries, `retries` defaults to 0.
+
+Throttles only coordinate the searches of a single process.  Each worker process of the `process` executor (and
+each Lambda container) has its own token bucket and concurrency limit, so a datasource searched from N processes may
+receive up to N times `rate_limit` requests per second: divide `rate_limit` by the number of processes when the API
+enforces a global limit.
+"""
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, possibly ahead of time.
+
+        :return: Number of seconds to wait before using it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+
+class AdaptiveLimit(object):
+    """
+    Concurrency limit adjusted with additive increase / multiplicative decrease.
+    """
+
+    def __init__(self, max_concurrency, latency_target=None, min_concurrency=1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_target = latency_target
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self.condition = threading.Condition()
+
+    @property
+    def concurrency(self):
+        return int(self.limit)
+
+    def acquire(self):
+        with self.condition:
+            while self.active >= self.concurrency:
+                self.condition.wait()
+            self.active += 1
+
+    def release(self, success, latency=None):
+        with self.condition:
+            self.active -= 1
+            self._adjust(success, latency)
+            self.condition.notify_all()
+
+    def update(self, success, latency=None):
+        """
+        Adjust the limit after a search which didn't `acquire` it.
+        """
+        with self.condition:
+            self._adjust(success, latency)
+            self.condition.notify_all()
+
+    def _adjust(self, success, latency=None):
+        if not success or (self.latency_target and latency is not None and latency > self.latency_target):
+            self.limit = max(self.min_concurrency, self.limit / 2)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+
+class Throttle(object):
+
+    def __init__(self, rate_limit=None, rate_burst=1, max_concurrency=None, latency_target=None, retries=0,
+                 retry_backoff=0.5, max_backoff=30):
+        self.bucket = TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        self.limit = AdaptiveLimit(max_concurrency, latency_target) if max_concurrency else None
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def from_source(cls, source):
+        return cls(
+            rate_limit=source.rate_limit,
+            rate_burst=source.rate_burst,
+            max_concurrency=source.max_concurrency,
+            latency_target=source.latency_target,
+            retries=source.retries,
+            retry_backoff=source.retry_backoff,
+            max_backoff=source.max_backoff,
+        )
+
+    @property
+    def concurrency(self):
+        """
+        Current number of concurrent searches allowed, or None.
+        """
+        return self.limit.concurrency if self.limit else None
+
+    def backoff(self, attempt, exc):
+        delay = random.uniform(0, min(self.max_backoff, self.retry_backoff * 2 ** attempt))
+        headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+        try:
+            delay = max(delay, min(self.max_backoff, float(headers.get('Retry-After'))))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def call(self, source, fn, *args):
+        """
+        Call `fn(*args)` within the limits of the throttle, retrying failures accepted by `source.is_retryable`.
+
+        :return: (result, number of retries)
+        """
+        attempt = 0
+        while True:
+            if self.bucket:
+                time.sleep(self.bucket.reserve())
+            if self.limit:
+                self.limit.acquire()
+            start = time.monotonic()
+            try:
+                result = fn(*args)
+            except Exception as exc:
+                retryable = source.is_retryable(exc)
+                if self.limit:
+                    # Only errors signalling an overloaded or unavailable API lower the concurrency
+                    self.limit.release(not retryable)
+                if attempt >= self.retries or not retryable:
+                    raise
+                time.sleep(self.backoff(attempt, exc))
+                attempt += 1
+                continue
+            if self.limit:
+                self.limit.release(True, time.monotonic() - start)
+            return result, attempt
+
+    def pages(self, pages):
+        """
+        Wrap the page generator of a paginated search so a token is taken before requesting each page after the first
+        one, which is requested within `call`.
+        """
+        try:
+            for page in pages:
+                yield page
+                if self.bucket:
+                    time.sleep(self.bucket.reserve())
+        finally:
+            pages.close()
+
+    async def async_pages(self, pages):
+        """
+        Equivalent of `pages` for async generators.
+        """
+        try:
+            async for page in pages:
+                yield page
+                if self.bucket:
+                    await asyncio.sleep(self.bucket.reserve())
+        finally:
+            await pages.aclose()
+
+    async def call_async(self, source, fn, *args):
+        """
+        Equivalent of `call` for coroutine functions.  Concurrency is only limited by the manifest, see
+        `Throttle.concurrency`.
+        """
+        attempt = 0
+        while True:
+            if self.bucket:
+                await asyncio.sleep(self.bucket.reserve())
+            start = time.monotonic()
+            try:
+                result = await fn(*args)
+            except Exception as exc:
+                retryable = source.is_retryable(exc)
+                if self.limit:
+                    self.limit.update(not retryable)
+                if attempt >= self.retries or not retryable:
+                    raise
+                await asyncio.sleep(self.backoff(attempt, exc))
+                attempt += 1
+                continue
+            if self.limit:
+                self.limit.update(True, time.monotonic() - start)
+            return result, attempt
+
+
+_throttles = {}
+_lock = threading.Lock()
+
+
+def get_throttle(source):
+    """
+    :return: Throttle shared by every search of the datasource in this process.
+    """
+    name = source.__class__.__name__
+    with _lock:
+        if name not in _throttles:
+            _throttles[name] = Throttle.from_source(source)
+        return _throttles[name]
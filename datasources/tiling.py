@@ -0,0 +1,102 @@
+"""
+Split large search areas into tiles which are searched in parallel by `Manifest.search`.
+"""
+
+
+class GridTiling(object):
+    """
+    Split the bounding box of the search area into a regular grid of `rows` x `cols` tiles.
+    """
+
+    def __init__(self, rows=2, cols=2):
+        self.rows = rows
+        self.cols = cols
+
+    def split(self, bbox):
+        xmin, ymin, xmax, ymax = bbox
+        width = (xmax - xmin) / self.cols
+        height = (ymax - ymin) / self.rows
+        return [[xmin + col * width, ymin + row * height, xmin + (col + 1) * width, ymin + (row + 1) * height]
+                for row in range(self.rows) for col in range(self.cols)]
+
+
+class QuadtreeTiling(object):
+    """
+    Recursively quarter the bounding box of the search area until tiles are at most `max_size` degrees wide and tall,
+    or have been quartered `max_depth` times (at most `4 ** max_depth` tiles).
+    """
+
+    def __init__(self, max_size=1.0, max_depth=6):
+        if not max_size > 0:
+            raise ValueError("max_size must be positive, got {}".format(max_size))
+        if max_depth < 0:
+            raise ValueError("max_depth can't be negative, got {}".format(max_depth))
+        self.max_size = max_size
+        self.max_depth = max_depth
+
+    def split(self, bbox, depth=0):
+        xmin, ymin, xmax, ymax = bbox
+        if depth >= self.max_depth or (xmax - xmin <= self.max_size and ymax - ymin <= self.max_size):
+            return [bbox]
+        xmid = (xmin + xmax) / 2
+        ymid = (ymin + ymax) / 2
+        tiles = []
+        for quadrant in ([xmin, ymin, xmid, ymid], [xmid, ymin, xmax, ymid],
+                         [xmin, ymid, xmid, ymax], [xmid, ymid, xmax, ymax]):
+            tiles += self.split(quadrant, depth + 1)
+        return tiles
+
+
+def clip(ring, bbox):
+    """
+    Clip a polygon ring to a bounding box (Sutherland-Hodgman).
+
+    :return: Open list of positions, empty if the ring doesn't overlap the bounding box.
+    """
+    xmin, ymin, xmax, ymax = bbox
+    edges = [
+        (lambda p: p[0] >= xmin, lambda p, q: [xmin, p[1] + (q[1] - p[1]) * (xmin - p[0]) / (q[0] - p[0])]),
+        (lambda p: p[0] <= xmax, lambda p, q: [xmax, p[1] + (q[1] - p[1]) * (xmax - p[0]) / (q[0] - p[0])]),
+        (lambda p: p[1] >= ymin, lambda p, q: [p[0] + (q[0] - p[0]) * (ymin - p[1]) / (q[1] - p[1]), ymin]),
+        (lambda p: p[1] <= ymax, lambda p, q: [p[0] + (q[0] - p[0]) * (ymax - p[1]) / (q[1] - p[1]), ymax]),
+    ]
+    positions = [list(x[:2]) for x in ring[:-1]]
+    for (inside, intersection) in edges:
+        if not positions:
+            break
+        clipped = []
+        previous = positions[-1]
+        for current in positions:
+            if inside(current):
+                if not inside(previous):
+                    clipped.append(intersection(previous, current))
+                clipped.append(current)
+            elif inside(previous):
+                clipped.append(intersection(previous, current))
+            previous = current
+        positions = clipped
+    return positions
+
+
+def area(positions):
+    return abs(sum(p[0] * q[1] - q[0] * p[1] for (p, q) in zip(positions, positions[1:] + positions[:1]))) / 2
+
+
+def tile(spatial, tiling):
+    """
+    Split a GeoJSON polygon into the parts covered by each tile.
+
+    :param spatial: GeoJSON polygon of the search area.
+    :param tiling: `GridTiling` or `QuadtreeTiling`.
+    :return: List of GeoJSON polygons, tiles which don't overlap the search area are dropped.
+    """
+    ring = spatial['coordinates'][0]
+    bbox = [min(x[0] for x in ring), min(x[1] for x in ring), max(x[0] for x in ring), max(x[1] for x in ring)]
+    tiles = []
+    for tile_bbox in tiling.split(bbox):
+        positions = clip(ring, tile_bbox)
+        # Drop the repeated positions left where the ring runs along the tile's edges
+        positions = [p for (idx, p) in enumerate(positions) if p != positions[idx - 1]]
+        if len(positions) >= 3 and area(positions) > 0:
+            tiles.append({'type': 'Polygon', 'coordinates': [positions + [positions[0]]]})
+    return tiles
@@ -1,9 +1,18 @@
-from datasources import Manifest
+from datasources import ManifestPool, storage
+
+# Created once per container: drivers (and their sessions) are reused by warm invocations.  `cognition-datasources load`
+# only appends the handler function below to the service's handler.py, which defines this state itself
+manifests = ManifestPool()
+# Large responses are written to the storage configured by `SERVICE_SPILL_STORAGE` to stay below the Lambda payload
+# limit
+spill = storage.Spiller.from_environment()
 
 def __TEMPLATENAME__(event, context):
-    manifest = Manifest()
-    manifest['__TEMPLATENAME__'].search(**event)
-    response = manifest.execute()
-    return response
+    with manifests.manifest() as manifest:
+        manifest.search(datasources=['__TEMPLATENAME__'], **event)
+        # Returned pre-serialized so the service splices the response without parsing it.  The Lambda runtime returns
+        # the str JSON-encoded (quotes and backslashes escaped), which the spiller's threshold accounts for
+        response = manifest.execute_raw(spill=spill)
+    return response.decode('utf-8')
 
 
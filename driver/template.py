@@ -11,18 +11,21 @@ class __TEMPLATENAME__(Datasource):
     def __init__(self, manifest):
         super().__init__(manifest)
 
-    def search(self, spatial, temporal=None, properties=None, limit=10, **kwargs):
-        stac_query = STACQuery(spatial, temporal)
+    def search(self, spatial, temporal=None, properties=None, limit=10, stac_query=None, **kwargs):
+        # Query compiled once by the manifest and shared by every driver, or compiled here when called directly
+        stac_query = stac_query or STACQuery(spatial, temporal, properties)
 
         api_request = #Parse stac_query into API-compatible JSON request, append to manifest
 
-        self.manifest.searches.append([self, api_request])
+        # The optional third element lets the manifest stop paginated responses once `limit` items are returned
+        self.manifest.searches.append([self, api_request, {'limit': limit}])
 
     def execute(self, api_request):
         response = # api response
 
         if self.stac_compliant:
-            # Return output as is (should be Feature Collection)
+            # Return output as is (should be Feature Collection), preferably as the raw response body (bytes) so it
+            # isn't parsed and serialized again
             return response
         else:
             # Parse api response into STAC-compliant item and return as list of STAC Items
@@ -1,35 +1,88 @@
 import os
-from multiprocessing import Process, Pipe
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import json
 
-from datasources import Manifest
+# Manifest is also used by the driver handlers appended by `cognition-datasources load`
+from datasources import Manifest, ManifestPool, metrics, storage
+from datasources.merge import FeatureMerger
+from datasources.stac.query import STACQuery
 import boto3
+from botocore.config import Config
 
 service = os.environ['SERVICE_NAME']
 stage = os.environ['SERVICE_STAGE']
 region = os.environ['SERVICE_REGION']
+max_workers = int(os.environ.get('SERVICE_MAX_WORKERS', 16))
+source_timeout = float(os.environ.get('SERVICE_SOURCE_TIMEOUT', 28))
 
-lambda_client = boto3.client('lambda')
+# Created once per container and shared by all invocations.  boto3 clients are thread-safe, the connection pool is
+# sized to the number of worker threads so concurrent invocations reuse connections.  Throttled invocations
+# (`TooManyRequestsException`) are retried by botocore.
+lambda_client = boto3.client('lambda', config=Config(
+    max_pool_connections=max_workers,
+    read_timeout=source_timeout,
+))
+# Responses larger than `SERVICE_SPILL_THRESHOLD` are written to `SERVICE_SPILL_STORAGE` when it is set
+spill = storage.Spiller.from_environment()
+# Shared by the driver handlers appended by `cognition-datasources load`: drivers (and their sessions) are reused by
+# warm invocations
+manifests = ManifestPool()
+
+# Per-source timings and counters are written to the logs in CloudWatch Embedded Metric Format
+if os.environ.get('SERVICE_METRICS', '1') != '0':
+    metrics.add_hook(metrics.EMFExporter(namespace=service))
+
+
+decoder = json.JSONDecoder()
 
-def worker(event, context):
 
-    def lambda_invoke(service, stage, source, args, conn=None, multi=False):
+def lambda_invoke(service, stage, source, args):
+    with metrics.span('upstream'):
         response = lambda_client.invoke(
             FunctionName=f"{service}-{stage}-{source}",
             InvocationType="RequestResponse",
             Payload=json.dumps(args)
         )
-        data = json.loads(response['Payload'].read())
-        if multi:
-            conn.send(data)
-            conn.close()
-        else:
-            return data
+        payload = response['Payload'].read()
+    metrics.count('bytes', len(payload))
+    with metrics.span('parse'):
+        data = json.loads(payload)
+    if 'FunctionError' in response:
+        raise RuntimeError("{} failed: {}".format(source, data))
+    return data
+
+
+def raw_segment(source, response):
+    """
+    :return: Feature collection of `source` (str) in a response pre-serialized by `Manifest.execute_raw`, of the form
+        `{"<source>": {...}}`, or None if the response doesn't have exactly this shape (ex. other members).  The
+        feature collection is decoded to check that it is a single JSON object, but isn't merged or serialized again.
+    """
+    response = response.strip()
+    prefix = '{' + json.dumps(source) + ':'
+    if not response.startswith(prefix):
+        return None
+    start = len(response) - len(response[len(prefix):].lstrip())
+    try:
+        value, end = decoder.raw_decode(response, start)
+    except ValueError:
+        return None
+    if not isinstance(value, dict) or response[end:].strip() != '}':
+        return None
+    return response[start:end]
+
+
+def timed_invoke(record, source, args):
+    with metrics.recording(record):
+        return lambda_invoke(service, stage, source, args)
+
+
+def worker(event, context):
 
     package = json.loads(event['body'])
     params = list(package)
     args = {}
-    out_d = {}
 
     if 'time' in params:
         args.update({'temporal': package['time'].split('/')})
@@ -68,39 +121,107 @@ def worker(event, context):
     if 'subdatasets' in params:
         args.update({'subdatasets': package['subdatasets']})
 
-    processes = []
-    parent_connections = []
-
-    if len(package['datasources']) == 1:
-        source = list(package['datasources'])[0]
-        return {
-            'statusCode': 200,
-            'body': json.dumps(lambda_invoke(service, stage, source, args, multi=False))
-        }
-
+    # Only return items intersecting the exact search area (see `Manifest.search`).  The handlers of drivers loaded
+    # before `exact` existed ignore it, so the worker filters the items of every datasource itself.
+    exact = STACQuery(args['spatial']) if package.get('exact') else None
+    if exact is not None:
+        args.update({'exact': True})
+
+    # Per-source timeouts, either a single value or a dictionary keyed by datasource name
+    timeouts = package['timeout'] if 'timeout' in params else {}
+    if not isinstance(timeouts, dict):
+        timeouts = {source: timeouts for source in package['datasources']}
+
+    # Deduplicates items returned by several datasources or subdatasets, optionally keeping the newest
+    merger = FeatureMerger(package.get('merge', 'first'))
+
+    start = time.time()
+    deadlines = {}
+    records = {}
+    # Serialized feature collections keyed by datasource name
+    members = []
+    # Reason each failed or timed out datasource was dropped, keyed by datasource name
+    errors = {}
+    # Invocations can't be interrupted, so each request gets its own threads: invocations still running past their
+    # deadline finish in the background (bounded by the client's `read_timeout`) without holding the threads of later
+    # requests to a warm container.
+    executor = ThreadPoolExecutor(max(1, min(max_workers, len(package['datasources']))))
     for source in package['datasources']:
-        parent_conn, child_conn = Pipe()
-        parent_connections.append(parent_conn)
-
-        process = Process(target=lambda_invoke, args=(service, stage, source, args, child_conn, True))
-        processes.append(process)
-
-    for process in processes:
-        process.start()
-
-    for process in processes:
-        process.join()
-
-    for parent_connection in parent_connections:
-        response = parent_connection.recv()
-        for item in response:
-            if item not in list(out_d):
-                out_d.update({item: response[item]})
-            else:
-                out_d[item]['features'] += response[item]['features']
-
+        records.update({source: metrics.SearchMetrics(source)})
+        future = executor.submit(timed_invoke, records[source], source, args)
+        deadlines.update({future: (source, start + float(timeouts.get(source, source_timeout)))})
+    executor.shutdown(wait=False)
+
+    # Merge responses as each invocation completes.  Sources which don't finish before their deadline are dropped.
+    pending = set(deadlines)
+    while pending:
+        remaining = min(deadlines[future][1] for future in pending) - time.time()
+        done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            source = deadlines[future][0]
+            record = records[source]
+            try:
+                response = future.result()
+            except Exception as exc:
+                record.count('errors')
+                errors.update({source: str(exc)})
+                print("WARNING: {} was dropped from the response ({})".format(source, exc))
+                continue
+            if isinstance(response, str):
+                # Pre-serialized response (see `Manifest.execute_raw`), spliced into the body without being merged.
+                # Other strings are parsed and merged, the datasource is dropped if they aren't a JSON object.
+                segment = raw_segment(source, response) if exact is None else None
+                if segment is not None:
+                    members.append((source, segment))
+                    continue
+                try:
+                    with record.span('parse'):
+                        response = json.loads(response)
+                except ValueError:
+                    response = None
+                if not isinstance(response, dict):
+                    record.count('errors')
+                    errors.update({source: "invalid response, not a JSON object"})
+                    print("WARNING: {} was dropped from the response (not a JSON object)".format(source))
+                    continue
+            with record.span('merge'):
+                merger.add_response(response)
+
+        for future in [x for x in pending if deadlines[x][1] <= time.time()]:
+            future.cancel()
+            pending.remove(future)
+            source = deadlines[future][0]
+            records[source].count('timeouts')
+            errors.update({source: "timed out after {} seconds".format(timeouts.get(source, source_timeout))})
+            print("WARNING: {} timed out and was dropped from the response".format(source))
+
+    # Serialize each feature collection separately to time it per source, the body is the same as `json.dumps`
+    items = {}
+    for (source_name, feature_collection) in merger.response.items():
+        record = records.setdefault(source_name, metrics.SearchMetrics(source_name))
+        if exact is not None and feature_collection['features']:
+            features = feature_collection['features']
+            with record.span('filter'):
+                mask = exact.check_intersects_batch(features)
+                feature_collection.update({'features': [x for (x, m) in zip(features, mask) if m]})
+            record.count('filtered', len(features) - len(feature_collection['features']))
+        with record.span('serialization'):
+            members.append((source_name, json.dumps(feature_collection)))
+        items.update({source_name: len(feature_collection['features'])})
+        record.count('items', items[source_name])
+
+    # The body is returned as a JSON string, the spiller measures it once escaped (see `storage.Spiller`)
+    if spill is not None:
+        members = spill.fit(members, items)
+
+    for record in records.values():
+        metrics.emit(record)
+
+    # Dropped datasources are listed in an `errors` member, the request fails when none of them succeeded
+    if errors:
+        members.append(('errors', json.dumps(errors)))
+    failed = bool(errors) and len(errors) == len(package['datasources'])
     return {
-        'statusCode': 200,
-        'body': json.dumps(out_d)
+        'statusCode': 502 if failed else 200,
+        'body': '{' + ', '.join(['{}: {}'.format(json.dumps(k), v) for (k, v) in members]) + '}'
     }
-
@@ -7,7 +7,7 @@ setup(name="cognition_datasources",
       version='0.3.2',
       author='Jeff Albrecht',
       author_email='geospatialjeff@gmail.com',
-      packages=find_packages(exclude=['docs']),
+      packages=find_packages(exclude=['docs', 'benchmarks', 'benchmarks.*']),
       install_requires = requirements,
       entry_points= {
           "console_scripts": [